@@ -25,14 +25,24 @@ def create_app():
     db.init_app(app)
     cors.init_app(app)
     
+    # Configure process-wide caches, batchers and schedulers
+    from app.services.runtime import configure_runtime
+    configure_runtime(app)
+    
     # Register blueprints
     from app.routes.auth import auth_bp
     from app.routes.document import document_bp
     from app.routes.chat import chat_bp
+    from app.routes.system import system_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(document_bp, url_prefix='/api/document')
     app.register_blueprint(chat_bp, url_prefix='/api/chat')
+    app.register_blueprint(system_bp, url_prefix='/api/system')
+    
+    # Response compression and fingerprinted static assets
+    from app.utils.http_cache import init_http_cache
+    init_http_cache(app)
     
     # Frontend routes
     @app.route('/')
@@ -23,7 +23,20 @@ class Config:
     
     # Ollama/AI settings
     OLLAMA_BASE_URL = "http://localhost:11434"
+    # Comma-separated host lists; generation and embedding use separate pools
+    OLLAMA_GENERATION_URLS = os.environ.get('OLLAMA_GENERATION_URLS', OLLAMA_BASE_URL).split(',')
+    OLLAMA_EMBEDDING_URLS = os.environ.get('OLLAMA_EMBEDDING_URLS', OLLAMA_BASE_URL).split(',')
+    OLLAMA_FAILURE_THRESHOLD = 3  # Consecutive failures before a circuit opens
+    OLLAMA_CIRCUIT_COOLDOWN = 30  # seconds before a tripped endpoint is retried
+    OLLAMA_HEALTH_INTERVAL = 10  # seconds between active health checks
+    OLLAMA_KEEP_ALIVE = "30m"  # Keep models (and their KV cache) loaded between turns
+    OLLAMA_NUM_CTX = 4096  # Same on every call; changing it makes Ollama reload the model
+    OLLAMA_CONTEXT_REUSE = False  # Continue each chat's Ollama context (per chat: 'context_reuse')
+    GENERATION_SESSION_TTL = 1800  # seconds; match OLLAMA_KEEP_ALIVE
+    GENERATION_SESSION_MAX = 256  # Chats whose context and endpoint are remembered
     LLM_MODEL = "granite3.3:2b"
+    LLM_FALLBACK_MODEL = "granite3.1-moe:1b"  # Smaller model used under load, once warm-up has loaded it
+    LLM_EXTRA_MODELS = []  # Further models chats may pin via the 'model' setting
     EMBEDDING_MODEL = "granite-embedding:278m"
     
     # RAG settings
@@ -31,6 +44,114 @@ class Config:
     CHUNK_OVERLAP = 200
     RETRIEVAL_K = 3
     
+    # Prompt token budget (Chat.max_tokens is the whole context window)
+    PROMPT_MAX_TOKENS = 4000  # Used when a chat has no max_tokens
+    PROMPT_RESPONSE_RESERVE = 512  # Tokens kept free for the answer
+    PROMPT_MIN_TOKENS = 512  # Floor for tiny max_tokens values
+    PROMPT_TEMPLATE_TOKENS = 32  # Section headers and separators
+    PROMPT_HISTORY_SHARE = 0.3  # Most of the non-fixed budget history may take
+    PROMPT_MIN_PARTIAL_CHUNK_TOKENS = 64  # Smaller leftovers drop the chunk instead
+    MAX_MEMORY_TOKENS = 4000  # Hard cap on conversation history in a prompt
+    
+    # Conversation memory (Chat.memory_type: buffer, summary, hybrid)
+    MEMORY_BUFFER_MESSAGES = 10  # Raw messages replayed at most
+    MEMORY_RECENT_MESSAGES = 4  # Messages 'hybrid' always keeps raw
+    MEMORY_SUMMARY_MIN_MESSAGES = 2  # Pending messages needed before summarizing
+    MEMORY_SUMMARY_BATCH_TOKENS = 1500  # Message text folded in per summary call
+    MEMORY_SUMMARY_MAX_TOKENS = 300
+    MEMORY_SUMMARY_MODEL = "granite3.1-moe:1b"  # Runs at background priority
+    CONVERSATION_WINDOW_IDLE_TTL = 900  # seconds before an unused chat window is dropped
+    CONVERSATION_WINDOW_MAX_CHATS = 1024  # Chat windows kept in memory per process
+    
+    # Retrieval post-processing (overridable per chat via Chat.settings)
+    # Options: similarity, mmr. MMR is the default for every chat without its
+    # own retrieval_mode; "similarity" restores plain top-k ordering
+    RETRIEVAL_MODE = "mmr"
+    RETRIEVAL_FETCH_K = 12  # Candidates over-fetched before reranking
+    MMR_LAMBDA = 0.5  # 1.0 = pure relevance, 0.0 = pure diversity
+    REDUNDANCY_THRESHOLD = 0.95  # Cosine above which a candidate is a duplicate
+    
+    # Adaptive k: drop chunks far below the best match (cosine similarity);
+    # off by default, chats opt in with the 'adaptive_k' setting
+    ADAPTIVE_K_ENABLED = False
+    ADAPTIVE_K_MIN_SCORE = 0.3  # Chunks below this are never used
+    ADAPTIVE_K_RELATIVE = 0.85  # ...nor those below this fraction of the top score
+    
+    # Query-focused context compression; off by default since it embeds the
+    # retrieved sentences on every turn, chats opt in with 'compression'
+    COMPRESSION_ENABLED = False
+    COMPRESSION_MAX_TOKENS = 400  # Sentences kept across all chunks
+    COMPRESSION_MIN_RELATIVE = 0.6  # Skip sentences below this fraction of the best one
+    SENTENCE_EMBEDDING_CACHE_SIZE = 8192
+    
+    # In-process caches
+    VECTOR_STORE_CACHE_SIZE = 8  # Loaded FAISS stores kept in memory
+    VECTOR_STORE_MMAP = True  # Map index vectors from disk, shared across worker processes
+    QUERY_EMBEDDING_CACHE_SIZE = 1024
+    RETRIEVAL_CACHE_SIZE = 2048
+    
+    # Semantic answer cache (opt-in per chat via the 'answer_cache' setting)
+    ANSWER_CACHE_ENABLED = False
+    ANSWER_CACHE_THRESHOLD = 0.95  # Minimum question cosine similarity for a hit
+    ANSWER_CACHE_TTL = 3600  # seconds
+    ANSWER_CACHE_MAX_PER_DOCUMENT = 64
+    ANSWER_CACHE_MAX_DOCUMENTS = 256
+    
+    # Micro-batching of concurrent query embeddings and FAISS searches
+    MICROBATCH_ENABLED = True
+    MICROBATCH_WINDOW_MS = 3  # How long the first request waits for company
+    MICROBATCH_MAX_SIZE = 16  # Dispatch immediately once this many are queued
+    EMBEDDING_BATCH_SIZE = 32  # Chunks per /api/embed call during ingestion
+    
+    # LLM admission control
+    LLM_MAX_CONCURRENCY = 2  # Generations Ollama runs at once
+    LLM_MAX_QUEUE_DEPTH = 8  # Interactive requests beyond this get 429
+    
+    # Chat turn deadlines (clients may ask for less via X-Request-Timeout)
+    CHAT_REQUEST_TIMEOUT = 120  # seconds
+    CHAT_STREAM_HEARTBEAT = 5  # seconds between pings on an idle stream
+    
+    # Load-aware model routing (per chat: 'model' pins, 'model_policy' = auto/primary)
+    ROUTER_ENABLED = True  # Needs WARMUP_ENABLED: only a fallback warm-up loaded is used
+    ROUTER_MAX_WAIT_P95_MS = 8000  # Fall back when recent p95 interactive queue wait exceeds this
+    ROUTER_WAIT_WINDOW = 50  # Recent interactive waits considered for the p95
+    ROUTER_MAX_QUEUE_DEPTH = 3  # Fall back when this many interactive generations are queued
+    ROUTER_LONG_PROMPT_TOKENS = 2500  # Prompts above this fall back whenever interactive turns queue
+    
+    # Warm-up of models and recently used vector stores
+    WARMUP_ENABLED = True
+    WARMUP_RETRY_INTERVAL = 10  # seconds between model preload attempts
+    WARMUP_HOT_DOCUMENTS = 8  # Recently opened documents re-warmed after a restart
+    WARMUP_STATE_FILE = basedir / 'warmup_state.json'
+    
+    # HTTP caching and compression
+    COMPRESS_MIN_SIZE = 1024  # bytes; smaller responses are sent as-is
+    COMPRESS_LEVEL_GZIP = 6
+    COMPRESS_LEVEL_BR = 4  # Per-response brotli; static assets use the maximum once
+    STATIC_MAX_AGE = 365 * 24 * 3600  # Fingerprinted static URLs never change content
+    
+    # Document processing progress streams
+    PROGRESS_STREAM_HEARTBEAT = 15  # seconds between keep-alive comments
+    PROGRESS_FALLBACK_INTERVAL = 10  # seconds between status reads when another worker is processing
+    PROGRESS_RETAIN_SECONDS = 300  # Finished documents' last event kept for late subscribers
+    PROGRESS_MAX_DOCUMENTS = 1024
+    
+    # Message sources are chunk references; text is looked up on request
+    SNIPPET_BATCH_LIMIT = 50  # chunks per /snippets request
+    
+    # Full-text search over chat history (SQLite FTS5)
+    SEARCH_PAGE_SIZE = 20
+    SEARCH_MAX_PAGE_SIZE = 100
+    SEARCH_SNIPPET_TOKENS = 16  # Words of context around each match
+    
+    # Cold-message archival (scripts/archive_messages.py)
+    MAX_CHAT_HISTORY = 50  # Newest messages per chat kept in chat_messages
+    ARCHIVE_AFTER_DAYS = 30  # Older messages are archived too, past the memory buffer
+    ARCHIVE_BATCH_MESSAGES = 100  # Messages per compressed blob
+    ARCHIVE_CODEC = 'zstd'  # Falls back to zlib when zstandard isn't installed
+    ARCHIVE_CACHE_SIZE = 64  # Decompressed blobs kept for scrolling back
+    HISTORY_PAGE_SIZE = 50
+    
     # Create required directories
     UPLOAD_FOLDER.mkdir(exist_ok=True)
     VECTOR_STORE_PATH.mkdir(exist_ok=True)
@@ -4,7 +4,7 @@ Imports all models for easy access
 """
 
 from .user import User
-from .document import Document
-from .chat import Chat, ChatMessage
+from .document import Document, DocumentChunk
+from .chat import Chat, ChatMessage, ChatMessageArchive
 
-__all__ = ['User', 'Document', 'Chat', 'ChatMessage']
+__all__ = ['User', 'Document', 'DocumentChunk', 'Chat', 'ChatMessage', 'ChatMessageArchive']
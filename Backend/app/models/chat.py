@@ -8,6 +8,14 @@ import json
 
 class Chat(db.Model):
     __tablename__ = 'chats'
+    __table_args__ = (
+        db.Index('ix_chats_user_status', 'user_id', 'status'),
+    )
+    
+    # Keys accepted in the per-chat settings blob
+    SETTING_KEYS = {'retrieval_mode', 'fetch_k', 'mmr_lambda', 'redundancy_threshold',
+                    'answer_cache', 'model', 'model_policy', 'adaptive_k', 'compression',
+                    'context_reuse'}
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -17,12 +25,25 @@ class Chat(db.Model):
     max_tokens = db.Column(db.Integer, default=4000)
     temperature = db.Column(db.Float, default=0.2)
     system_prompt = db.Column(db.Text)
+    settings = db.Column(db.Text)  # JSON string of per-chat overrides
+    
+    # Rolling conversation summary ('summary' and 'hybrid' memory)
+    summary = db.Column(db.Text)
+    summary_message_id = db.Column(db.Integer)  # Last message folded into the summary
+    summary_updated_at = db.Column(db.DateTime)
     
     # Status and metadata
     status = db.Column(db.String(50), default='active')
     message_count = db.Column(db.Integer, default=0)
     total_tokens_used = db.Column(db.Integer, default=0)
     
+    # Running statistics, kept by add_message so reading them never scans messages
+    user_message_count = db.Column(db.Integer, default=0)
+    assistant_message_count = db.Column(db.Integer, default=0)
+    response_count = db.Column(db.Integer, default=0)  # Replies that directly follow a user message
+    response_time_total = db.Column(db.Float, default=0.0)  # seconds, summed over those replies
+    last_user_message_at = db.Column(db.DateTime)  # Set while a user message awaits its reply
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -36,27 +57,48 @@ class Chat(db.Model):
     messages = db.relationship('ChatMessage', backref='chat', lazy=True, 
                              cascade='all, delete-orphan', 
                              order_by='ChatMessage.created_at')
+    archives = db.relationship('ChatMessageArchive', lazy='dynamic', cascade='all, delete-orphan')
     
-    def add_message(self, role, content, sources=None, token_count=None):
+    def add_message(self, role, content, sources=None, token_count=None, model_used=None, status='complete'):
         """Add a new message to the chat"""
+        now = datetime.utcnow()
         message = ChatMessage(
             role=role,
             content=content,
-            sources=json.dumps(sources) if sources else None,
+            sources=ChatMessage.encode_sources(sources),
             token_count=token_count or 0,
-            chat_id=self.id
+            model_used=model_used,
+            status=status,
+            chat_id=self.id,
+            created_at=now
         )
         
         db.session.add(message)
-        self.message_count = ChatMessage.query.filter_by(chat_id=self.id).count() + 1
-        self.last_activity = datetime.utcnow()
-        self.updated_at = datetime.utcnow()
+        self.message_count = (self.message_count or 0) + 1
+        self.last_activity = now
+        self.updated_at = now
         
         if token_count:
             self.total_tokens_used += token_count
         
+        self._count_message(role, now)
         return message
     
+    def _count_message(self, role, created_at):
+        """Fold a new message into the running statistics"""
+        if role == 'user':
+            self.user_message_count = (self.user_message_count or 0) + 1
+            self.last_user_message_at = created_at
+            return
+        
+        if role == 'assistant':
+            self.assistant_message_count = (self.assistant_message_count or 0) + 1
+            if self.last_user_message_at:
+                self.response_count = (self.response_count or 0) + 1
+                self.response_time_total = (self.response_time_total or 0.0) + \
+                    (created_at - self.last_user_message_at).total_seconds()
+        self.last_user_message_at = None
+    
     def get_recent_messages(self, limit=10):
         """Get recent messages for context"""
         return ChatMessage.query.filter_by(chat_id=self.id)\
@@ -82,12 +124,43 @@ class Chat(db.Model):
     def clear_messages(self):
         """Clear all messages in the chat"""
         ChatMessage.query.filter_by(chat_id=self.id).delete()
+        for archive in self.archives:
+            db.session.delete(archive)  # per row, so their search entries go too
+        self.summary = None
+        self.summary_message_id = None
+        self.summary_updated_at = None
         self.message_count = 0
         self.total_tokens_used = 0
+        self.user_message_count = 0
+        self.assistant_message_count = 0
+        self.response_count = 0
+        self.response_time_total = 0.0
+        self.last_user_message_at = None
         self.last_activity = datetime.utcnow()
         self.updated_at = datetime.utcnow()
         db.session.commit()
     
+    def get_settings(self):
+        """Get parsed per-chat settings"""
+        if self.settings:
+            try:
+                return json.loads(self.settings)
+            except json.JSONDecodeError:
+                return {}
+        return {}
+    
+    def set_settings(self, settings):
+        """Set per-chat settings as JSON string"""
+        if settings:
+            self.settings = json.dumps(settings)
+        else:
+            self.settings = None
+    
+    def get_setting(self, key, default=None):
+        """Get a single setting, falling back to the given default"""
+        value = self.get_settings().get(key)
+        return default if value is None else value
+    
     def archive(self):
         """Archive the chat"""
         self.status = 'archived'
@@ -99,21 +172,18 @@ class Chat(db.Model):
         self.updated_at = datetime.utcnow()
     
     def get_average_response_time(self):
-        """Calculate average response time"""
-        messages = self.messages
-        if len(messages) < 2:
+        """Get the average seconds between a user message and the reply to it"""
+        if not self.response_count:
             return None
-        
-        total_time = 0
-        response_count = 0
-        
-        for i in range(1, len(messages)):
-            if messages[i-1].role == 'user' and messages[i].role == 'assistant':
-                time_diff = (messages[i].created_at - messages[i-1].created_at).total_seconds()
-                total_time += time_diff
-                response_count += 1
-        
-        return total_time / response_count if response_count > 0 else None
+        return self.response_time_total / self.response_count
+    
+    def get_stats(self):
+        """Get message statistics from the running counters"""
+        return {
+            'average_response_time': self.get_average_response_time(),
+            'user_messages': self.user_message_count or 0,
+            'ai_messages': self.assistant_message_count or 0
+        }
     
     def to_dict(self, include_messages=False, include_stats=False):
         """Convert to dictionary"""
@@ -123,6 +193,9 @@ class Chat(db.Model):
             'memory_type': self.memory_type,
             'max_tokens': self.max_tokens,
             'temperature': self.temperature,
+            'settings': self.get_settings(),
+            'summary': self.summary,
+            'summary_updated_at': self.summary_updated_at.isoformat() if self.summary_updated_at else None,
             'status': self.status,
             'message_count': self.message_count,
             'total_tokens_used': self.total_tokens_used,
@@ -137,11 +210,7 @@ class Chat(db.Model):
             data['messages'] = [msg.to_dict() for msg in self.messages]
         
         if include_stats:
-            data['stats'] = {
-                'average_response_time': self.get_average_response_time(),
-                'user_messages': len([m for m in self.messages if m.role == 'user']),
-                'ai_messages': len([m for m in self.messages if m.role == 'assistant'])
-            }
+            data['stats'] = self.get_stats()
         
         return data
     
@@ -150,12 +219,16 @@ class Chat(db.Model):
 
 class ChatMessage(db.Model):
     __tablename__ = 'chat_messages'
+    __table_args__ = (
+        db.Index('ix_chat_messages_chat_created', 'chat_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     role = db.Column(db.String(20), nullable=False)  # user, assistant, system
     content = db.Column(db.Text, nullable=False)
-    sources = db.Column(db.Text)  # JSON string of source references
+    sources = db.Column(db.Text)  # Source references, "doc_1:12 doc_1:3" (older rows: JSON with text)
     token_count = db.Column(db.Integer, default=0)
+    status = db.Column(db.String(20), default='complete')  # complete, cancelled, superseded, deadline, disconnected, interrupted
     
     # Message metadata
     model_used = db.Column(db.String(100))
@@ -168,21 +241,40 @@ class ChatMessage(db.Model):
     # Foreign keys
     chat_id = db.Column(db.Integer, db.ForeignKey('chats.id'), nullable=False)
     
-    def get_sources(self):
-        """Get parsed sources"""
-        if self.sources:
+    @staticmethod
+    def encode_sources(sources):
+        """Encode [{'vector_store_id', 'chunk_index'}, ...] as compact references"""
+        if not sources:
+            return None
+        return ' '.join(f"{source['vector_store_id']}:{int(source['chunk_index'])}" for source in sources)
+    
+    @staticmethod
+    def decode_sources(value):
+        """Decode stored references; rows not yet migrated still hold JSON"""
+        if not value:
+            return []
+        if value.startswith('['):
             try:
-                return json.loads(self.sources)
+                return json.loads(value)
             except json.JSONDecodeError:
                 return []
-        return []
+        sources = []
+        for ref in value.split():
+            vector_store_id, _, chunk_index = ref.rpartition(':')
+            sources.append({'vector_store_id': vector_store_id, 'chunk_index': int(chunk_index)})
+        return sources
+    
+    def get_sources(self):
+        """Get source references (snippets are resolved on request)"""
+        return self.decode_sources(self.sources)
     
     def set_sources(self, sources):
-        """Set sources as JSON string"""
-        if sources:
-            self.sources = json.dumps(sources)
-        else:
-            self.sources = None
+        """Set sources as compact references"""
+        self.sources = self.encode_sources(sources)
+    
+    def is_complete(self):
+        """Check whether the message finished normally"""
+        return self.status in (None, 'complete')
     
     def get_word_count(self):
         """Get word count of message content"""
@@ -196,6 +288,7 @@ class ChatMessage(db.Model):
             'content': self.content,
             'sources': self.get_sources(),
             'token_count': self.token_count,
+            'status': self.status or 'complete',
             'model_used': self.model_used,
             'processing_time': self.processing_time,
             'confidence_score': self.confidence_score,
@@ -206,3 +299,29 @@ class ChatMessage(db.Model):
     def __repr__(self):
         content_preview = self.content[:50] + '...' if len(self.content) > 50 else self.content
         return f'<ChatMessage {self.role}: {content_preview}>'
+
+class ChatMessageArchive(db.Model):
+    __tablename__ = 'chat_message_archives'
+    __table_args__ = (
+        db.Index('ix_chat_message_archives_chat_last', 'chat_id', 'last_message_id'),
+        # Ids are never reused: the archive search index and cache key on them
+        {'sqlite_autoincrement': True},
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    chat_id = db.Column(db.Integer, db.ForeignKey('chats.id'), nullable=False)
+    
+    # Contiguous run of messages, oldest first, as one compressed JSON blob
+    first_message_id = db.Column(db.Integer, nullable=False)
+    last_message_id = db.Column(db.Integer, nullable=False)
+    first_created_at = db.Column(db.DateTime)
+    last_created_at = db.Column(db.DateTime)
+    message_count = db.Column(db.Integer, nullable=False)
+    codec = db.Column(db.String(10), nullable=False)  # zstd, zlib
+    data = db.Column(db.LargeBinary, nullable=False)
+    raw_size = db.Column(db.Integer)  # bytes before compression
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ChatMessageArchive {self.chat_id}:{self.first_message_id}-{self.last_message_id}>'
@@ -5,10 +5,14 @@ Enhanced document management with processing states
 
 from app import db
 from datetime import datetime
+import json
 import os
 
 class Document(db.Model):
     __tablename__ = 'documents'
+    __table_args__ = (
+        db.Index('ix_documents_user_status', 'user_id', 'status'),
+    )
     
     # Primary fields
     id = db.Column(db.Integer, primary_key=True)
@@ -36,6 +40,8 @@ class Document(db.Model):
     
     # Relationships
     chats = db.relationship('Chat', backref='document', lazy=True, cascade='all, delete-orphan')
+    chunks = db.relationship('DocumentChunk', backref='document', lazy='dynamic',
+                             cascade='all, delete-orphan', order_by='DocumentChunk.chunk_index')
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -84,3 +90,54 @@ class Document(db.Model):
     
     def __repr__(self):
         return f'<Document {self.original_filename}>'
+
+class DocumentChunk(db.Model):
+    __tablename__ = 'document_chunks'
+    __table_args__ = (
+        db.UniqueConstraint('document_id', 'chunk_index', name='uq_document_chunk'),
+        db.Index('ix_document_chunks_pages', 'document_id', 'page_start', 'page_end'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), nullable=False)
+    chunk_index = db.Column(db.Integer, nullable=False)  # Position in the document's vector store
+    
+    # Span in the extracted text (end exclusive) and the pages it covers
+    start_char = db.Column(db.Integer, nullable=False)
+    end_char = db.Column(db.Integer, nullable=False)
+    page_start = db.Column(db.Integer)
+    page_end = db.Column(db.Integer)
+    anchors = db.Column(db.Text)  # JSON list of per-page highlight anchors
+    
+    @staticmethod
+    def for_pages(document_id, first_page=None, last_page=None):
+        """Query the document's chunks overlapping a page range (open-ended if a bound is None)"""
+        query = DocumentChunk.query.filter(DocumentChunk.document_id == document_id)
+        if last_page is not None:
+            query = query.filter(DocumentChunk.page_start <= last_page)
+        if first_page is not None:
+            query = query.filter(DocumentChunk.page_end >= first_page)
+        return query.order_by(DocumentChunk.chunk_index)
+    
+    def get_anchors(self):
+        """Get [{page, start, end, head, tail}], offsets relative to each page's text"""
+        if self.anchors:
+            try:
+                return json.loads(self.anchors)
+            except json.JSONDecodeError:
+                return []
+        return []
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'chunk_index': self.chunk_index,
+            'start_char': self.start_char,
+            'end_char': self.end_char,
+            'page_start': self.page_start,
+            'page_end': self.page_end,
+            'anchors': self.get_anchors()
+        }
+    
+    def __repr__(self):
+        return f'<DocumentChunk {self.document_id}:{self.chunk_index}>'
@@ -4,6 +4,7 @@ User Model - Enhanced with proper authentication
 
 from app import db
 from datetime import datetime
+from sqlalchemy import case, func # type: ignore
 from werkzeug.security import generate_password_hash, check_password_hash # type: ignore
 
 class User(db.Model):
@@ -59,12 +60,24 @@ class User(db.Model):
         db.session.commit()
     
     def get_stats(self):
-        """Get user statistics"""
+        """Get user statistics, counted in the database"""
+        from app.models.document import Document
+        from app.models.chat import Chat
+        
+        total_documents, completed_documents = db.session.query(
+            func.count(Document.id),
+            func.coalesce(func.sum(case((Document.status == 'completed', 1), else_=0)), 0)
+        ).filter(Document.user_id == self.id).one()
+        total_chats, active_chats = db.session.query(
+            func.count(Chat.id),
+            func.coalesce(func.sum(case((Chat.status == 'active', 1), else_=0)), 0)
+        ).filter(Chat.user_id == self.id).one()
+        
         return {
-            'total_documents': len(self.documents),
-            'total_chats': len(self.chats),
-            'completed_documents': len([d for d in self.documents if d.status == 'completed']),
-            'active_chats': len([c for c in self.chats if c.status == 'active'])
+            'total_documents': total_documents,
+            'total_chats': total_chats,
+            'completed_documents': completed_documents,
+            'active_chats': active_chats
         }
     
     def to_dict(self, include_stats=False):
@@ -5,5 +5,6 @@ Routes package for SAV.IN application
 from .auth import auth_bp
 from .document import document_bp
 from .chat import chat_bp
+from .system import system_bp
 
-__all__ = ['auth_bp', 'document_bp', 'chat_bp']
+__all__ = ['auth_bp', 'document_bp', 'chat_bp', 'system_bp']
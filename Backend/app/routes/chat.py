@@ -3,29 +3,123 @@ Chat API Routes
 Enhanced chat management with conversation memory
 """
 
-from flask import Blueprint, request, jsonify # type: ignore
+import json
+import queue
+import threading
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context # type: ignore
+from sqlalchemy import func # type: ignore
 from app.services.auth_service import AuthService
 from app.services.rag_service import RAGService
+from app.services.scheduler import GenerationRejected
+from app.services.model_router import ModelRouter
+from app.services.memory_service import MEMORY_TYPES
+from app.services.conversation_window import conversation_windows
+from app.services.generation_sessions import end_session
+from app.services.warmup import warmup
+from app.services.endpoint_pool import NoHealthyEndpoint
+from app.services.source_service import SourceService
+from app.services.search_service import SearchService, SearchUnavailable
+from app.services.archive_service import ArchiveService
+from app.utils.cancellation import CancelToken, RequestCancelled, active_turns
+from app.utils.http_cache import make_etag, not_modified, with_validators
 from app.models.chat import Chat, ChatMessage
 from app.models.document import Document
 from app import db
 
 chat_bp = Blueprint('chat', __name__)
 
+# Per-chat settings that switch a feature on or off, and those that are fractions
+_BOOLEAN_SETTINGS = ('answer_cache', 'adaptive_k', 'compression', 'context_reuse')
+_FRACTION_SETTINGS = ('mmr_lambda', 'redundancy_threshold')
+
+def _validate_settings(settings):
+    """Return an error message for invalid chat settings, or None
+
+    A null value is always accepted: it resets the setting to the default.
+    """
+    unknown = set(settings) - Chat.SETTING_KEYS
+    if unknown:
+        return f'Unknown chat settings: {", ".join(sorted(unknown))}'
+    given = {key: value for key, value in settings.items() if value is not None}
+    
+    if given.get('retrieval_mode', 'mmr') not in ('similarity', 'mmr'):
+        return 'retrieval_mode must be "similarity" or "mmr"'
+    
+    if 'fetch_k' in given:
+        k = current_app.config['RETRIEVAL_K']
+        if type(given['fetch_k']) is not int or given['fetch_k'] < k:
+            return f'fetch_k must be an integer of at least {k}'
+    
+    for key in _FRACTION_SETTINGS:
+        value = given.get(key)
+        if key in given and (isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 1):
+            return f'{key} must be a number between 0 and 1'
+    
+    for key in _BOOLEAN_SETTINGS:
+        if key in given and not isinstance(given[key], bool):
+            return f'{key} must be true or false'
+    
+    if 'model' in given and not isinstance(given['model'], str):
+        return 'model must be a model name'
+    
+    if settings.get('model') and settings['model'] not in ModelRouter().available_models():
+        return f'Model not available: {settings["model"]}'
+    
+    if settings.get('model_policy') not in (None, 'auto', 'primary'):
+        return 'model_policy must be "auto" or "primary"'
+    
+    return None
+
+def _request_timeout(data):
+    """Get the turn deadline in seconds, capped by CHAT_REQUEST_TIMEOUT"""
+    limit = current_app.config['CHAT_REQUEST_TIMEOUT']
+    requested = data.get('timeout') or request.headers.get('X-Request-Timeout')
+    try:
+        return min(limit, float(requested)) if requested else limit
+    except (TypeError, ValueError):
+        return limit
+
+def _wants_snippets(data=None):
+    """Whether the client asked for source text along with the references"""
+    value = (data or {}).get('include_snippets', request.args.get('include_snippets'))
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def _resolve_sources(response_data, include_snippets):
+    """Give a turn's sources their pages and highlight anchors, plus text if asked
+
+    The answer cache shares its source list, so the copies are what get filled.
+    """
+    sources = [dict(source) for source in response_data['sources']]
+    service = SourceService()
+    response_data['sources'] = service.attach_snippets(sources) if include_snippets else service.attach_locations(sources)
+    return response_data
+
+def _chats_version(user_id):
+    """Get (etag, last_modified) of a user's chat list without loading it"""
+    count, latest = db.session.query(func.count(Chat.id), func.max(Chat.updated_at))\
+                              .filter(Chat.user_id == user_id)\
+                              .one()
+    return make_etag('chats', user_id, count, latest), latest
+
 @chat_bp.route('/list', methods=['GET'])
 def list_chats():
     """Get all chats for current user"""
     try:
         user = AuthService.get_current_user()
+        etag, last_modified = _chats_version(user.id)
+        cached = not_modified(etag, last_modified)
+        if cached:
+            return cached
+        
         chats = Chat.query.filter_by(user_id=user.id)\
                          .order_by(Chat.last_activity.desc())\
                          .all()
         
-        return jsonify({
+        return with_validators(jsonify({
             'success': True,
             'data': [chat.to_dict() for chat in chats],
             'count': len(chats)
-        }), 200
+        }), etag, last_modified), 200
         
     except Exception as e:
         return jsonify({
@@ -33,6 +127,50 @@ def list_chats():
             'message': f'Failed to load chats: {str(e)}'
         }), 500
 
+@chat_bp.route('/search', methods=['GET'])
+def search_messages():
+    """Search the current user's chat history
+
+    Query: ?q=termination notice&page=1&per_page=20&chat_id=3. Results are
+    ranked by relevance with a highlighted snippet of each message;
+    archived messages follow all live ones.
+    """
+    try:
+        user = AuthService.get_current_user()
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({
+                'success': False,
+                'message': 'Search query is required'
+            }), 400
+        
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = request.args.get('per_page', type=int)
+        results, has_more = SearchService.search(
+            user.id, query, page, per_page,
+            chat_id=request.args.get('chat_id', type=int)
+        )
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'results': results,
+                'page': page,
+                'has_more': has_more
+            }
+        }), 200
+        
+    except SearchUnavailable as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Search failed: {str(e)}'
+        }), 500
+
 @chat_bp.route('/create', methods=['POST'])
 def create_chat():
     """Create new chat session"""
@@ -65,16 +203,32 @@ def create_chat():
                 'message': f'Document is not ready for chat (status: {document.status})'
             }), 400
         
+        memory_type = data.get('memory_type', 'buffer')
+        if memory_type not in MEMORY_TYPES:
+            return jsonify({
+                'success': False,
+                'message': f'memory_type must be one of: {", ".join(MEMORY_TYPES)}'
+            }), 400
+        
         # Create chat
         chat = Chat(
             title=data.get('title', f'Chat with {document.original_filename}'),
-            memory_type=data.get('memory_type', 'buffer'),
+            memory_type=memory_type,
             max_tokens=data.get('max_tokens', 4000),
             temperature=data.get('temperature', 0.2),
             user_id=user.id,
             document_id=document.id
         )
         
+        settings = data.get('settings') or {}
+        error = _validate_settings(settings)
+        if error:
+            return jsonify({
+                'success': False,
+                'message': error
+            }), 400
+        chat.set_settings(settings)
+        
         db.session.add(chat)
         db.session.commit()
         
@@ -111,15 +265,138 @@ def get_chat(chat_id):
                 'message': 'Chat not found'
             }), 404
         
+        # Load the document's index now, while the user reads the history
+        warmup.warm_document(chat.document.vector_store_id)
+        
+        # Every message and setting change bumps updated_at
+        include_snippets = _wants_snippets()
+        etag = make_etag('chat', chat.id, chat.updated_at, chat.message_count, include_snippets)
+        cached = not_modified(etag, chat.updated_at)
+        if cached:
+            return cached
+        
+        data = chat.to_dict(include_messages=True)
+        if include_snippets:
+            SourceService().attach_snippets([
+                source for message in data['messages'] for source in message['sources']
+            ])
+        
+        return with_validators(jsonify({
+            'success': True,
+            'data': data
+        }), etag, chat.updated_at), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to get chat: {str(e)}'
+        }), 500
+
+@chat_bp.route('/<int:chat_id>/messages', methods=['GET'])
+def get_chat_messages(chat_id):
+    """Get a page of message history, oldest first
+
+    Query: ?before=<message id>&limit=50. Without `before` the newest page
+    is returned; pass the first message's id to scroll further back, into
+    archived messages once the recent ones run out.
+    """
+    try:
+        user = AuthService.get_current_user()
+        chat = Chat.query.filter_by(id=chat_id, user_id=user.id).first()
+        
+        if not chat:
+            return jsonify({
+                'success': False,
+                'message': 'Chat not found'
+            }), 404
+        
+        limit = request.args.get('limit', type=int) or current_app.config['HISTORY_PAGE_SIZE']
+        limit = max(1, min(limit, current_app.config['HISTORY_PAGE_SIZE'] * 4))
+        messages, has_more = ArchiveService().get_history_page(
+            chat.id, request.args.get('before', type=int), limit
+        )
+        
         return jsonify({
             'success': True,
-            'data': chat.to_dict(include_messages=True)
+            'data': {
+                'messages': messages,
+                'has_more': has_more,
+                'next_before': messages[0]['id'] if has_more and messages else None
+            }
         }), 200
         
     except Exception as e:
         return jsonify({
             'success': False,
-            'message': f'Failed to get chat: {str(e)}'
+            'message': f'Failed to get messages: {str(e)}'
+        }), 500
+
+@chat_bp.route('/<int:chat_id>/stats', methods=['GET'])
+def get_chat_stats(chat_id):
+    """Get a chat's message statistics"""
+    try:
+        user = AuthService.get_current_user()
+        chat = Chat.query.filter_by(id=chat_id, user_id=user.id).first()
+        
+        if not chat:
+            return jsonify({
+                'success': False,
+                'message': 'Chat not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'message_count': chat.message_count,
+                'total_tokens_used': chat.total_tokens_used,
+                **chat.get_stats()
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to get stats: {str(e)}'
+        }), 500
+
+@chat_bp.route('/<int:chat_id>/settings', methods=['PUT'])
+def update_chat_settings(chat_id):
+    """Update per-chat retrieval settings"""
+    try:
+        user = AuthService.get_current_user()
+        data = request.get_json() or {}
+        chat = Chat.query.filter_by(id=chat_id, user_id=user.id).first()
+        
+        if not chat:
+            return jsonify({
+                'success': False,
+                'message': 'Chat not found'
+            }), 404
+        
+        error = _validate_settings(data)
+        if error:
+            return jsonify({
+                'success': False,
+                'message': error
+            }), 400
+        
+        # Merge, dropping keys explicitly reset to null
+        settings = chat.get_settings()
+        settings.update(data)
+        chat.set_settings({key: value for key, value in settings.items() if value is not None})
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Chat settings updated',
+            'data': chat.to_dict()
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Settings update failed: {str(e)}'
         }), 500
 
 @chat_bp.route('/<int:chat_id>/message', methods=['POST'])
@@ -151,11 +428,39 @@ def send_message(chat_id):
                 'message': 'Chat not found'
             }), 404
         
-        # Process message with RAG service
+        # Process message with RAG service; a newer message supersedes this turn
+        cancel_token = CancelToken(_request_timeout(data))
+        active_turns.start(chat_id, cancel_token)
         rag_service = RAGService()
-        success, message, response_data = rag_service.chat_with_document(chat_id, user_message)
+        try:
+            success, message, response_data = rag_service.chat_with_document(
+                chat_id, user_message, cancel_token
+            )
+        except GenerationRejected as e:
+            response = jsonify({
+                'success': False,
+                'message': str(e),
+                'retry_after': e.retry_after
+            })
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
+        except NoHealthyEndpoint as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 503
+        except RequestCancelled as e:
+            return jsonify({
+                'success': False,
+                'message': f'Response stopped: {e.reason}',
+                'status': e.reason,
+                'partial_response': e.partial
+            }), {'deadline': 504, 'interrupted': 502}.get(e.reason, 409)
+        finally:
+            active_turns.finish(chat_id, cancel_token)
         
         if success:
+            _resolve_sources(response_data, _wants_snippets(data))
             return jsonify({
                 'success': True,
                 'message': message,
@@ -173,6 +478,167 @@ def send_message(chat_id):
             'message': f'Message processing failed: {str(e)}'
         }), 500
 
+@chat_bp.route('/<int:chat_id>/message/stream', methods=['POST'])
+def stream_message(chat_id):
+    """Send message and stream the AI response as NDJSON events
+
+    Events are {"type": "token" | "ping" | "done" | "cancelled" | "error"}.
+    Closing the connection cancels the turn and aborts generation upstream.
+    """
+    try:
+        user = AuthService.get_current_user()
+        data = request.get_json()
+        
+        # Validate input
+        if not data or not (data.get('message') or '').strip():
+            return jsonify({
+                'success': False,
+                'message': 'Message is required'
+            }), 400
+        
+        user_message = data['message'].strip()
+        
+        # Verify chat exists and belongs to user
+        chat = Chat.query.filter_by(id=chat_id, user_id=user.id).first()
+        if not chat:
+            return jsonify({
+                'success': False,
+                'message': 'Chat not found'
+            }), 404
+        
+        cancel_token = CancelToken(_request_timeout(data))
+        active_turns.start(chat_id, cancel_token)
+        events = queue.Queue()
+        app = current_app._get_current_object()
+        include_snippets = _wants_snippets(data)
+        
+        def generate_turn():
+            with app.app_context():
+                try:
+                    success, message, response_data = RAGService().chat_with_document(
+                        chat_id,
+                        user_message,
+                        cancel_token,
+                        on_token=lambda text: events.put({'type': 'token', 'content': text})
+                    )
+                    if success:
+                        _resolve_sources(response_data, include_snippets)
+                    events.put({'type': 'done', 'success': success, 'message': message, 'data': response_data})
+                except RequestCancelled as e:
+                    events.put({'type': 'cancelled', 'status': e.reason, 'partial_response': e.partial})
+                except GenerationRejected as e:
+                    events.put({'type': 'error', 'message': str(e), 'retry_after': e.retry_after})
+                except Exception as e:
+                    events.put({'type': 'error', 'message': f'Message processing failed: {str(e)}'})
+                finally:
+                    active_turns.finish(chat_id, cancel_token)
+                    events.put(None)
+        
+        threading.Thread(target=generate_turn, daemon=True).start()
+        
+        def stream():
+            try:
+                while True:
+                    try:
+                        event = events.get(timeout=app.config['CHAT_STREAM_HEARTBEAT'])
+                    except queue.Empty:
+                        # Writing is the only way to notice a vanished client
+                        event = {'type': 'ping'}
+                    if event is None:
+                        return
+                    yield json.dumps(event) + '\n'
+            finally:
+                cancel_token.cancel('disconnected')
+        
+        return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Message processing failed: {str(e)}'
+        }), 500
+
+@chat_bp.route('/<int:chat_id>/snippets', methods=['GET'])
+def get_snippets(chat_id):
+    """Get the text of the given chunks of the chat's document
+
+    Query: ?chunks=12,3,7. Message sources carry only chunk references,
+    so clients fetch snippets here when they are shown.
+    """
+    try:
+        user = AuthService.get_current_user()
+        chat = Chat.query.filter_by(id=chat_id, user_id=user.id).first()
+        
+        if not chat:
+            return jsonify({
+                'success': False,
+                'message': 'Chat not found'
+            }), 404
+        
+        try:
+            chunk_indexes = {int(part) for part in request.args.get('chunks', '').split(',') if part.strip()}
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'chunks must be comma-separated chunk indexes'
+            }), 400
+        
+        limit = current_app.config['SNIPPET_BATCH_LIMIT']
+        if not chunk_indexes or len(chunk_indexes) > limit:
+            return jsonify({
+                'success': False,
+                'message': f'Request between 1 and {limit} chunks'
+            }), 400
+        
+        vector_store_id = chat.document.vector_store_id
+        snippets = SourceService().get_snippets(vector_store_id, chunk_indexes)
+        locations = SourceService.get_locations(vector_store_id, chunk_indexes)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'snippets': {str(chunk_index): text for chunk_index, text in sorted(snippets.items())},
+                'pages': {
+                    str(chunk_index): [location['page_start'], location['page_end']]
+                    for chunk_index, location in sorted(locations.items())
+                },
+                'anchors': {str(chunk_index): location['anchors'] for chunk_index, location in sorted(locations.items())}
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to get snippets: {str(e)}'
+        }), 500
+
+@chat_bp.route('/<int:chat_id>/cancel', methods=['POST'])
+def cancel_message(chat_id):
+    """Cancel the chat's in-flight response"""
+    try:
+        user = AuthService.get_current_user()
+        chat = Chat.query.filter_by(id=chat_id, user_id=user.id).first()
+        
+        if not chat:
+            return jsonify({
+                'success': False,
+                'message': 'Chat not found'
+            }), 404
+        
+        cancelled = active_turns.cancel(chat_id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Response cancelled' if cancelled else 'No response in progress',
+            'cancelled': cancelled
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Cancel failed: {str(e)}'
+        }), 500
+
 @chat_bp.route('/<int:chat_id>/clear', methods=['POST'])
 def clear_chat(chat_id):
     """Clear chat message history"""
@@ -189,6 +655,8 @@ def clear_chat(chat_id):
         # Clear messages
         chat.clear_messages()
         db.session.commit()
+        conversation_windows.invalidate(chat.id)
+        end_session(chat.id)
         
         return jsonify({
             'success': True,
@@ -218,6 +686,7 @@ def delete_chat(chat_id):
         # Delete chat (messages will be deleted due to cascade)
         db.session.delete(chat)
         db.session.commit()
+        end_session(chat_id)
         
         return jsonify({
             'success': True,
@@ -3,10 +3,16 @@ Document API Routes
 Complete document management with clean error handling
 """
 
-from flask import Blueprint, request, jsonify, current_app # type: ignore
+import json
+import time
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context # type: ignore
 from werkzeug.utils import secure_filename # type: ignore
 from app.services.document_service import DocumentService
 from app.services.auth_service import AuthService
+from app.services.progress import document_progress, snapshot_event, TERMINAL_STAGES
+from app.models.document import Document
+from app.utils.http_cache import not_modified, with_validators
+from app import db
 
 document_bp = Blueprint('document', __name__)
 
@@ -15,13 +21,18 @@ def list_documents():
     """Get all documents for current user"""
     try:
         user = AuthService.get_current_user()
+        etag, last_modified = DocumentService.get_documents_version(user.id)
+        cached = not_modified(etag, last_modified)
+        if cached:
+            return cached
+        
         documents = DocumentService.get_user_documents(user.id)
         
-        return jsonify({
+        return with_validators(jsonify({
             'success': True,
             'data': documents,
             'count': len(documents)
-        }), 200
+        }), etag, last_modified), 200
         
     except Exception as e:
         return jsonify({
@@ -76,13 +87,19 @@ def get_document(document_id):
     """Get specific document details"""
     try:
         user = AuthService.get_current_user()
+        version = DocumentService.get_document_version(document_id, user.id)
+        if version:
+            cached = not_modified(*version)
+            if cached:
+                return cached
+        
         document = DocumentService.get_document_status(document_id, user.id)
         
         if document:
-            return jsonify({
+            return with_validators(jsonify({
                 'success': True,
                 'data': document
-            }), 200
+            }), *version), 200
         else:
             return jsonify({
                 'success': False,
@@ -100,13 +117,19 @@ def get_document_status(document_id):
     """Get document processing status"""
     try:
         user = AuthService.get_current_user()
+        version = DocumentService.get_document_version(document_id, user.id)
+        if version:
+            cached = not_modified(*version)
+            if cached:
+                return cached
+        
         document = DocumentService.get_document_status(document_id, user.id)
         
         if document:
-            return jsonify({
+            return with_validators(jsonify({
                 'success': True,
                 'data': document
-            }), 200
+            }), *version), 200
         else:
             return jsonify({
                 'success': False,
@@ -119,6 +142,122 @@ def get_document_status(document_id):
             'message': f'Failed to get status: {str(e)}'
         }), 500
 
+@document_bp.route('/<int:document_id>/chunks', methods=['GET'])
+def get_document_chunks(document_id):
+    """Get chunk character spans and pages
+
+    Query: ?page_from=3&page_to=5 keeps the chunks overlapping those pages.
+    """
+    try:
+        user = AuthService.get_current_user()
+        first_page = request.args.get('page_from', type=int)
+        last_page = request.args.get('page_to', type=int)
+        
+        version = DocumentService.get_document_version(document_id, user.id)
+        if version:
+            cached = not_modified(*version)
+            if cached:
+                return cached
+        
+        chunks = DocumentService.get_document_chunks(document_id, user.id, first_page, last_page)
+        
+        if chunks is not None:
+            return with_validators(jsonify({
+                'success': True,
+                'data': {
+                    'chunks': chunks
+                }
+            }), *version), 200
+        else:
+            return jsonify({
+                'success': False,
+                'message': 'Document not found'
+            }), 404
+            
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to get chunks: {str(e)}'
+        }), 500
+
+@document_bp.route('/<int:document_id>/progress/stream', methods=['GET'])
+def stream_document_progress(document_id):
+    """Stream processing progress as server-sent events
+
+    Each `progress` event carries the stage (queued, extracting, chunking,
+    embedding, indexing, completed, error), overall progress 0-100 and,
+    where known, `done`/`total` pages or chunks. Events come from the
+    in-process broker without database reads; the stream ends after
+    `completed` or `error`.
+    """
+    try:
+        user = AuthService.get_current_user()
+        document = Document.query.filter_by(id=document_id, user_id=user.id).first()
+        if not document:
+            return jsonify({
+                'success': False,
+                'message': 'Document not found'
+            }), 404
+        
+        stored = snapshot_event(document)
+        # Don't hold a read transaction open for the life of the stream
+        db.session.close()
+        subscription = document_progress.subscribe(document_id)
+        config = current_app.config
+        
+        def stream():
+            with subscription:
+                yield "retry: 3000\n\n"
+                
+                # Nothing published here: finished long ago, or being
+                # processed by another worker process
+                last = stored
+                if document_progress.latest(document_id) is None:
+                    yield _sse(last)
+                    if last['stage'] in TERMINAL_STAGES:
+                        return
+                
+                heard = False
+                last_check = time.monotonic()
+                while True:
+                    event = subscription.get(timeout=config['PROGRESS_STREAM_HEARTBEAT'])
+                    if event is not None:
+                        heard = True
+                        yield _sse(event)
+                        if event['stage'] in TERMINAL_STAGES:
+                            return
+                        continue
+                    
+                    yield ": ping\n\n"
+                    if not heard and time.monotonic() - last_check >= config['PROGRESS_FALLBACK_INTERVAL']:
+                        last_check = time.monotonic()
+                        current = db.session.get(Document, document_id)
+                        event = snapshot_event(current) if current else None
+                        db.session.close()
+                        if event is None:
+                            return
+                        if (event['stage'], event['progress']) != (last['stage'], last['progress']):
+                            last = event
+                            yield _sse(event)
+                        if event['stage'] in TERMINAL_STAGES:
+                            return
+        
+        return Response(
+            stream_with_context(stream()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to stream progress: {str(e)}'
+        }), 500
+
+def _sse(event):
+    """Format a stage event as a server-sent event"""
+    return f"id: {event['id']}\nevent: progress\ndata: {json.dumps(event)}\n\n"
+
 @document_bp.route('/<int:document_id>', methods=['DELETE'])
 def delete_document(document_id):
     """Delete document"""
@@ -0,0 +1,42 @@
+"""
+System API Routes
+Operational metrics and readiness for the running process
+"""
+
+from flask import Blueprint, jsonify # type: ignore
+from app.utils.metrics import metrics
+from app.services.warmup import warmup
+
+system_bp = Blueprint('system', __name__)
+
+@system_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Get in-process performance metrics"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': metrics.snapshot()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to get metrics: {str(e)}'
+        }), 500
+
+@system_bp.route('/ready', methods=['GET'])
+def get_readiness():
+    """Report ready only once models and hot documents are warm"""
+    try:
+        status = warmup.status()
+        return jsonify({
+            'success': status['ready'],
+            'message': 'Ready' if status['ready'] else f"Warm-up {status['state']}",
+            'data': status
+        }), 200 if status['ready'] else 503
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to get readiness: {str(e)}'
+        }), 500
@@ -2,8 +2,19 @@
 Services package for SAV.IN application
 """
 
-from .auth_service import AuthService
-from .document_service import DocumentService
-from .rag_service import RAGService
+import importlib
 
-__all__ = ['AuthService', 'DocumentService', 'RAGService']
+# Service classes load on first access, so importing one light module from
+# this package doesn't drag in the ML stack behind RAGService
+_SERVICES = {
+    'AuthService': '.auth_service',
+    'DocumentService': '.document_service',
+    'RAGService': '.rag_service'
+}
+
+__all__ = list(_SERVICES)
+
+def __getattr__(name):
+    if name not in _SERVICES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_SERVICES[name], __name__), name)
@@ -0,0 +1,133 @@
+"""
+Semantic Answer Cache
+Reuses answers for near-identical questions asked about the same document
+"""
+
+import re
+import time
+import threading
+from collections import OrderedDict
+import numpy as np # type: ignore
+from app.utils.metrics import metrics
+from app.utils.vector_ops import normalize_rows
+
+# Words that only make sense relative to earlier turns
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(and|but|also|so|then|what about|how about|why)\b"
+    r"|\b(it|its|that|this|those|these|they|them|their|he|she|his|her|above|previous|earlier|again|more)\b",
+    re.IGNORECASE
+)
+
+def is_follow_up(message, has_history):
+    """Check whether a question depends on conversation history"""
+    if not has_history:
+        return False
+    return len(message.split()) < 4 or bool(FOLLOW_UP_PATTERN.search(message))
+
+class AnswerCache:
+    def __init__(self, threshold=0.95, ttl=3600, max_entries_per_document=64, max_documents=256):
+        """Create a cache of vector_store_id -> recent (question, answer) entries"""
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries_per_document = max_entries_per_document
+        self.max_documents = max_documents
+        self._lock = threading.Lock()
+        self._documents = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def configure(self, threshold, ttl, max_entries_per_document, max_documents):
+        """Apply application settings"""
+        with self._lock:
+            self.threshold = threshold
+            self.ttl = ttl
+            self.max_entries_per_document = max_entries_per_document
+            self.max_documents = max_documents
+
+    def lookup(self, vector_store_id, version, embedding):
+        """Get the best cached entry above the similarity threshold"""
+        with self._lock:
+            bucket = self._get_bucket(vector_store_id, version)
+            if not bucket or not bucket['entries']:
+                self.misses += 1
+                return None
+
+            if bucket['matrix'] is None:
+                bucket['matrix'] = np.vstack([entry['embedding'] for entry in bucket['entries']])
+
+            similarities = bucket['matrix'] @ normalize_rows(embedding)[0]
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            entry = bucket['entries'][best]
+            return dict(entry, similarity=float(similarities[best]))
+
+    def store(self, vector_store_id, version, embedding, answer, sources):
+        """Cache an answer for a question embedding"""
+        with self._lock:
+            bucket = self._get_bucket(vector_store_id, version)
+            if bucket is None:
+                bucket = {'version': version, 'entries': [], 'matrix': None}
+                self._documents[vector_store_id] = bucket
+
+            bucket['entries'].append({
+                'embedding': normalize_rows(embedding)[0],
+                'answer': answer,
+                'sources': sources,
+                'created_at': time.monotonic()
+            })
+            del bucket['entries'][:-self.max_entries_per_document]
+            bucket['matrix'] = None
+
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+
+    def record_bypass(self):
+        """Count a lookup skipped because the question was a follow-up"""
+        with self._lock:
+            self.bypassed += 1
+
+    def invalidate(self, vector_store_id):
+        """Drop every cached answer for a document"""
+        with self._lock:
+            self._documents.pop(vector_store_id, None)
+
+    def stats(self):
+        """Get hit-rate statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'documents': len(self._documents),
+                'entries': sum(len(bucket['entries']) for bucket in self._documents.values())
+            }
+
+    def _get_bucket(self, vector_store_id, version):
+        """Get a live bucket, dropping expired entries (lock must be held)"""
+        bucket = self._documents.get(vector_store_id)
+        if bucket is None:
+            return None
+
+        if bucket['version'] != version:
+            del self._documents[vector_store_id]
+            return None
+
+        now = time.monotonic()
+        fresh = [entry for entry in bucket['entries'] if now - entry['created_at'] <= self.ttl]
+        if len(fresh) != len(bucket['entries']):
+            bucket['entries'] = fresh
+            bucket['matrix'] = None
+
+        self._documents.move_to_end(vector_store_id)
+        return bucket
+
+# Shared cache for the whole process
+answer_cache = AnswerCache()
+metrics.register_collector('answer_cache', answer_cache.stats)
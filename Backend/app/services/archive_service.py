@@ -0,0 +1,254 @@
+"""
+Archive Service
+Compressed cold storage for old chat messages, and history pages across both tiers
+"""
+
+import json
+import zlib
+from datetime import datetime, timedelta
+from flask import current_app # type: ignore
+from sqlalchemy import event, func, or_, text # type: ignore
+from app import db
+from app.models.chat import Chat, ChatMessage, ChatMessageArchive
+from app.utils.cache import LRUCache
+from app.utils.metrics import metrics
+
+try:
+    import zstandard # type: ignore
+except ImportError:  # zlib only
+    zstandard = None
+
+# Decompressed archive batches by (id, created_at); a batch never changes once
+# written, and created_at tells a reused SQLite rowid from a cleared chat apart
+archive_cache = LRUCache('message_archives', maxsize=64)
+
+# Columns carried into the archive; chat_id is on the archive row
+MESSAGE_FIELDS = ('id', 'role', 'content', 'sources', 'token_count', 'status',
+                  'model_used', 'processing_time', 'confidence_score')
+
+# Archived text is searched through its own contentless FTS5 index, so it
+# isn't stored uncompressed again. A message's rowid there encodes where it
+# lives: archive id * ARCHIVE_ROWID_SPAN + position in the batch.
+ARCHIVE_ROWID_SPAN = 1 << 20
+
+_INDEX_MESSAGE = text("INSERT INTO chat_message_archives_fts(rowid, content) VALUES (:rowid, :content)")
+_UNINDEX_MESSAGE = text(
+    "INSERT INTO chat_message_archives_fts(chat_message_archives_fts, rowid, content) "
+    "VALUES ('delete', :rowid, :content)"
+)
+
+def compress(data, codec):
+    """Compress bytes with 'zstd' or 'zlib'"""
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+def decompress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('zstandard is needed to read zstd message archives')
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+def archive_search_exists(connection):
+    """Check whether the database has the archived-message search index"""
+    return connection.dialect.name == 'sqlite' and connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_message_archives_fts'"
+    )).first() is not None
+
+def index_archive(connection, archive_id, messages, remove=False):
+    """Add a batch's messages to the archive search index, or remove them
+
+    Removal must pass the exact text that was indexed; a contentless
+    index cannot look it up.
+    """
+    rows = [
+        {'rowid': archive_id * ARCHIVE_ROWID_SPAN + position, 'content': message['content']}
+        for position, message in enumerate(messages)
+    ]
+    if rows:
+        connection.execute(_UNINDEX_MESSAGE if remove else _INDEX_MESSAGE, rows)
+
+def reindex_archives(connection):
+    """Rebuild the archive search index from every archive; returns messages indexed"""
+    connection.execute(text("INSERT INTO chat_message_archives_fts(chat_message_archives_fts) VALUES ('delete-all')"))
+    indexed = 0
+    for archive_id, codec, data in connection.execute(text("SELECT id, codec, data FROM chat_message_archives")):
+        messages = json.loads(decompress(data, codec))
+        index_archive(connection, archive_id, messages)
+        indexed += len(messages)
+    return indexed
+
+class ArchiveService:
+    def __init__(self, config=None):
+        """Move old messages out of chat_messages into compressed batches
+
+        A chat keeps its newest MAX_CHAT_HISTORY messages hot; older ones,
+        and ones older than ARCHIVE_AFTER_DAYS beyond the memory buffer, are
+        archived in runs of ARCHIVE_BATCH_MESSAGES. Messages a summary has
+        not folded in yet always stay hot, so memory never reads the archive.
+        Archived text stays searchable through chat_message_archives_fts.
+        """
+        self.config = config or current_app.config
+
+    @property
+    def codec(self):
+        return 'zstd' if self.config['ARCHIVE_CODEC'] == 'zstd' and zstandard is not None else 'zlib'
+
+    def archivable(self, chat, now=None):
+        """Get [(id, created_at)] of the chat's messages due for the archive, oldest first"""
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=self.config['ARCHIVE_AFTER_DAYS'])
+        keep = self.config['MAX_CHAT_HISTORY']
+        keep_recent = self.config['MEMORY_BUFFER_MESSAGES']
+
+        query = db.session.query(ChatMessage.id, ChatMessage.created_at).filter(ChatMessage.chat_id == chat.id)
+        if (chat.memory_type or 'buffer') != 'buffer':
+            query = query.filter(ChatMessage.id <= (chat.summary_message_id or 0))
+        newest_first = query.order_by(ChatMessage.id.desc()).all()
+
+        due = [
+            (message_id, created_at)
+            for position, (message_id, created_at) in enumerate(newest_first)
+            if position >= keep or (position >= keep_recent and created_at < cutoff)
+        ]
+        return due[::-1]
+
+    def archive_chat(self, chat, now=None, dry_run=False):
+        """Archive a chat's due messages in whole batches
+
+        A trailing partial batch waits for more messages unless all of it is
+        past the age limit. Returns (messages archived, raw bytes, stored bytes).
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=self.config['ARCHIVE_AFTER_DAYS'])
+        size = min(self.config['ARCHIVE_BATCH_MESSAGES'], ARCHIVE_ROWID_SPAN)
+        due = self.archivable(chat, now)
+        batches = [due[i:i + size] for i in range(0, len(due), size)]
+        if batches and len(batches[-1]) < size and batches[-1][-1][1] >= cutoff:
+            batches.pop()
+
+        archived = raw_bytes = stored_bytes = 0
+        codec = self.codec
+        searchable = bool(batches) and not dry_run and archive_search_exists(db.session.connection())
+        for batch in batches:
+            first_id, last_id = batch[0][0], batch[-1][0]
+            messages = ChatMessage.query.filter(ChatMessage.chat_id == chat.id,
+                                                ChatMessage.id.between(first_id, last_id))\
+                                        .order_by(ChatMessage.id)\
+                                        .all()
+            records = [
+                {**{field: getattr(message, field) for field in MESSAGE_FIELDS},
+                 'created_at': message.created_at.isoformat()}
+                for message in messages
+            ]
+            raw = json.dumps(records, separators=(',', ':')).encode('utf-8')
+            data = compress(raw, codec)
+
+            archived += len(messages)
+            raw_bytes += len(raw)
+            stored_bytes += len(data)
+            if dry_run:
+                continue
+
+            archive = ChatMessageArchive(
+                chat_id=chat.id,
+                first_message_id=first_id,
+                last_message_id=last_id,
+                first_created_at=messages[0].created_at,
+                last_created_at=messages[-1].created_at,
+                message_count=len(messages),
+                codec=codec,
+                data=data,
+                raw_size=len(raw)
+            )
+            db.session.add(archive)
+            if searchable:
+                db.session.flush()
+                index_archive(db.session.connection(), archive.id, records)
+            ChatMessage.query.filter(ChatMessage.chat_id == chat.id,
+                                     ChatMessage.id.between(first_id, last_id))\
+                             .delete(synchronize_session=False)
+
+        if archived and not dry_run:
+            db.session.commit()
+            metrics.increment('archive.messages', archived)
+        return archived, raw_bytes, stored_bytes
+
+    def archive_all(self, dry_run=False):
+        """Archive every chat that has messages due; returns per-chat results"""
+        now = datetime.utcnow()
+        cutoff = now - timedelta(days=self.config['ARCHIVE_AFTER_DAYS'])
+        chat_ids = [chat_id for chat_id, in db.session.query(ChatMessage.chat_id)
+                    .group_by(ChatMessage.chat_id)
+                    .having(or_(func.count(ChatMessage.id) > self.config['MAX_CHAT_HISTORY'],
+                                func.min(ChatMessage.created_at) < cutoff))
+                    .all()]
+
+        results = {}
+        for chat_id in chat_ids:
+            chat = db.session.get(Chat, chat_id)
+            result = self.archive_chat(chat, now, dry_run)
+            if result[0]:
+                results[chat_id] = result
+        return results
+
+    def get_history_page(self, chat_id, before=None, limit=None):
+        """Get up to `limit` messages older than message id `before`, oldest first
+
+        Starts at the newest message when `before` is None and reads on into
+        the archive once the hot table runs out. Returns (messages, has_more).
+        """
+        limit = limit or self.config['HISTORY_PAGE_SIZE']
+        query = ChatMessage.query.filter_by(chat_id=chat_id)
+        if before is not None:
+            query = query.filter(ChatMessage.id < before)
+        hot = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+        page = [message.to_dict() for message in hot[:limit]]
+        if len(hot) > limit:
+            return page[::-1], True
+
+        # Scrolled past the hot table: continue newest-first through the archive
+        archives = ChatMessageArchive.query.filter(ChatMessageArchive.chat_id == chat_id)
+        if before is not None:
+            archives = archives.filter(ChatMessageArchive.first_message_id < before)
+        for archive in archives.order_by(ChatMessageArchive.last_message_id.desc()):
+            for fields in reversed(self.load(archive)):
+                if before is not None and fields['id'] >= before:
+                    continue
+                if len(page) == limit:
+                    return page[::-1], True
+                page.append(self._as_dict(chat_id, fields))
+        return page[::-1], False
+
+    def load(self, archive):
+        """Get an archive's message fields, decompressing each batch once"""
+        key = (archive.id, archive.created_at)
+        fields = archive_cache.get(key)
+        if fields is None:
+            fields = json.loads(decompress(archive.data, archive.codec))
+            archive_cache.put(key, fields)
+            metrics.increment('archive.batches_read')
+        return fields
+
+    @staticmethod
+    def _as_dict(chat_id, fields):
+        """Render archived fields exactly as ChatMessage.to_dict does"""
+        message = ChatMessage(
+            chat_id=chat_id,
+            created_at=datetime.fromisoformat(fields['created_at']),
+            **{field: fields[field] for field in MESSAGE_FIELDS}
+        )
+        data = message.to_dict()
+        data['archived'] = True
+        return data
+
+@event.listens_for(ChatMessageArchive, 'after_delete')
+def _unindex_deleted_archive(mapper, connection, target):
+    """Drop a deleted batch from search: clear_messages and chat/document cascades"""
+    if archive_search_exists(connection):
+        index_archive(connection, target.id, json.loads(decompress(target.data, target.codec)), remove=True)
+
+def init_archive(app):
+    """Size the decompressed-batch cache from application config"""
+    archive_cache.configure(maxsize=app.config['ARCHIVE_CACHE_SIZE'])
@@ -0,0 +1,33 @@
+"""
+Batching Service
+Shared micro-batchers for query embeddings and FAISS searches
+"""
+
+import numpy as np # type: ignore
+from app.utils.batcher import MicroBatcher
+from app.services.ollama_client import get_client
+from app.services.endpoint_pool import embedding_pool
+
+def _embed_batch(model, texts):
+    """Embed queued query texts for one model in one call"""
+    return embedding_pool.call(lambda endpoint: get_client(endpoint.url).embed(model, texts))
+
+def _search_batch(key, items):
+    """Search queued queries against one index in one call
+
+    Items are (index, query_vector, k); the batch is searched with the
+    largest k and each result is trimmed back to its own k.
+    """
+    index = items[0][0]
+    queries = np.vstack([query for _, query, _ in items]).astype(np.float32)
+    max_k = max(k for _, _, k in items)
+    scores, indices = index.search(queries, max_k)
+    return [(scores[row:row + 1, :k], indices[row:row + 1, :k]) for row, (_, _, k) in enumerate(items)]
+
+query_embedding_batcher = MicroBatcher('query_embeddings', _embed_batch)
+search_batcher = MicroBatcher('faiss_search', _search_batch)
+
+def init_batchers(app):
+    """Apply the configured wait window and batch size"""
+    for batcher in (query_embedding_batcher, search_batcher):
+        batcher.configure(app.config['MICROBATCH_WINDOW_MS'], app.config['MICROBATCH_MAX_SIZE'])
@@ -0,0 +1,121 @@
+"""
+Context Compressor
+Query-focused sentence selection over retrieved chunks
+"""
+
+import re
+import time
+import hashlib
+import numpy as np # type: ignore
+from app.utils.cache import LRUCache
+from app.utils.metrics import metrics
+from app.utils.vector_ops import cosine_similarity_matrix
+from app.services.prompt_builder import count_tokens
+
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?;])\s+|\n+')
+
+# (embedding model, sentence hash) -> embedding; chunks recur across turns
+sentence_cache = LRUCache('sentence_embeddings', maxsize=8192)
+
+def split_sentences(text, min_chars=25):
+    """Split text into sentences, folding short fragments into their neighbour"""
+    sentences = []
+    for piece in _SENTENCE_BOUNDARY.split(text):
+        piece = piece.strip()
+        if not piece:
+            continue
+        if sentences and (len(piece) < min_chars or len(sentences[-1]) < min_chars):
+            sentences[-1] = f'{sentences[-1]} {piece}'
+        else:
+            sentences.append(piece)
+    return sentences
+
+class ContextCompressor:
+    def __init__(self, embeddings, model, max_tokens=400, min_relative=0.6):
+        """Compress retrieved chunks to the sentences most similar to the question
+
+        `max_tokens` bounds the total kept; sentences scoring below
+        `min_relative` times the best sentence are never kept.
+        """
+        self.embeddings = embeddings
+        self.model = model
+        self.max_tokens = max_tokens
+        self.min_relative = min_relative
+        self.stats = {}
+
+    def compress(self, query_embedding, documents):
+        """Return documents holding only their best sentences, in rank order
+
+        Chunks left with no selected sentence are dropped. Sentence order
+        inside a chunk is preserved and gaps are marked with an ellipsis.
+        """
+        start = time.perf_counter()
+        split = [split_sentences(doc.page_content) for doc in documents]
+        sentences = [sentence for parts in split for sentence in parts]
+        if not sentences:
+            return documents
+
+        scores = cosine_similarity_matrix(self._embed(sentences), query_embedding).ravel()
+        costs = np.asarray([count_tokens(sentence) for sentence in sentences])
+
+        selected = np.zeros(len(sentences), dtype=bool)
+        floor = scores.max() * self.min_relative
+        used = 0
+        for index in np.argsort(-scores):
+            if scores[index] < floor:
+                break
+            if used + costs[index] > self.max_tokens and selected.any():
+                continue
+            selected[index] = True
+            used += costs[index]
+
+        compressed = []
+        offset = 0
+        for doc, parts in zip(documents, split):
+            keep = selected[offset:offset + len(parts)]
+            offset += len(parts)
+            if not keep.any():
+                continue
+            text = self._join(parts, keep)
+            compressed.append(type(doc)(page_content=text, metadata={**doc.metadata, 'compressed': True}))
+
+        before = int(costs.sum())
+        self.stats = {
+            'chunks_in': len(documents),
+            'chunks_kept': len(compressed),
+            'sentences_in': len(sentences),
+            'sentences_kept': int(selected.sum()),
+            'tokens_before': before,
+            'tokens_after': int(used),
+            'compress_ms': round((time.perf_counter() - start) * 1000, 3)
+        }
+        metrics.observe('compression.compress_ms', self.stats['compress_ms'])
+        metrics.increment('compression.tokens_saved', before - int(used))
+        return compressed
+
+    def _embed(self, sentences):
+        """Embed sentences, reusing cached vectors and batching the rest"""
+        keys = [(self.model, hashlib.sha1(sentence.encode('utf-8')).hexdigest()) for sentence in sentences]
+        vectors = [sentence_cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fresh = self.embeddings.embed_documents([sentences[i] for i in missing])
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+                sentence_cache.put(keys[i], vector)
+        return np.asarray(vectors, dtype=np.float32)
+
+    @staticmethod
+    def _join(parts, keep):
+        """Join kept sentences, marking skipped runs with an ellipsis"""
+        pieces = []
+        skipped = False
+        for sentence, kept in zip(parts, keep):
+            if not kept:
+                skipped = True
+                continue
+            if skipped and pieces:
+                pieces.append('…')
+            pieces.append(sentence)
+            skipped = False
+        return ' '.join(pieces)
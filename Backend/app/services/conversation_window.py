@@ -0,0 +1,199 @@
+"""
+Conversation Windows
+Process-local ring buffers of each active chat's recent messages
+"""
+
+import time
+import threading
+from collections import OrderedDict, deque
+from sqlalchemy import event, inspect # type: ignore
+from sqlalchemy.orm import Session, object_session # type: ignore
+from app.models.chat import Chat, ChatMessage
+from app.utils.metrics import metrics
+
+class WindowMessage:
+    __slots__ = ('id', 'role', 'content', 'status')
+
+    def __init__(self, id, role, content, status):
+        self.id = id
+        self.role = role
+        self.content = content
+        self.status = status
+
+    @classmethod
+    def from_model(cls, message):
+        return cls(message.id, message.role, message.content, message.status)
+
+    def is_complete(self):
+        """Check whether the message finished normally"""
+        return (self.status or 'complete') == 'complete'
+
+class ConversationWindows:
+    def __init__(self, size=10, idle_ttl=900, max_chats=1024):
+        """Keep the last `size` messages of up to `max_chats` chats
+
+        Windows idle for `idle_ttl` seconds are dropped; the next read
+        refills them from the database. Each window also remembers the
+        chat's message_count, so a window that missed messages committed by
+        another worker process is noticed and refilled.
+        """
+        self.size = size
+        self.idle_ttl = idle_ttl
+        self.max_chats = max_chats
+        self._lock = threading.Lock()
+        self._windows = OrderedDict()  # chat_id -> (deque, last access, message_count)
+        # Fills and appends for the same chat are serialized so a fill that
+        # raced a commit can never drop the committed message
+        self._stripes = [threading.Lock() for _ in range(64)]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, size, idle_ttl, max_chats):
+        """Apply application settings, dropping windows of the old size"""
+        with self._lock:
+            if size != self.size:
+                self._windows.clear()
+            self.size = size
+            self.idle_ttl = idle_ttl
+            self.max_chats = max_chats
+
+    def recent(self, chat_id, limit=None, message_count=None):
+        """Get a chat's recent messages, oldest first
+
+        Pass the chat's message_count as loaded for this request: a window
+        that counted a different number of messages is refilled.
+        """
+        with self._lock:
+            self._evict_idle()
+            entry = self._windows.get(chat_id)
+            if entry is not None and self._current(entry, message_count):
+                self._windows[chat_id] = (entry[0], time.monotonic(), entry[2])
+                self._windows.move_to_end(chat_id)
+                self.hits += 1
+                return self._tail(list(entry[0]), limit)
+            self.misses += 1
+
+        with self._stripe(chat_id):
+            with self._lock:
+                entry = self._windows.get(chat_id)
+            if entry is None or not self._current(entry, message_count):
+                messages = ChatMessage.query.filter_by(chat_id=chat_id)\
+                    .order_by(ChatMessage.id.desc())\
+                    .limit(self.size)\
+                    .all()[::-1]
+                window = deque((WindowMessage.from_model(msg) for msg in messages), maxlen=self.size)
+                with self._lock:
+                    self._windows[chat_id] = (window, time.monotonic(), message_count)
+                    self._evict_overflow()
+                    return self._tail(list(window), limit)
+            with self._lock:
+                return self._tail(list(entry[0]), limit)
+
+    def append(self, chat_id, message, message_count=None):
+        """Write a committed message through to the chat's window, if loaded"""
+        with self._stripe(chat_id):
+            with self._lock:
+                entry = self._windows.get(chat_id)
+                if entry is None:
+                    return
+                window = entry[0]
+                if window and window[-1].id >= message.id:
+                    return
+                window.append(message)
+                # Unknown counts keep the old one, so the next read refills
+                if message_count is not None:
+                    self._windows[chat_id] = (window, entry[1], message_count)
+
+    def invalidate(self, chat_id):
+        """Forget a chat's window after its messages were cleared or deleted"""
+        with self._stripe(chat_id):
+            with self._lock:
+                self._windows.pop(chat_id, None)
+
+    def stats(self):
+        """Get window usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'chats': len(self._windows),
+                'size': self.size,
+                'max_chats': self.max_chats,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
+
+    def _stripe(self, chat_id):
+        return self._stripes[hash(chat_id) % len(self._stripes)]
+
+    @staticmethod
+    def _current(entry, message_count):
+        """Check a window against the caller's message_count, when both are known"""
+        return message_count is None or entry[2] is None or entry[2] == message_count
+
+    @staticmethod
+    def _tail(messages, limit):
+        return messages[-limit:] if limit else messages
+
+    def _evict_idle(self):
+        """Drop windows unused for idle_ttl seconds (lock must be held)"""
+        now = time.monotonic()
+        while self._windows:
+            chat_id, (_, last_access, _) = next(iter(self._windows.items()))
+            if now - last_access <= self.idle_ttl:
+                break
+            del self._windows[chat_id]
+            self.evictions += 1
+
+    def _evict_overflow(self):
+        """Drop least recently used windows beyond max_chats (lock must be held)"""
+        while len(self._windows) > self.max_chats:
+            self._windows.popitem(last=False)
+            self.evictions += 1
+
+# Shared windows for the whole process
+conversation_windows = ConversationWindows()
+metrics.register_collector('conversation_windows', conversation_windows.stats)
+
+def init_conversation_windows(app):
+    """Configure the windows from application config"""
+    conversation_windows.configure(
+        app.config['MEMORY_BUFFER_MESSAGES'],
+        app.config['CONVERSATION_WINDOW_IDLE_TTL'],
+        app.config['CONVERSATION_WINDOW_MAX_CHATS']
+    )
+
+# Write-through: stage inserts and deletes during the flush, apply them once
+# the transaction commits, and forget them if it rolls back
+
+@event.listens_for(ChatMessage, 'after_insert')
+def _stage_message(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        # The chat's new message_count, if it was updated in this session;
+        # read without loading anything mid-flush
+        chat = session.identity_map.get(Session.identity_key(Chat, target.chat_id))
+        message_count = inspect(chat).dict.get('message_count') if chat is not None else None
+        session.info.setdefault('window_messages', []).append(
+            (target.chat_id, WindowMessage.from_model(target), message_count)
+        )
+
+@event.listens_for(Chat, 'after_delete')
+def _stage_chat_delete(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('window_invalidations', set()).add(target.id)
+
+@event.listens_for(Session, 'after_commit')
+def _apply_staged(session):
+    for chat_id, message, message_count in session.info.pop('window_messages', []):
+        conversation_windows.append(chat_id, message, message_count)
+    for chat_id in session.info.pop('window_invalidations', ()):
+        conversation_windows.invalidate(chat_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_staged(session):
+    session.info.pop('window_messages', None)
+    session.info.pop('window_invalidations', None)
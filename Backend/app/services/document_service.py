@@ -4,16 +4,29 @@ Enhanced with robust error handling and status tracking
 """
 
 import os
-import PyPDF2 # type: ignore
 from datetime import datetime
 from flask import current_app # type: ignore
+from sqlalchemy import func # type: ignore
 from app import db
-from app.models.document import Document
+from app.models.document import Document, DocumentChunk
 from app.models.chat import Chat
 from app.services.rag_service import RAGService
+from app.services.warmup import warmup
+from app.services.progress import document_progress
+from app.utils.http_cache import make_etag
 import threading
 
 class DocumentService:
+    # Span of the 0-100 progress bar covered by each stage
+    PROGRESS_STAGES = {
+        'queued': (0, 0),
+        'extracting': (10, 30),
+        'chunking': (30, 35),
+        'embedding': (35, 90),
+        'indexing': (90, 95),
+        'completed': (100, 100)
+    }
+
     @staticmethod
     def upload_document(file, user_id):
         """Upload and process PDF document"""
@@ -55,11 +68,12 @@ class DocumentService:
             
             db.session.add(document)
             db.session.commit()
+            DocumentService._publish_progress(document.id, 'queued')
             
             # Start async processing
             thread = threading.Thread(
                 target=DocumentService._process_document_async,
-                args=(document.id,)
+                args=(current_app._get_current_object(), document.id)
             )
             thread.daemon = True
             thread.start()
@@ -78,26 +92,27 @@ class DocumentService:
         return f"{timestamp}_{safe_name}{ext}"
     
     @staticmethod
-    def _process_document_async(document_id):
+    def _process_document_async(app, document_id):
         """Process document in background"""
-        from app import create_app
-        
-        app = create_app()
         with app.app_context():
             try:
                 document = Document.query.get(document_id)
                 if not document:
                     return
                 
+                def on_progress(stage, done=0, total=0):
+                    DocumentService._publish_progress(document_id, stage, done, total)
+                
                 # Update status to processing
                 document.update_status('processing', 10)
                 db.session.commit()
                 
                 # Extract text from PDF
-                text_content = DocumentService._extract_pdf_text(document.file_path)
+                text_content = DocumentService._extract_pdf_text(document.file_path, on_progress)
                 if not text_content.strip():
                     document.update_status('error', error_message='No readable text found in PDF')
                     db.session.commit()
+                    DocumentService._publish_error(document_id, 'No readable text found in PDF')
                     return
                 
                 document.update_status('processing', 30)
@@ -108,13 +123,14 @@ class DocumentService:
                 success, message, vector_store_id = rag_service.process_document(
                     text_content=text_content,
                     document_id=document_id,
-                    filename=document.original_filename
+                    filename=document.original_filename,
+                    on_progress=on_progress
                 )
                 
                 if success:
                     # Update document
                     document.vector_store_id = vector_store_id
-                    document.chunk_count = len(text_content) // current_app.config['CHUNK_SIZE'] + 1
+                    document.chunk_count = document.chunks.count()
                     document.update_status('completed', 100)
                     
                     # Create default chat session
@@ -124,9 +140,19 @@ class DocumentService:
                         document_id=document.id
                     )
                     db.session.add(chat)
+                    db.session.commit()
+                    
+                    # The first question usually follows right away
+                    warmup.warm_document(vector_store_id, background=False)
+                    DocumentService._publish_progress(
+                        document_id, 'completed',
+                        chunk_count=document.chunk_count,
+                        chat_id=chat.id
+                    )
                     
                 else:
                     document.update_status('error', error_message=message)
+                    DocumentService._publish_error(document_id, message)
                 
                 db.session.commit()
                 
@@ -138,15 +164,38 @@ class DocumentService:
                         db.session.commit()
                 except:
                     pass
+                DocumentService._publish_error(document_id, str(e))
                 print(f"Document processing error: {e}")
     
     @staticmethod
-    def _extract_pdf_text(file_path):
-        """Extract text from PDF file"""
+    def _publish_progress(document_id, stage, done=0, total=0, **fields):
+        """Publish a stage event with overall progress scaled to 0-100"""
+        start, end = DocumentService.PROGRESS_STAGES[stage]
+        progress = start + (end - start) * done // total if total else start
+        if total:
+            fields.update(done=done, total=total)
+        document_progress.publish(document_id, stage, progress, **fields)
+    
+    @staticmethod
+    def _publish_error(document_id, message):
+        """Publish a failure at the progress the document had reached"""
+        latest = document_progress.latest(document_id)
+        document_progress.publish(
+            document_id, 'error',
+            latest['progress'] if latest else 0,
+            error_message=message
+        )
+    
+    @staticmethod
+    def _extract_pdf_text(file_path, on_progress=None):
+        """Extract text from PDF file, reporting each page to `on_progress`"""
+        import PyPDF2 # type: ignore
+        
         try:
             text = ""
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
+                page_count = len(pdf_reader.pages)
                 for page_num, page in enumerate(pdf_reader.pages):
                     try:
                         page_text = page.extract_text()
@@ -156,6 +205,9 @@ class DocumentService:
                     except Exception as e:
                         print(f"Error extracting page {page_num + 1}: {e}")
                         continue
+                    finally:
+                        if on_progress:
+                            on_progress('extracting', page_num + 1, page_count)
             
             return text.strip()
             
@@ -171,6 +223,31 @@ class DocumentService:
                                  .all()
         return [doc.to_dict() for doc in documents]
     
+    @staticmethod
+    def get_documents_version(user_id):
+        """Get (etag, last_modified) of a user's document list without loading it"""
+        count, latest = db.session.query(func.count(Document.id), func.max(Document.updated_at))\
+                                  .filter(Document.user_id == user_id)\
+                                  .one()
+        # chat_count changes when chats come and go, which leaves documents untouched
+        chats, newest_chat = db.session.query(func.count(Chat.id), func.max(Chat.id))\
+                                       .filter(Chat.user_id == user_id)\
+                                       .one()
+        return make_etag('documents', user_id, count, latest, chats, newest_chat), latest
+    
+    @staticmethod
+    def get_document_version(document_id, user_id):
+        """Get (etag, last_modified) of one document, or None if not found"""
+        row = db.session.query(Document.updated_at, func.count(Chat.id), func.max(Chat.id))\
+                        .outerjoin(Chat, Chat.document_id == Document.id)\
+                        .filter(Document.id == document_id, Document.user_id == user_id)\
+                        .group_by(Document.id)\
+                        .first()
+        if row is None:
+            return None
+        updated_at, chats, newest_chat = row
+        return make_etag('document', document_id, updated_at, chats, newest_chat), updated_at
+    
     @staticmethod
     def get_document_status(document_id, user_id):
         """Get document processing status"""
@@ -179,6 +256,17 @@ class DocumentService:
             return document.to_dict()
         return None
     
+    @staticmethod
+    def get_document_chunks(document_id, user_id, first_page=None, last_page=None):
+        """Get a document's chunk spans, optionally only those on a page range
+
+        Returns None if the document doesn't exist.
+        """
+        if not db.session.query(Document.id).filter_by(id=document_id, user_id=user_id).first():
+            return None
+        query = DocumentChunk.for_pages(document_id, first_page, last_page)
+        return [chunk.to_dict() for chunk in query]
+    
     @staticmethod
     def delete_document(document_id, user_id):
         """Delete document and associated data"""
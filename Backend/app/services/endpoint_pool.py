@@ -0,0 +1,224 @@
+"""
+Ollama Endpoint Pool
+Least-outstanding-requests balancing with health checks and circuit breaking
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+import requests # type: ignore
+from app.utils.metrics import metrics
+
+class NoHealthyEndpoint(Exception):
+    """Raised when every endpoint in a pool is down or circuit-open"""
+
+class Endpoint:
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.healthy = True
+        self.failures = 0
+        self.circuit = 'closed'  # closed, open, half_open
+        self.opened_at = None
+        self.requests = 0
+        self.errors = 0
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'url': self.url,
+            'outstanding': self.outstanding,
+            'healthy': self.healthy,
+            'circuit': self.circuit,
+            'failures': self.failures,
+            'requests': self.requests,
+            'errors': self.errors
+        }
+
+class EndpointPool:
+    def __init__(self, name, urls=(), failure_threshold=3, cooldown=30, health_interval=10):
+        """Create a pool; health checks start lazily on first use"""
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._endpoints = [Endpoint(url) for url in urls]
+        self._health_pid = None
+
+    def configure(self, urls, failure_threshold, cooldown, health_interval):
+        """Replace the endpoint list, keeping state for URLs already known"""
+        with self._lock:
+            known = {endpoint.url: endpoint for endpoint in self._endpoints}
+            self._endpoints = [known.get(url.rstrip('/')) or Endpoint(url) for url in urls]
+            self.failure_threshold = failure_threshold
+            self.cooldown = cooldown
+            self.health_interval = health_interval
+
+    @property
+    def urls(self):
+        """Get every configured endpoint URL"""
+        return [endpoint.url for endpoint in self._endpoints]
+
+    @contextmanager
+    def lease(self, prefer=None, exclude=()):
+        """Hold the least-loaded available endpoint for one upstream call
+
+        `prefer` keeps a caller on a specific URL while that endpoint is
+        available. Connection errors, timeouts and 5xx responses count as
+        endpoint failures; other errors are the caller's problem.
+        """
+        endpoint = self.acquire(prefer, exclude)
+        try:
+            yield endpoint
+        except (requests.ConnectionError, requests.Timeout):
+            self.release(endpoint, success=False)
+            raise
+        except requests.HTTPError as e:
+            failed = e.response is not None and e.response.status_code >= 500
+            self.release(endpoint, success=not failed)
+            raise
+        except BaseException:
+            self.release(endpoint, success=True)
+            raise
+        else:
+            self.release(endpoint, success=True)
+
+    def call(self, fn, prefer=None, retryable=None):
+        """Run fn(endpoint), failing over to the other endpoints on upstream errors
+
+        Connection errors, 5xx responses and timeouts move on to the next
+        endpoint. `retryable()`, when given, is asked before each failover;
+        a streaming caller answers False once output has reached its
+        consumer, so a broken stream is never replayed from the start.
+        """
+        tried = set()
+        while True:
+            try:
+                with self.lease(prefer, exclude=tried) as endpoint:
+                    tried.add(endpoint.url)
+                    return fn(endpoint)
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                response = getattr(e, 'response', None)
+                if response is not None and response.status_code < 500:
+                    raise
+                if retryable is not None and not retryable():
+                    raise
+                if len(tried) >= len(self._endpoints):
+                    raise
+                metrics.increment(f'endpoints.{self.name}.failovers')
+                prefer = None
+            except NoHealthyEndpoint:
+                if not tried:
+                    raise
+                raise NoHealthyEndpoint(f'All {self.name} endpoints failed')
+
+    def acquire(self, prefer=None, exclude=()):
+        """Reserve an endpoint, preferring `prefer` then the least loaded"""
+        self._ensure_health_checks()
+        with self._lock:
+            candidates = [endpoint for endpoint in self._endpoints
+                          if endpoint.url not in exclude and self._is_available(endpoint)]
+            if not candidates:
+                metrics.increment(f'endpoints.{self.name}.unavailable')
+                raise NoHealthyEndpoint(f'No healthy {self.name} endpoint available')
+
+            preferred = [endpoint for endpoint in candidates if endpoint.url == prefer]
+            endpoint = preferred[0] if preferred else min(candidates, key=lambda e: e.outstanding)
+
+            if endpoint.circuit == 'open':
+                endpoint.circuit = 'half_open'
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint, success):
+        """Return an endpoint and update its circuit breaker"""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if success:
+                endpoint.failures = 0
+                endpoint.circuit = 'closed'
+                endpoint.healthy = True
+                return
+
+            endpoint.errors += 1
+            endpoint.failures += 1
+            if endpoint.circuit == 'half_open' or endpoint.failures >= self.failure_threshold:
+                self._open_circuit(endpoint)
+
+    def check_health(self):
+        """Ping every endpoint once and update its health"""
+        for endpoint in list(self._endpoints):
+            try:
+                response = requests.get(f'{endpoint.url}/api/tags', timeout=2)
+                healthy = response.status_code == 200
+            except requests.RequestException:
+                healthy = False
+
+            with self._lock:
+                endpoint.healthy = healthy
+                if not healthy and endpoint.circuit != 'open':
+                    self._open_circuit(endpoint)
+                elif healthy and endpoint.circuit == 'open' \
+                        and time.monotonic() - endpoint.opened_at >= self.cooldown:
+                    endpoint.circuit = 'half_open'
+
+    def stats(self):
+        """Get per-endpoint load and health"""
+        with self._lock:
+            return [endpoint.to_dict() for endpoint in self._endpoints]
+
+    def _is_available(self, endpoint):
+        """Check whether an endpoint may take traffic (lock must be held)"""
+        if endpoint.circuit == 'closed':
+            return endpoint.healthy
+        if endpoint.circuit == 'half_open':
+            # One trial request at a time while half-open
+            return endpoint.outstanding == 0
+        return time.monotonic() - endpoint.opened_at >= self.cooldown and endpoint.outstanding == 0
+
+    def _open_circuit(self, endpoint):
+        """Stop routing to an endpoint for the cooldown (lock must be held)"""
+        endpoint.circuit = 'open'
+        endpoint.opened_at = time.monotonic()
+        metrics.increment(f'endpoints.{self.name}.circuit_opened')
+
+    def _ensure_health_checks(self):
+        """Start the health-check thread, again after a fork"""
+        with self._lock:
+            if self._health_pid == os.getpid() or not self.health_interval:
+                return
+            self._health_pid = os.getpid()
+        threading.Thread(target=self._health_loop, name=f'health-{self.name}', daemon=True).start()
+
+    def _health_loop(self):
+        """Check endpoint health every `health_interval` seconds"""
+        while True:
+            time.sleep(self.health_interval)
+            try:
+                self.check_health()
+            except Exception as e:
+                print(f"Health check error ({self.name}): {e}")
+
+# Separate pools so ingestion embedding load never starves chat generation
+generation_pool = EndpointPool('generation')
+embedding_pool = EndpointPool('embedding')
+
+def init_endpoint_pools(app):
+    """Configure both pools from application config"""
+    config = app.config
+    for pool, urls in ((generation_pool, config['OLLAMA_GENERATION_URLS']),
+                       (embedding_pool, config['OLLAMA_EMBEDDING_URLS'])):
+        pool.configure(
+            urls,
+            config['OLLAMA_FAILURE_THRESHOLD'],
+            config['OLLAMA_CIRCUIT_COOLDOWN'],
+            config['OLLAMA_HEALTH_INTERVAL']
+        )
+
+metrics.register_collector('endpoints', lambda: {
+    'generation': generation_pool.stats(),
+    'embedding': embedding_pool.stats()
+})
@@ -0,0 +1,38 @@
+"""
+Generation Sessions
+Per-chat Ollama context tokens and endpoint affinity for KV-cache reuse
+"""
+
+from app.utils.cache import LRUCache
+
+# chat_id -> {'model', 'version', 'endpoint', 'tokens', 'turns'}; entries
+# expire with Ollama's keep_alive, after which the KV cache is gone anyway
+generation_sessions = LRUCache('generation_sessions', maxsize=256, ttl=1800)
+
+def init_generation_sessions(app):
+    """Size the session store from application config"""
+    generation_sessions.configure(
+        maxsize=app.config['GENERATION_SESSION_MAX'],
+        ttl=app.config['GENERATION_SESSION_TTL']
+    )
+
+def get_session(chat_id, model, version):
+    """Get a chat's session if it still matches the model and document version"""
+    session = generation_sessions.get(chat_id)
+    if session is None or session['model'] != model or session['version'] != version:
+        return None
+    return session
+
+def record_session(chat_id, model, version, endpoint, tokens=None, previous=None):
+    """Remember where a chat's last generation ran and, when reusing, its context"""
+    generation_sessions.put(chat_id, {
+        'model': model,
+        'version': version,
+        'endpoint': endpoint,
+        'tokens': tokens,
+        'turns': (previous['turns'] + 1) if previous and tokens else 1
+    })
+
+def end_session(chat_id):
+    """Forget a chat's session after it was cleared or deleted"""
+    generation_sessions.pop(chat_id)
@@ -0,0 +1,154 @@
+"""
+Memory Service
+Buffer, rolling-summary and hybrid conversation memory for chats
+"""
+
+import threading
+from datetime import datetime
+from flask import current_app # type: ignore
+from app import db
+from app.models.chat import Chat, ChatMessage
+from app.services.prompt_builder import count_tokens, trim_to_tokens
+from app.services.conversation_window import conversation_windows
+from app.utils.metrics import metrics
+
+MEMORY_TYPES = ('buffer', 'summary', 'hybrid')
+
+class MemoryService:
+    # chat_id -> True while a summary update runs, or 'dirty' if another turn landed meanwhile
+    _updating = {}
+    _lock = threading.Lock()
+
+    def __init__(self, config=None):
+        """Create a memory service from application config"""
+        self.config = config or current_app.config
+
+    def load(self, chat):
+        """Return (summary, [(role, content)]) to put in the next prompt
+
+        'buffer' replays the last MEMORY_BUFFER_MESSAGES messages.
+        'summary' and 'hybrid' replay the rolling summary plus the messages
+        it does not cover yet; in 'hybrid' the last MEMORY_RECENT_MESSAGES
+        always stay raw. Either way prompt size stays flat as chats grow.
+        Messages come from the chat's in-memory window, not the database.
+        """
+        memory_type = chat.memory_type or 'buffer'
+        messages = conversation_windows.recent(chat.id, self.config['MEMORY_BUFFER_MESSAGES'], chat.message_count)
+        if memory_type == 'buffer':
+            return None, self._as_history(messages)
+
+        if chat.summary_message_id:
+            messages = [msg for msg in messages if msg.id > chat.summary_message_id]
+        return chat.summary, self._as_history(messages)
+
+    def schedule_update(self, chat):
+        """Fold older turns into the chat's summary in the background"""
+        if (chat.memory_type or 'buffer') == 'buffer':
+            return
+
+        with self._lock:
+            if chat.id in self._updating:
+                self._updating[chat.id] = 'dirty'
+                return
+            self._updating[chat.id] = True
+
+        app = current_app._get_current_object()
+        threading.Thread(target=self._update_loop, args=(app, chat.id), daemon=True).start()
+
+    def _update_loop(self, app, chat_id):
+        """Fold batches until the summary has caught up with the chat"""
+        with app.app_context():
+            while True:
+                try:
+                    changed = self.update_summary(chat_id)
+                except Exception as e:
+                    changed = False
+                    metrics.increment('memory.summary_failed')
+                    print(f"Summary update failed for chat {chat_id}: {e}")
+                finally:
+                    db.session.remove()
+
+                with self._lock:
+                    if not changed and self._updating.get(chat_id) != 'dirty':
+                        self._updating.pop(chat_id, None)
+                        return
+                    self._updating[chat_id] = True
+
+    def update_summary(self, chat_id):
+        """Fold pending messages into the summary; returns whether it changed"""
+        chat = Chat.query.get(chat_id)
+        if not chat or (chat.memory_type or 'buffer') == 'buffer':
+            return False
+
+        keep_raw = self.config['MEMORY_RECENT_MESSAGES'] if chat.memory_type == 'hybrid' else 0
+        query = ChatMessage.query.filter_by(chat_id=chat.id).filter(ChatMessage.role.in_(('user', 'assistant')))
+        if chat.summary_message_id:
+            query = query.filter(ChatMessage.id > chat.summary_message_id)
+        pending = query.order_by(ChatMessage.id).all()
+        if keep_raw:
+            pending = pending[:-keep_raw]
+        if len(pending) < self.config['MEMORY_SUMMARY_MIN_MESSAGES']:
+            return False
+
+        # Fold at most one batch per pass so each call stays cheap
+        batch, used = [], 0
+        for msg in pending:
+            cost = count_tokens(msg.content)
+            if batch and used + cost > self.config['MEMORY_SUMMARY_BATCH_TOKENS']:
+                break
+            batch.append(msg)
+            used += cost
+
+        previous_message_id = chat.summary_message_id
+        lines = [
+            f"{'Human' if msg.role == 'user' else 'AI'}: {trim_to_tokens(msg.content, self.config['MEMORY_SUMMARY_BATCH_TOKENS'])}"
+            for msg in batch if msg.role == 'user' or msg.is_complete()
+        ]
+        prompt = self._summary_prompt(chat.summary, lines)
+
+        from app.services.model_clients import CoalescingLLM
+        llm = CoalescingLLM(
+            model=self.config['MEMORY_SUMMARY_MODEL'] or self.config['LLM_MODEL'],
+            temperature=0.0,
+            keep_alive=self.config['OLLAMA_KEEP_ALIVE'],
+            num_ctx=self.config['OLLAMA_NUM_CTX']
+        )
+        summary = llm.invoke(prompt, user_id=chat.user_id, priority='background')
+        summary = trim_to_tokens(summary.strip(), self.config['MEMORY_SUMMARY_MAX_TOKENS'])
+
+        # The chat may have been cleared, deleted or summarized elsewhere meanwhile
+        db.session.expire_all()
+        chat = db.session.get(Chat, chat_id)
+        if chat is None or chat.summary_message_id != previous_message_id \
+                or not db.session.get(ChatMessage, batch[-1].id):
+            metrics.increment('memory.summary_discarded')
+            return False
+
+        chat.summary = summary
+        chat.summary_message_id = batch[-1].id
+        chat.summary_updated_at = datetime.utcnow()
+        db.session.commit()
+        metrics.increment('memory.summary_updates')
+        return True
+
+    def _summary_prompt(self, summary, lines):
+        """Ask the model to extend the running summary with new lines"""
+        return f"""Progressively summarize the conversation between a user and an AI assistant about a document.
+Keep names, numbers, dates and open questions. Write at most {self.config['MEMORY_SUMMARY_MAX_TOKENS'] // 2} words.
+
+Current summary:
+{summary or '(empty)'}
+
+New lines of conversation:
+{chr(10).join(lines)}
+
+New summary:"""
+
+    @staticmethod
+    def _as_history(messages):
+        """Keep user messages and completed answers as (role, content) pairs"""
+        return [
+            (msg.role, msg.content)
+            for msg in messages
+            if msg.role == 'user' or (msg.role == 'assistant' and msg.is_complete())
+        ]
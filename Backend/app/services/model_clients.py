@@ -0,0 +1,164 @@
+"""
+Model Clients
+Batched and coalescing wrappers around the Ollama model APIs
+"""
+
+import requests # type: ignore
+from langchain_core.embeddings import Embeddings # type: ignore
+from app.utils.metrics import metrics
+from app.utils.singleflight import SingleFlight
+from app.utils.cancellation import RequestCancelled
+from app.services.ollama_client import get_client
+from app.services.batching import query_embedding_batcher
+from app.services.scheduler import generation_scheduler
+from app.services.endpoint_pool import generation_pool, embedding_pool
+
+# Shared across requests so concurrent identical calls meet in one place
+generation_flight = SingleFlight('generation')
+embedding_flight = SingleFlight('embedding')
+
+class CoalescingLLM:
+    def __init__(self, model, temperature, keep_alive=None, num_ctx=None):
+        """Generation client where identical in-flight prompts share one upstream call
+
+        `keep_alive` and `num_ctx` are sent unchanged on every call so Ollama
+        keeps the model, and the KV cache of its last prompt, loaded.
+        """
+        self.model = model
+        self.temperature = temperature
+        self.keep_alive = keep_alive
+        self.options = {'temperature': temperature}
+        if num_ctx:
+            self.options['num_ctx'] = num_ctx
+
+    def invoke(self, prompt, user_id=None, priority='interactive', cancel_token=None, on_token=None,
+               context=None, prefer=None, on_done=None):
+        """Generate a completion, waiting for a scheduler slot if needed
+
+        Only the leader of a coalesced group takes a slot and streams
+        tokens; followers receive the whole text at the end. The upstream
+        call is aborted only once every participant has cancelled, and a
+        leader cancelled before then still raises RequestCancelled.
+        Continuations of a chat's `context` are never coalesced. `prefer`
+        asks for a specific endpoint, and `on_done(endpoint_url, chunk)`
+        gets the final chunk of the call that actually ran.
+        """
+        if context:
+            return self._generate(prompt, user_id, priority, cancel_token, on_token, context, prefer, on_done)
+
+        key = (self.model, self.temperature, prompt)
+        call, is_leader = generation_flight.acquire(key, cancel_token)
+
+        if not is_leader:
+            text = generation_flight.wait(call, cancel_token)
+            if on_token:
+                on_token(text)
+            return text
+
+        try:
+            text = self._generate(prompt, user_id, priority, call.token, on_token, None, prefer, on_done)
+        except BaseException as e:
+            generation_flight.fail(key, e)
+            raise
+        generation_flight.resolve(key, text)
+
+        # Followers kept the call alive; the leader's own turn may still have stopped
+        if cancel_token is not None and cancel_token.cancelled:
+            raise RequestCancelled(cancel_token.reason, text)
+        return text
+
+    def _generate(self, prompt, user_id, priority, cancel_token, on_token, context=None, prefer=None, on_done=None):
+        """Run one streaming upstream generation inside a scheduler slot
+
+        A stream that breaks before its first token fails over to another
+        endpoint; once tokens have gone to `on_token` it raises
+        RequestCancelled('interrupted') with the text sent so far instead.
+        """
+        streamed = []
+
+        def forward(piece):
+            streamed.append(piece)
+            on_token(piece)
+
+        def run(endpoint):
+            return get_client(endpoint.url).generate_stream(
+                self.model,
+                prompt,
+                self.options,
+                cancel_token=cancel_token,
+                on_token=forward if on_token else None,
+                context=context,
+                keep_alive=self.keep_alive,
+                on_done=(lambda chunk: on_done(endpoint.url, chunk)) if on_done else None
+            )
+
+        with generation_scheduler.slot(user_id, priority, cancel_token=cancel_token):
+            try:
+                return generation_pool.call(run, prefer=prefer, retryable=lambda: not streamed)
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                if not streamed:
+                    raise
+                metrics.increment('llm.streams_interrupted')
+                raise RequestCancelled('interrupted', ''.join(streamed)) from e
+
+class CoalescingEmbeddings(Embeddings):
+    def __init__(self, embeddings, model):
+        """Wrap an embeddings client so identical in-flight texts are embedded once"""
+        self.embeddings = embeddings
+        self.model = model
+
+    def embed_query(self, text):
+        """Embed a single query text"""
+        key = (self.model, 'query', text)
+        return embedding_flight.do(key, lambda: self.embeddings.embed_query(text))
+
+    def embed_documents(self, texts):
+        """Embed texts, sending only those not already in flight upstream"""
+        results = {}
+        waiting = {}
+        leading = []
+
+        for text in dict.fromkeys(texts):
+            key = (self.model, 'document', text)
+            call, is_leader = embedding_flight.acquire(key)
+            if is_leader:
+                leading.append(text)
+            else:
+                waiting[text] = call
+
+        if leading:
+            try:
+                vectors = self.embeddings.embed_documents(leading)
+            except BaseException as e:
+                for text in leading:
+                    embedding_flight.fail((self.model, 'document', text), e)
+                raise
+            for text, vector in zip(leading, vectors):
+                embedding_flight.resolve((self.model, 'document', text), vector)
+                results[text] = vector
+
+        for text, call in waiting.items():
+            results[text] = embedding_flight.wait(call)
+
+        return [results[text] for text in texts]
+
+class BatchedOllamaEmbeddings(Embeddings):
+    def __init__(self, model, batch_size=32, batch_queries=True):
+        """Embeddings client sending many texts per /api/embed call"""
+        self.model = model
+        self.batch_size = batch_size
+        self.batch_queries = batch_queries
+
+    def embed_documents(self, texts):
+        """Embed texts in batches of `batch_size`"""
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            vectors.extend(embedding_pool.call(lambda endpoint: get_client(endpoint.url).embed(self.model, batch)))
+        return vectors
+
+    def embed_query(self, text):
+        """Embed a query, micro-batched with concurrent queries when enabled"""
+        if self.batch_queries:
+            return query_embedding_batcher.submit(self.model, text)
+        return embedding_pool.call(lambda endpoint: get_client(endpoint.url).embed(self.model, [text]))[0]
@@ -0,0 +1,57 @@
+"""
+Model Router
+Picks the generation model per request from load, prompt size and chat settings
+"""
+
+from flask import current_app # type: ignore
+from app.utils.metrics import metrics
+from app.services.scheduler import generation_scheduler
+from app.services.warmup import warmup
+
+class ModelRouter:
+    def __init__(self, config=None):
+        """Create a router from application config"""
+        self.config = config or current_app.config
+
+    def available_models(self):
+        """Get every model a chat may pin"""
+        return [self.config['LLM_MODEL'], self.config['LLM_FALLBACK_MODEL']] + \
+            list(self.config['LLM_EXTRA_MODELS'])
+
+    def choose(self, chat, prompt_tokens):
+        """Return (model, reason) for one generation"""
+        primary = self.config['LLM_MODEL']
+        fallback = self.config['LLM_FALLBACK_MODEL']
+
+        pinned = chat.get_setting('model')
+        if pinned:
+            return pinned, 'pinned'
+
+        if not self.config['ROUTER_ENABLED'] or chat.get_setting('model_policy', 'auto') != 'auto' \
+                or not fallback or fallback == primary:
+            return primary, 'default'
+
+        # Never route to a model warm-up could not load (e.g. not pulled)
+        if not warmup.model_ready(fallback):
+            return primary, 'default'
+
+        # Only interactive load counts; background summaries may queue freely
+        queued = generation_scheduler.stats()['queued_interactive']
+        wait_p95 = metrics.percentile('scheduler.wait_ms.interactive', 95, last=self.config['ROUTER_WAIT_WINDOW'])
+
+        if wait_p95 is not None and wait_p95 > self.config['ROUTER_MAX_WAIT_P95_MS']:
+            return fallback, 'wait_p95'
+
+        if queued >= self.config['ROUTER_MAX_QUEUE_DEPTH']:
+            return fallback, 'queue_depth'
+
+        # Long prompts are the most expensive to prefill; shed them first
+        if queued > 0 and prompt_tokens > self.config['ROUTER_LONG_PROMPT_TOKENS']:
+            return fallback, 'long_prompt'
+
+        return primary, 'default'
+
+    def record(self, model, reason):
+        """Count a routing decision"""
+        metrics.increment(f'router.model.{model}')
+        metrics.increment(f'router.reason.{reason}')
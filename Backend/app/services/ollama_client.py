@@ -0,0 +1,142 @@
+"""
+Ollama HTTP Client
+Thin client for the Ollama REST API with pooled connections
+"""
+
+import json
+import time
+import threading
+import requests # type: ignore
+from app.utils.cancellation import RequestCancelled
+from app.utils.metrics import metrics
+
+# base_url -> OllamaClient, so every request reuses the same connection pool
+_clients = {}
+_clients_lock = threading.Lock()
+
+class OllamaClient:
+    def __init__(self, base_url, timeout=120):
+        """Create a client for one Ollama server"""
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def generate(self, model, prompt, options=None):
+        """Generate a completion with one non-streaming /api/generate call"""
+        response = self.session.post(
+            f'{self.base_url}/api/generate',
+            json={'model': model, 'prompt': prompt, 'options': options or {}, 'stream': False},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()['response']
+
+    def generate_stream(self, model, prompt, options=None, cancel_token=None, on_token=None,
+                        context=None, keep_alive=None, on_done=None):
+        """Generate with a streaming /api/generate call that can be aborted
+
+        Closing the response when `cancel_token` fires drops the connection,
+        which makes Ollama stop generating. Reads never block past the
+        token's deadline. `context` continues from a previous call's context
+        tokens; `on_done` receives the final chunk (with the new context,
+        Ollama's eval counts and our own ttft_ms).
+        """
+        if cancel_token is not None:
+            cancel_token.check()
+        remaining = cancel_token.remaining() if cancel_token is not None else None
+        read_timeout = self.timeout if remaining is None else max(0.1, min(self.timeout, remaining))
+
+        payload = {'model': model, 'prompt': prompt, 'options': options or {}, 'stream': True}
+        if context:
+            payload['context'] = context
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+
+        start = time.perf_counter()
+        ttft_ms = None
+        response = self.session.post(
+            f'{self.base_url}/api/generate',
+            json=payload,
+            stream=True,
+            timeout=(5, read_timeout)
+        )
+        response.raise_for_status()
+        remove_callback = cancel_token.add_callback(response.close) if cancel_token is not None else None
+
+        parts = []
+        try:
+            for line in response.iter_lines():
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise RequestCancelled(cancel_token.reason, ''.join(parts))
+                if not line:
+                    continue
+
+                chunk = json.loads(line)
+                piece = chunk.get('response', '')
+                if piece:
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - start) * 1000
+                        metrics.observe('llm.ttft_ms', ttft_ms)
+                    parts.append(piece)
+                    if on_token:
+                        on_token(piece)
+                if chunk.get('done'):
+                    if on_done:
+                        chunk['ttft_ms'] = round(ttft_ms, 3) if ttft_ms is not None else None
+                        on_done(chunk)
+                    break
+            else:
+                # Closing the response on cancel can end the stream cleanly
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise RequestCancelled(cancel_token.reason, ''.join(parts))
+                raise requests.ConnectionError('Ollama stream ended before completion')
+        except RequestCancelled:
+            raise
+        except Exception as e:
+            if cancel_token is not None and cancel_token.cancelled:
+                raise RequestCancelled(cancel_token.reason, ''.join(parts)) from e
+            raise
+        finally:
+            response.close()
+            if remove_callback:
+                remove_callback()
+
+        return ''.join(parts)
+
+    def load_model(self, model, keep_alive=None, embedding=False, options=None):
+        """Load a model into memory without generating anything"""
+        if embedding:
+            payload = {'model': model, 'input': []}
+            path = '/api/embed'
+        else:
+            payload = {'model': model, 'prompt': '', 'options': options or {}, 'stream': False}
+            path = '/api/generate'
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+
+        # Loading a model from disk can take far longer than a request
+        response = self.session.post(f'{self.base_url}{path}', json=payload, timeout=max(self.timeout, 300))
+        response.raise_for_status()
+
+    def embed(self, model, texts):
+        """Embed a batch of texts with one /api/embed call"""
+        response = self.session.post(
+            f'{self.base_url}/api/embed',
+            json={'model': model, 'input': list(texts)},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()['embeddings']
+
+def reset_clients():
+    """Drop clients whose pooled connections were inherited from a parent process"""
+    with _clients_lock:
+        _clients.clear()
+
+def get_client(base_url):
+    """Get the shared client for a server"""
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = _clients[base_url] = OllamaClient(base_url)
+        return client
@@ -0,0 +1,159 @@
+"""
+Document Progress
+In-process publish/subscribe of document processing stage events
+"""
+
+import time
+import queue
+import threading
+from collections import OrderedDict
+from app.utils.metrics import metrics
+
+TERMINAL_STAGES = ('completed', 'error')
+
+class ProgressSubscription:
+    def __init__(self, broker, document_id, maxsize):
+        self.broker = broker
+        self.document_id = document_id
+        self.events = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def get(self, timeout=None):
+        """Wait for the next event; None if none arrived within `timeout`"""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def deliver(self, event):
+        """Queue an event; a slow reader misses intermediate ones, never the last"""
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            if event['stage'] not in TERMINAL_STAGES:
+                self.dropped += 1
+                return
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                pass
+            self.events.put_nowait(event)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ProgressBroker:
+    def __init__(self, retain=300, max_documents=1024, queue_size=256):
+        """Fan out stage events to the subscribers of each document
+
+        The latest event per document is kept, so a subscriber that joins
+        mid-way starts from the current state; finished documents are
+        forgotten `retain` seconds after their last event.
+        """
+        self.retain = retain
+        self.max_documents = max_documents
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._latest = OrderedDict()  # document_id -> (event, monotonic time)
+        self._subscribers = {}  # document_id -> set of subscriptions
+        self._seq = 0
+        self.published = 0
+
+    def configure(self, retain, max_documents):
+        """Apply application settings"""
+        with self._lock:
+            self.retain = retain
+            self.max_documents = max_documents
+
+    def publish(self, document_id, stage, progress, **fields):
+        """Record a stage event and hand it to every subscriber"""
+        with self._lock:
+            self._seq += 1
+            event = {
+                'id': self._seq,
+                'document_id': document_id,
+                'stage': stage,
+                'progress': progress,
+                **fields
+            }
+            self._latest[document_id] = (event, time.monotonic())
+            self._latest.move_to_end(document_id)
+            self._expire()
+            subscribers = list(self._subscribers.get(document_id, ()))
+            self.published += 1
+
+        for subscription in subscribers:
+            subscription.deliver(event)
+        metrics.increment(f'progress.{stage}')
+        return event
+
+    def subscribe(self, document_id):
+        """Start receiving a document's events, beginning with its latest"""
+        subscription = ProgressSubscription(self, document_id, self.queue_size)
+        with self._lock:
+            self._expire()
+            self._subscribers.setdefault(document_id, set()).add(subscription)
+            latest = self._latest.get(document_id)
+        if latest:
+            subscription.deliver(latest[0])
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.document_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.document_id]
+
+    def latest(self, document_id):
+        """Get a document's most recent event, if this process has one"""
+        with self._lock:
+            entry = self._latest.get(document_id)
+            return entry[0] if entry else None
+
+    def stats(self):
+        """Get broker usage"""
+        with self._lock:
+            return {
+                'documents': len(self._latest),
+                'subscribers': sum(len(subscribers) for subscribers in self._subscribers.values()),
+                'published': self.published
+            }
+
+    def _expire(self):
+        """Forget finished documents past `retain` and the oldest beyond max (lock held)"""
+        now = time.monotonic()
+        for document_id, (event, at) in list(self._latest.items()):
+            if event['stage'] in TERMINAL_STAGES and now - at > self.retain:
+                del self._latest[document_id]
+        while len(self._latest) > self.max_documents:
+            self._latest.popitem(last=False)
+
+# Shared broker for the whole process
+document_progress = ProgressBroker()
+metrics.register_collector('document_progress', document_progress.stats)
+
+def init_document_progress(app):
+    """Configure the broker from application config"""
+    document_progress.configure(
+        app.config['PROGRESS_RETAIN_SECONDS'],
+        app.config['PROGRESS_MAX_DOCUMENTS']
+    )
+
+def snapshot_event(document):
+    """Describe a document's stored status in the shape of a stage event"""
+    stage = document.status if document.status in TERMINAL_STAGES else 'processing'
+    return {
+        'id': 0,
+        'document_id': document.id,
+        'stage': stage,
+        'progress': document.processing_progress or 0,
+        'error_message': document.error_message
+    }
@@ -0,0 +1,222 @@
+"""
+Prompt Builder
+Token-budgeted prompt assembly from instructions, retrieved context and history
+"""
+
+import re
+from flask import current_app # type: ignore
+from app.utils.metrics import metrics
+
+_TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+def count_tokens(text):
+    """Estimate the token count of text
+
+    Granite's BPE vocabulary splits most English words into one token and
+    long or rare words into several; punctuation is a token of its own.
+    This tracks real counts far better than len(text) // 4 on prose and
+    clause-heavy legal text, without loading a tokenizer.
+    """
+    if not text:
+        return 0
+    return sum(1 + (len(piece) - 1) // 6 for piece in _TOKEN_PATTERN.findall(text))
+
+def trim_to_tokens(text, max_tokens):
+    """Cut text to at most `max_tokens`, preferring a sentence boundary"""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    used = 0
+    end = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        cost = 1 + (len(match.group()) - 1) // 6
+        if used + cost > max_tokens:
+            break
+        used += cost
+        end = match.end()
+
+    cut = text[:end]
+    sentence_end = max(cut.rfind('. '), cut.rfind('.\n'))
+    if sentence_end > len(cut) // 2:
+        cut = cut[:sentence_end + 1]
+    return cut.rstrip() + ' …'
+
+class BuiltPrompt:
+    def __init__(self, prompt, tokens, budget, sections, documents, dropped):
+        self.prompt = prompt
+        self.tokens = tokens
+        self.budget = budget
+        self.sections = sections
+        self.documents = documents
+        self.dropped = dropped
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'tokens': self.tokens,
+            'budget': self.budget,
+            'sections': self.sections,
+            'dropped': self.dropped
+        }
+
+class PromptBuilder:
+    def __init__(self, max_tokens=None, config=None):
+        """Create a builder for a chat's context window of `max_tokens`"""
+        self.config = config or current_app.config
+        self.max_tokens = max_tokens or self.config['PROMPT_MAX_TOKENS']
+
+    @property
+    def budget(self):
+        """Tokens available to the prompt after reserving room for the answer"""
+        reserve = self.config['PROMPT_RESPONSE_RESERVE']
+        window = min(self.max_tokens, self.config['OLLAMA_NUM_CTX'])
+        return max(self.config['PROMPT_MIN_TOKENS'], window - reserve)
+
+    def build(self, filename, question, documents, history, summary=None):
+        """Assemble a prompt that fits the budget
+
+        `documents` are retrieved chunks, most relevant first; `history` is a
+        list of (role, content) pairs, oldest first, and `summary` a rolling
+        summary of earlier turns. Instructions and the question always go
+        in. Summary and history share at most MAX_MEMORY_TOKENS and a
+        PROMPT_HISTORY_SHARE of what remains, the summary first, dropping
+        the oldest turns first; context gets the rest, dropping the
+        lowest-ranked chunks first and trimming the last one that only
+        partly fits.
+        """
+        instructions = self._instructions(filename)
+        question = trim_to_tokens(question, self.budget // 4)
+        fixed = count_tokens(instructions) + count_tokens(question) + self.config['PROMPT_TEMPLATE_TOKENS']
+        remaining = max(0, self.budget - fixed)
+
+        history_cap = min(self.config['MAX_MEMORY_TOKENS'], int(remaining * self.config['PROMPT_HISTORY_SHARE']))
+        summary = trim_to_tokens(summary, history_cap // 2) if summary else None
+        summary_tokens = count_tokens(summary)
+        history_lines, history_tokens = self._fit_history(history, history_cap - summary_tokens)
+        history_tokens += summary_tokens
+
+        context_parts, kept_documents, context_tokens = self._fit_context(documents, remaining - history_tokens)
+
+        # Slow-changing parts first. Only the instructions are the same on
+        # every turn; history extends the previous turn's only while the
+        # memory window is still filling. Once it slides, or the summary is
+        # refolded, Ollama's cached KV covers just the instructions. Carrying
+        # the whole conversation over is what context reuse is for.
+        summary_block = f"Conversation Summary:\n{summary}\n\n" if summary else ''
+        prompt = f"""{instructions}
+
+{summary_block}Conversation History:
+{chr(10).join(history_lines) if history_lines else '(none)'}
+
+{self._turn(filename, context_parts, question)}"""
+
+        tokens = count_tokens(prompt)
+        dropped = {
+            'chunks': len(documents) - len(kept_documents),
+            'history_messages': len(history) - len(history_lines)
+        }
+        metrics.observe('prompt.tokens', tokens)
+        if dropped['chunks']:
+            metrics.increment('prompt.chunks_dropped', dropped['chunks'])
+        if dropped['history_messages']:
+            metrics.increment('prompt.history_dropped', dropped['history_messages'])
+
+        return BuiltPrompt(
+            prompt,
+            tokens,
+            self.budget,
+            {
+                'instructions': count_tokens(instructions),
+                'context': context_tokens,
+                'summary': summary_tokens,
+                'history': history_tokens - summary_tokens,
+                'question': count_tokens(question)
+            },
+            kept_documents,
+            dropped
+        )
+
+    def build_continuation(self, filename, question, documents, reused_tokens):
+        """Build only this turn's text, to follow `reused_tokens` of Ollama context
+
+        Returns None once the reused context leaves too little room for new
+        passages; the caller then starts over with a full prompt.
+        """
+        question = trim_to_tokens(question, self.budget // 4)
+        available = self.budget - reused_tokens - count_tokens(question) - self.config['PROMPT_TEMPLATE_TOKENS']
+        if available < self.config['PROMPT_MIN_PARTIAL_CHUNK_TOKENS']:
+            return None
+
+        context_parts, kept_documents, context_tokens = self._fit_context(documents, available)
+        prompt = self._turn(filename, context_parts, question)
+
+        tokens = count_tokens(prompt)
+        metrics.observe('prompt.tokens', tokens)
+        metrics.increment('prompt.continuations')
+        return BuiltPrompt(
+            prompt,
+            tokens,
+            self.budget,
+            {
+                'reused': reused_tokens,
+                'context': context_tokens,
+                'question': count_tokens(question)
+            },
+            kept_documents,
+            {'chunks': len(documents) - len(kept_documents), 'history_messages': 0}
+        )
+
+    def _turn(self, filename, context_parts, question):
+        """The per-turn tail: retrieved passages and the question"""
+        return f"""Context from document '{filename}':
+{chr(10).join(context_parts) if context_parts else '(no relevant passages found)'}
+
+Current Question: {question}
+
+Answer:"""
+
+    def _fit_history(self, history, cap):
+        """Keep the newest history lines that fit in `cap` tokens"""
+        lines = []
+        used = 0
+        for role, content in reversed(history):
+            line = f"{'Human' if role == 'user' else 'AI'}: {content}"
+            cost = count_tokens(line)
+            if used + cost > cap:
+                break
+            lines.append(line)
+            used += cost
+        lines.reverse()
+        return lines, used
+
+    def _fit_context(self, documents, budget):
+        """Keep the best-ranked chunks that fit in `budget` tokens"""
+        parts = []
+        kept = []
+        used = 0
+        min_partial = self.config['PROMPT_MIN_PARTIAL_CHUNK_TOKENS']
+        for doc in documents:
+            text = doc.page_content
+            cost = count_tokens(text) + 1
+            if used + cost <= budget:
+                parts.append(text)
+            elif budget - used >= min_partial:
+                text = trim_to_tokens(text, budget - used - 1)
+                cost = count_tokens(text) + 1
+                parts.append(text)
+            else:
+                break
+            kept.append(doc)
+            used += cost
+            if used >= budget:
+                break
+        return parts, kept, used
+
+    def _instructions(self, filename):
+        """System instructions placed ahead of everything else"""
+        return f"""You are an AI assistant helping users understand the document '{filename}'.
+
+Provide accurate, helpful responses based on the document context provided.
+If the question cannot be answered from the document context, politely say so.
+Be conversational and helpful while staying factual.
+When referencing information, be specific about what part of the document you're drawing from."""
@@ -0,0 +1,42 @@
+"""
+Query Caches
+Question embeddings and ranked retrieval results reused across turns
+"""
+
+import re
+import hashlib
+import numpy as np # type: ignore
+from app.utils.cache import LRUCache
+
+# (embedding model, normalized question) -> embedding
+embedding_cache = LRUCache('query_embeddings', maxsize=1024)
+
+# (vector_store_id, store version, embedding hash, k, retrieval params) -> [(position, score)]
+retrieval_cache = LRUCache('retrieval_results', maxsize=2048)
+
+def init_query_caches(app):
+    """Size the caches from application config"""
+    embedding_cache.configure(maxsize=app.config['QUERY_EMBEDDING_CACHE_SIZE'])
+    retrieval_cache.configure(maxsize=app.config['RETRIEVAL_CACHE_SIZE'])
+
+def normalize_question(text):
+    """Normalize case, whitespace and trailing punctuation"""
+    text = re.sub(r'\s+', ' ', text.strip().lower())
+    return text.rstrip('?!. ')
+
+def embedding_hash(embedding):
+    """Stable hash of an embedding vector"""
+    return hashlib.sha1(np.asarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+
+def embed_query(embeddings, model, text):
+    """Embed a question, reusing cached vectors for repeated questions"""
+    key = (model, normalize_question(text))
+    embedding = embedding_cache.get(key)
+    if embedding is None:
+        embedding = embeddings.embed_query(text)
+        embedding_cache.put(key, embedding)
+    return embedding
+
+def invalidate_store(vector_store_id):
+    """Drop cached retrieval results for a vector store"""
+    return retrieval_cache.invalidate(lambda key: key[0] == vector_store_id)
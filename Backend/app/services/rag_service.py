@@ -4,81 +4,208 @@ Advanced document processing and chat with Granite models
 """
 
 import os
+import re
 import json
 import shutil
+import bisect
 from datetime import datetime
 from flask import current_app # type: ignore
-from langchain_community.embeddings import OllamaEmbeddings # type: ignore
-from langchain_community.vectorstores import FAISS # type: ignore
-from langchain_community.llms import Ollama # type: ignore
-from langchain.text_splitter import RecursiveCharacterTextSplitter # type: ignore
-from langchain.chains import ConversationalRetrievalChain # type: ignore
-from langchain.memory import ConversationBufferMemory # type: ignore
-from langchain.schema import Document # type: ignore
 from app import db
 from app.models.chat import Chat
+from app.models.document import DocumentChunk
+from app.services.retrieval_service import RetrievalService
+from app.services.vector_store_cache import vector_store_cache
+from app.services import query_cache
+from app.services.answer_cache import answer_cache, is_follow_up
+from app.services.scheduler import GenerationRejected
+from app.services.model_router import ModelRouter
+from app.services.prompt_builder import PromptBuilder
+from app.services.context_compressor import ContextCompressor
+from app.services.memory_service import MemoryService
+from app.services.generation_sessions import get_session, record_session
+from app.services.endpoint_pool import NoHealthyEndpoint
+from app.utils.cancellation import RequestCancelled
+from app.utils.metrics import metrics
+
+# Written by DocumentService._extract_pdf_text ahead of each page's text
+PAGE_MARKER = re.compile(r'--- Page (\d+) ---')
 
 class RAGService:
     def __init__(self):
         """Initialize RAG service with Granite models"""
-        self.llm = Ollama(
-            model=current_app.config['LLM_MODEL'],
-            base_url=current_app.config['OLLAMA_BASE_URL'],
-            temperature=0.2
-        )
+        # langchain loads on the first chat or upload, not at app startup
+        from app.services.model_clients import CoalescingEmbeddings, BatchedOllamaEmbeddings
         
-        self.embeddings = OllamaEmbeddings(
-            model=current_app.config['EMBEDDING_MODEL'],
-            base_url=current_app.config['OLLAMA_BASE_URL']
-        )
+        self.router = ModelRouter()
+        self._llms = {}
+        self._text_splitter = None
         
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=current_app.config['CHUNK_SIZE'],
-            chunk_overlap=current_app.config['CHUNK_OVERLAP'],
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+        self.embeddings = CoalescingEmbeddings(
+            BatchedOllamaEmbeddings(
+                model=current_app.config['EMBEDDING_MODEL'],
+                batch_size=current_app.config['EMBEDDING_BATCH_SIZE'],
+                batch_queries=current_app.config['MICROBATCH_ENABLED']
+            ),
+            model=current_app.config['EMBEDDING_MODEL']
         )
     
-    def process_document(self, text_content, document_id, filename):
-        """Process document for RAG"""
+    @property
+    def text_splitter(self):
+        """Chunker for new documents, created on first use"""
+        if self._text_splitter is None:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter # type: ignore
+            
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=current_app.config['CHUNK_SIZE'],
+                chunk_overlap=current_app.config['CHUNK_OVERLAP'],
+                length_function=len,
+                separators=["\n\n", "\n", " ", ""],
+                add_start_index=True
+            )
+        return self._text_splitter
+    
+    def get_llm(self, model):
+        """Get the coalescing generation client for a model"""
+        from app.services.model_clients import CoalescingLLM
+        
+        if model not in self._llms:
+            self._llms[model] = CoalescingLLM(
+                model=model,
+                temperature=0.2,
+                keep_alive=current_app.config['OLLAMA_KEEP_ALIVE'],
+                num_ctx=current_app.config['OLLAMA_NUM_CTX']
+            )
+        return self._llms[model]
+    
+    def process_document(self, text_content, document_id, filename, on_progress=None):
+        """Process document for RAG
+
+        `on_progress(stage, done, total)` is called as chunking, embedding
+        (once per batch) and indexing advance.
+        """
+        from langchain_community.vectorstores import FAISS # type: ignore
+        
+        on_progress = on_progress or (lambda stage, done=0, total=0: None)
         try:
-            # Split text into chunks
-            texts = self.text_splitter.split_text(text_content)
+            # Split text into chunks, keeping where each one starts
+            chunks = self.text_splitter.create_documents([text_content])
+            texts = [chunk.page_content for chunk in chunks]
             
             if not texts:
                 return False, "No text chunks created from document", None
+            on_progress('chunking', len(texts), len(texts))
             
-            # Create documents with metadata
-            documents = []
-            for i, chunk in enumerate(texts):
-                doc = Document(
-                    page_content=chunk,
-                    metadata={
-                        'document_id': document_id,
-                        'chunk_index': i,
-                        'chunk_id': f"{document_id}_{i}",
-                        'filename': filename,
-                        'total_chunks': len(texts)
-                    }
-                )
-                documents.append(doc)
+            # Create metadata for each chunk
+            metadatas = [
+                {
+                    'document_id': document_id,
+                    'chunk_index': i,
+                    'chunk_id': f"{document_id}_{i}",
+                    'filename': filename,
+                    'total_chunks': len(texts)
+                }
+                for i in range(len(texts))
+            ]
+            
+            # Embed batch by batch so progress can be reported in between
+            batch_size = current_app.config['EMBEDDING_BATCH_SIZE']
+            vectors = []
+            for start in range(0, len(texts), batch_size):
+                vectors.extend(self.embeddings.embed_documents(texts[start:start + batch_size]))
+                on_progress('embedding', len(vectors), len(texts))
             
             # Create vector store
-            vector_store = FAISS.from_documents(documents, self.embeddings)
+            on_progress('indexing', 0, 1)
+            vector_store = FAISS.from_embeddings(list(zip(texts, vectors)), self.embeddings, metadatas=metadatas)
             
             # Save vector store
             vector_store_id = f"doc_{document_id}"
-            store_path = os.path.join(current_app.config['VECTOR_STORE_PATH'], vector_store_id)
-            os.makedirs(store_path, exist_ok=True)
-            vector_store.save_local(store_path)
+            vector_store_cache.save(vector_store_id, vector_store)
+            
+            # Drop anything cached for a previous version of this store
+            query_cache.invalidate_store(vector_store_id)
+            answer_cache.invalidate(vector_store_id)
+            
+            # Chunk table rows, committed by the caller with the document's status
+            self.record_chunks(document_id, text_content, [chunk.metadata['start_index'] for chunk in chunks], texts)
             
             return True, f"Document processed successfully - {len(texts)} chunks created", vector_store_id
             
         except Exception as e:
             return False, f"Processing failed: {str(e)}", None
     
-    def chat_with_document(self, chat_id, user_message):
-        """Enhanced chat with conversation memory"""
+    @staticmethod
+    def record_chunks(document_id, text_content, starts, texts):
+        """Replace a document's chunk rows with the spans, pages and highlight anchors of `texts`"""
+        # (marker offset, offset of the page's own text, page number)
+        pages = [(match.start(), match.end() + 1, int(match.group(1))) for match in PAGE_MARKER.finditer(text_content)]
+        offsets = [offset for offset, _, _ in pages]
+        
+        rows = []
+        for i, (start, text) in enumerate(zip(starts, texts)):
+            end = start + len(text)
+            first = bisect.bisect_right(offsets, start) - 1
+            last = bisect.bisect_right(offsets, end - 1) - 1
+            rows.append(DocumentChunk(
+                document_id=document_id,
+                chunk_index=i,
+                start_char=start,
+                end_char=end,
+                page_start=pages[first][2] if first >= 0 else None,
+                page_end=pages[last][2] if last >= 0 else None,
+                anchors=json.dumps(RAGService.highlight_anchors(text_content, pages, first, last, start, end))
+            ))
+        
+        DocumentChunk.query.filter_by(document_id=document_id).delete()
+        db.session.add_all(rows)
+    
+    @staticmethod
+    def highlight_anchors(text_content, pages, first, last, start, end):
+        """Locate a chunk on each page it covers
+
+        Offsets are relative to the page's extracted text, and `head` and
+        `tail` quote the first and last words there, so a viewer can open
+        the page and mark the region without searching the whole PDF.
+        """
+        anchors = []
+        for i in range(max(first, 0), last + 1):
+            _, page_text_start, page = pages[i]
+            page_text_end = pages[i + 1][0] if i + 1 < len(pages) else len(text_content)
+            piece_start, piece_end = max(start, page_text_start), min(end, page_text_end)
+            piece = text_content[piece_start:piece_end]
+            words = piece.split()
+            if not words:
+                continue
+            piece_start += len(piece) - len(piece.lstrip())
+            piece_end -= len(piece) - len(piece.rstrip())
+            anchors.append({
+                'page': page,
+                'start': piece_start - page_text_start,
+                'end': piece_end - page_text_start,
+                'head': RAGService._quote(words),
+                'tail': RAGService._quote(words, from_end=True)
+            })
+        return anchors
+    
+    @staticmethod
+    def _quote(words, limit=60, from_end=False):
+        """Join the first (or last) words, up to about `limit` characters"""
+        picked = []
+        length = -1
+        for word in (reversed(words) if from_end else words):
+            if picked and length + 1 + len(word) > limit:
+                break
+            picked.append(word)
+            length += 1 + len(word)
+        return ' '.join(reversed(picked) if from_end else picked)
+    
+    def chat_with_document(self, chat_id, user_message, cancel_token=None, on_token=None):
+        """Enhanced chat with conversation memory
+
+        `cancel_token` carries the request deadline and cancellation into
+        scheduling and the streaming Ollama call; `on_token` receives
+        generated text as it arrives.
+        """
         try:
             chat = Chat.query.get(chat_id)
             if not chat:
@@ -87,89 +214,167 @@ class RAGService:
             if not chat.document.vector_store_id:
                 return False, "Document not processed yet", None
             
-            # Load vector store
-            store_path = os.path.join(
-                current_app.config['VECTOR_STORE_PATH'], 
-                chat.document.vector_store_id
+            # Load vector store (cached in memory until the files change)
+            vector_store, version = vector_store_cache.load(
+                chat.document.vector_store_id,
+                self.embeddings
             )
             
-            if not os.path.exists(store_path):
+            if vector_store is None:
                 return False, "Document vector store not found", None
             
-            vector_store = FAISS.load_local(
-                store_path, 
-                self.embeddings,
-                allow_dangerous_deserialization=True
-            )
+            # Get conversation memory: rolling summary plus raw recent turns
+            memory = MemoryService()
+            summary, history = memory.load(chat)
             
-            # Get conversation history
-            history = []
-            for msg in chat.get_recent_messages(10):  # Last 10 messages for context
-                if msg.role == 'user':
-                    history.append(f"Human: {msg.content}")
-                elif msg.role == 'assistant':
-                    history.append(f"AI: {msg.content}")
-            
-            # Create enhanced prompt with context
-            context_prompt = self._create_context_prompt(user_message, chat.document.original_filename)
-            
-            # Perform similarity search
-            relevant_docs = vector_store.similarity_search(
-                user_message, 
-                k=current_app.config['RETRIEVAL_K']
-            )
+            config = current_app.config
+            vector_store_id = chat.document.vector_store_id
+            query_embedding = query_cache.embed_query(self.embeddings, config['EMBEDDING_MODEL'], user_message)
             
-            # Create context from relevant documents
-            context = "\n\n".join([doc.page_content for doc in relevant_docs])
+            # Serve repeated standalone questions from the answer cache
+            use_answer_cache = chat.get_setting('answer_cache', config['ANSWER_CACHE_ENABLED'])
+            if use_answer_cache and is_follow_up(user_message, bool(history or summary)):
+                answer_cache.record_bypass()
+                use_answer_cache = False
             
-            # Generate response using LLM
-            full_prompt = f"""Context from document '{chat.document.original_filename}':
-{context}
-
-Conversation History:
-{chr(10).join(history[-6:])}  # Last 3 exchanges
-
-Current Question: {user_message}
-
-Instructions: {context_prompt}
-
-Answer:"""
+            if use_answer_cache:
+                cached = answer_cache.lookup(vector_store_id, version, query_embedding)
+                if cached:
+                    chat.add_message('user', user_message)
+                    chat.add_message('assistant', cached['answer'], cached['sources'])
+                    db.session.commit()
+                    
+                    return True, "Response served from cache", {
+                        'response': cached['answer'],
+                        'sources': cached['sources'],
+                        'message_count': chat.message_count,
+                        'cached': True,
+                        'cache_similarity': round(cached['similarity'], 4)
+                    }
+            
+            # Perform similarity search with diversity reranking
+            relevant_docs, timings = self._retrieve(chat, vector_store, version, query_embedding)
+            
+            # Fit instructions, context and history into the chat's token budget
+            builder = PromptBuilder(chat.max_tokens)
+            filename = chat.document.original_filename
+            built = builder.build(filename, user_message, relevant_docs, history, summary)
+            
+            model, route_reason = self.router.choose(chat, built.tokens)
+            self.router.record(model, route_reason)
+            
+            # Continue the chat's Ollama context instead of re-sending it all
+            session = get_session(chat.id, model, version)
+            reuse_context = chat.get_setting('context_reuse', config['OLLAMA_CONTEXT_REUSE'])
+            context_tokens = None
+            if reuse_context and session and session['tokens']:
+                continuation = builder.build_continuation(filename, user_message, relevant_docs, len(session['tokens']))
+                if continuation:
+                    built = continuation
+                    context_tokens = session['tokens']
+                else:
+                    metrics.increment('generation_sessions.reset')
+            timings['reused_context_tokens'] = len(context_tokens) if context_tokens else 0
             
-            response = self.llm(full_prompt)
+            def on_done(endpoint, chunk):
+                timings['ttft_ms'] = chunk.get('ttft_ms')
+                timings['prompt_eval_count'] = chunk.get('prompt_eval_count')
+                record_session(
+                    chat.id, model, version, endpoint,
+                    tokens=chunk.get('context') if reuse_context else None,
+                    previous=session if context_tokens else None
+                )
+            
+            # Reference the chunks that made it in; their text stays in the vector store
+            sources = [
+                {'vector_store_id': vector_store_id, 'chunk_index': doc.metadata.get('chunk_index', 0)}
+                for doc in built.documents
+            ]
             
-            # Prepare source information
-            sources = []
-            for doc in relevant_docs:
-                sources.append({
-                    'chunk_id': doc.metadata.get('chunk_id'),
-                    'chunk_index': doc.metadata.get('chunk_index', 0),
-                    'content': doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content
-                })
+            try:
+                if cancel_token is not None:
+                    cancel_token.check()
+                response = self.get_llm(model).invoke(
+                    built.prompt,
+                    user_id=chat.user_id,
+                    cancel_token=cancel_token,
+                    on_token=on_token,
+                    context=context_tokens,
+                    prefer=session['endpoint'] if session else None,
+                    on_done=on_done
+                )
+            except RequestCancelled as e:
+                # Keep the aborted turn, marked with why it stopped
+                chat.add_message('user', user_message)
+                chat.add_message('assistant', e.partial, sources, model_used=model, status=e.reason)
+                db.session.commit()
+                metrics.increment(f'chat.aborted.{e.reason}')
+                raise
             
             # Save messages to chat
             chat.add_message('user', user_message)
-            chat.add_message('assistant', response, sources)
+            chat.add_message('assistant', response, sources, model_used=model)
             db.session.commit()
+            memory.schedule_update(chat)
+            
+            if use_answer_cache:
+                answer_cache.store(vector_store_id, version, query_embedding, response, sources)
             
             return True, "Response generated", {
                 'response': response,
                 'sources': sources,
-                'message_count': chat.message_count
+                'message_count': chat.message_count,
+                'cached': False,
+                'model_used': model,
+                'routing_reason': route_reason,
+                'prompt': built.to_dict(),
+                'timings': timings
             }
             
+        except (GenerationRejected, NoHealthyEndpoint, RequestCancelled):
+            raise
         except Exception as e:
             return False, f"Chat failed: {str(e)}", None
     
-    def _create_context_prompt(self, user_message, filename):
-        """Create contextual prompt for better responses"""
-        return f"""You are an AI assistant helping users understand the document '{filename}'. 
+    def _retrieve(self, chat, vector_store, version, query_embedding):
+        """Retrieve relevant chunks using the chat's retrieval settings"""
+        config = current_app.config
+        retrieval = RetrievalService(vector_store, chat.document.vector_store_id, version)
         
-Provide accurate, helpful responses based on the document context provided. 
-If the question cannot be answered from the document context, politely say so.
-Be conversational and helpful while staying factual.
-When referencing information, be specific about what part of the document you're drawing from.
-
-User question: {user_message}"""
+        results = retrieval.search(
+            query_embedding,
+            k=config['RETRIEVAL_K'],
+            mode=chat.get_setting('retrieval_mode', config['RETRIEVAL_MODE']),
+            fetch_k=chat.get_setting('fetch_k', config['RETRIEVAL_FETCH_K']),
+            lambda_mult=chat.get_setting('mmr_lambda', config['MMR_LAMBDA']),
+            redundancy_threshold=chat.get_setting('redundancy_threshold', config['REDUNDANCY_THRESHOLD'])
+        )
+        timings = dict(retrieval.timings)
+        
+        # Easy questions need fewer chunks
+        if chat.get_setting('adaptive_k', config['ADAPTIVE_K_ENABLED']):
+            results = RetrievalService.adaptive_cut(
+                results,
+                config['ADAPTIVE_K_MIN_SCORE'],
+                config['ADAPTIVE_K_RELATIVE']
+            )
+        documents = [doc for doc, _ in results]
+        
+        # Keep only the sentences that bear on the question
+        if documents and chat.get_setting('compression', config['COMPRESSION_ENABLED']):
+            compressor = ContextCompressor(
+                self.embeddings,
+                config['EMBEDDING_MODEL'],
+                max_tokens=config['COMPRESSION_MAX_TOKENS'],
+                min_relative=config['COMPRESSION_MIN_RELATIVE']
+            )
+            try:
+                documents = compressor.compress(query_embedding, documents)
+                timings['compression'] = compressor.stats
+            except Exception as e:
+                print(f"Context compression failed, using whole chunks: {e}")
+        
+        return documents, timings
     
     def delete_document_vectors(self, vector_store_id):
         """Delete vector store for document"""
@@ -177,6 +382,9 @@ User question: {user_message}"""
             store_path = os.path.join(current_app.config['VECTOR_STORE_PATH'], vector_store_id)
             if os.path.exists(store_path):
                 shutil.rmtree(store_path)
+            vector_store_cache.invalidate(vector_store_id)
+            query_cache.invalidate_store(vector_store_id)
+            answer_cache.invalidate(vector_store_id)
             return True
         except Exception as e:
             print(f"Error deleting vectors: {e}")
@@ -0,0 +1,122 @@
+"""
+Retrieval Service
+Similarity search with diversity reranking over stored FAISS vectors
+"""
+
+import time
+import numpy as np # type: ignore
+from flask import current_app # type: ignore
+from app.utils.metrics import metrics
+from app.utils.vector_ops import cosine_similarity_matrix, mmr_select
+from app.services.query_cache import retrieval_cache, embedding_hash
+from app.services.batching import search_batcher
+
+class RetrievalService:
+    def __init__(self, vector_store, vector_store_id=None, version=None):
+        """Wrap a loaded langchain FAISS vector store
+
+        When `vector_store_id` is given, ranked results are cached per
+        store version so a changed store never serves stale rankings.
+        """
+        self.vector_store = vector_store
+        self.vector_store_id = vector_store_id
+        self.version = version
+        self.timings = {}
+
+    def search(self, query_embedding, k, mode='similarity', fetch_k=None,
+               lambda_mult=0.5, redundancy_threshold=None):
+        """Return [(Document, cosine similarity)] for the query embedding
+
+        In 'mmr' mode `fetch_k` candidates are over-fetched and reranked
+        with the vectors already held by the index, so nothing is re-embedded.
+        """
+        self.timings = {}
+        fetch_k = max(k, fetch_k or k) if mode == 'mmr' else k
+
+        cache_key = None
+        if self.vector_store_id:
+            cache_key = (self.vector_store_id, self.version, embedding_hash(query_embedding),
+                         k, mode, fetch_k, lambda_mult, redundancy_threshold)
+            cached = retrieval_cache.get(cache_key)
+            if cached is not None:
+                self.timings['cache_hit'] = True
+                return [(self.get_document(pos), score) for pos, score in cached]
+
+        start = time.perf_counter()
+        positions, scores = self.search_positions(query_embedding, fetch_k)
+        self.timings['search_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        metrics.observe('retrieval.search_ms', self.timings['search_ms'])
+
+        vectors = self.reconstruct(positions) if positions else np.zeros((0, 1), dtype=np.float32)
+        if mode == 'mmr' and len(positions) > 1:
+            start = time.perf_counter()
+            order = mmr_select(
+                query_embedding,
+                vectors,
+                k,
+                lambda_mult=lambda_mult,
+                redundancy_threshold=redundancy_threshold
+            )
+            positions = [positions[i] for i in order]
+            vectors = vectors[order]
+            self.timings['rerank_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            metrics.observe('retrieval.rerank_ms', self.timings['rerank_ms'])
+
+        # Report cosine similarity whatever metric the index uses, so
+        # score thresholds mean the same thing for every store
+        positions = positions[:k]
+        scores = cosine_similarity_matrix(vectors[:k], query_embedding).ravel().tolist() if positions else []
+        ranked = list(zip(positions, scores))
+        if cache_key is not None:
+            retrieval_cache.put(cache_key, ranked)
+
+        return [(self.get_document(pos), score) for pos, score in ranked]
+
+    @staticmethod
+    def adaptive_cut(results, min_score, relative):
+        """Trim ranked results to those close enough to the best match
+
+        Keeps chunks scoring at least `min_score` and at least `relative`
+        times the top score, always keeping the top chunk. A question one
+        chunk clearly answers ends up with one chunk.
+        """
+        if not results:
+            return results
+        top = results[0][1]
+        floor = max(min_score, top * relative)
+        return results[:1] + [(doc, score) for doc, score in results[1:] if score >= floor]
+
+    def search_positions(self, query_embedding, k):
+        """Run a raw index search and return (positions, scores)"""
+        query = np.asarray([query_embedding], dtype=np.float32)
+        if getattr(self.vector_store, '_normalize_L2', False):
+            query /= max(np.linalg.norm(query), 1e-12)
+
+        if self.vector_store_id and current_app.config['MICROBATCH_ENABLED']:
+            scores, indices = search_batcher.submit(
+                (self.vector_store_id, self.version),
+                (self.vector_store.index, query, k)
+            )
+        else:
+            scores, indices = self.vector_store.index.search(query, k)
+        positions, kept_scores = [], []
+        for position, score in zip(indices[0], scores[0]):
+            if position == -1:
+                continue
+            positions.append(int(position))
+            kept_scores.append(float(score))
+        return positions, kept_scores
+
+    def reconstruct(self, positions):
+        """Fetch stored vectors for index positions"""
+        index = self.vector_store.index
+        ids = np.asarray(positions, dtype=np.int64)
+        try:
+            return index.reconstruct_batch(ids)
+        except (AttributeError, RuntimeError):
+            return np.vstack([index.reconstruct(int(i)) for i in ids])
+
+    def get_document(self, position):
+        """Resolve an index position to its stored Document"""
+        docstore_id = self.vector_store.index_to_docstore_id[position]
+        return self.vector_store.docstore.search(docstore_id)
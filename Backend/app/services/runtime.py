@@ -0,0 +1,52 @@
+"""
+Service Runtime
+Applies application config to process-wide caches, pools and schedulers
+"""
+
+from app import db
+from app.services.ollama_client import reset_clients
+from app.services.warmup import warmup
+from app.services.query_cache import init_query_caches
+from app.services.vector_store_cache import vector_store_cache
+from app.services.answer_cache import answer_cache
+from app.services.batching import init_batchers
+from app.services.scheduler import generation_scheduler
+from app.services.endpoint_pool import init_endpoint_pools
+from app.services.context_compressor import sentence_cache
+from app.services.conversation_window import init_conversation_windows
+from app.services.generation_sessions import init_generation_sessions
+from app.services.progress import init_document_progress
+from app.services.archive_service import init_archive
+
+def configure_runtime(app):
+    """Size shared in-process state from application config"""
+    config = app.config
+    
+    init_query_caches(app)
+    init_batchers(app)
+    init_endpoint_pools(app)
+    init_conversation_windows(app)
+    init_generation_sessions(app)
+    init_document_progress(app)
+    init_archive(app)
+    vector_store_cache.configure(config['VECTOR_STORE_CACHE_SIZE'], config['VECTOR_STORE_MMAP'])
+    sentence_cache.configure(maxsize=config['SENTENCE_EMBEDDING_CACHE_SIZE'])
+    generation_scheduler.configure(config['LLM_MAX_CONCURRENCY'], config['LLM_MAX_QUEUE_DEPTH'])
+    answer_cache.configure(
+        config['ANSWER_CACHE_THRESHOLD'],
+        config['ANSWER_CACHE_TTL'],
+        config['ANSWER_CACHE_MAX_PER_DOCUMENT'],
+        config['ANSWER_CACHE_MAX_DOCUMENTS']
+    )
+
+def reinit_after_fork(app):
+    """Replace per-process state a forked worker inherited from its parent
+
+    Database and HTTP connections must not be shared between processes;
+    config, caches and loaded vector stores are kept, shared copy-on-write.
+    """
+    with app.app_context():
+        # close=False leaves the parent's connections alone for it to keep using
+        db.engine.dispose(close=False)
+    reset_clients()
+    warmup.start(app)
@@ -0,0 +1,183 @@
+"""
+Generation Scheduler
+Admission control and per-user fair queueing in front of the LLM
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from app.utils.metrics import metrics
+from app.utils.cancellation import RequestCancelled
+
+# Lower runs first; interactive chat always outranks background work
+PRIORITIES = {'interactive': 0, 'background': 10}
+
+class GenerationRejected(Exception):
+    def __init__(self, message, retry_after):
+        """Raised when a generation is shed instead of queued"""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class _Ticket:
+    def __init__(self, user_id, priority):
+        self.user_id = user_id
+        self.priority = priority
+        self.granted = False
+        self.abandoned = False
+        self.enqueued_at = time.monotonic()
+
+class GenerationScheduler:
+    def __init__(self, max_concurrency=2, max_queue_depth=8):
+        """Allow `max_concurrency` generations and queue up to `max_queue_depth`"""
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self._cond = threading.Condition()
+        self._queue = []
+        self._queued = 0
+        self._queued_interactive = 0  # what load shedding compares to max_queue_depth
+        self._active = 0
+        self._virtual_time = 0
+        self._user_tags = {}
+        self._seq = itertools.count()
+        self.rejected = 0
+
+    def configure(self, max_concurrency, max_queue_depth):
+        """Apply application settings"""
+        with self._cond:
+            self.max_concurrency = max_concurrency
+            self.max_queue_depth = max_queue_depth
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, user_id=None, priority='interactive', timeout=None, cancel_token=None):
+        """Hold one generation slot for the enclosed block
+
+        Raises GenerationRejected when an interactive request arrives at a
+        full queue, or when no slot frees up within `timeout` seconds, and
+        RequestCancelled when `cancel_token` fires while still queued.
+        """
+        ticket = self._enqueue(user_id, priority)
+        try:
+            self._wait(ticket, timeout, cancel_token)
+            yield
+        finally:
+            self._release(ticket)
+
+    def retry_after(self):
+        """Estimate seconds until a queued request would start"""
+        average_ms = metrics.percentile('scheduler.generation_ms', 50) or 5000
+        with self._cond:
+            depth = self._queued
+            concurrency = max(1, self.max_concurrency)
+        return max(1, int(round((depth + 1) / concurrency * average_ms / 1000)))
+
+    def stats(self):
+        """Get queue depth and slot usage"""
+        with self._cond:
+            return {
+                'active': self._active,
+                'queued': self._queued,
+                'queued_interactive': self._queued_interactive,
+                'max_concurrency': self.max_concurrency,
+                'max_queue_depth': self.max_queue_depth,
+                'rejected': self.rejected,
+                'wait_p95_ms': metrics.percentile('scheduler.wait_ms', 95)
+            }
+
+    def _enqueue(self, user_id, priority):
+        """Queue a ticket or shed it when the queue is full"""
+        ticket = _Ticket(user_id, priority)
+        with self._cond:
+            # Only interactive tickets count: a backlog of background
+            # summaries waits behind them and must not shed chat turns
+            if priority == 'interactive' and self._queued_interactive >= self.max_queue_depth \
+                    and self._active >= self.max_concurrency:
+                self.rejected += 1
+                metrics.increment('scheduler.rejected')
+                rejected = True
+            else:
+                # Start-time fair queueing: each user's tickets are spaced
+                # one virtual step apart, so a busy user cannot starve others
+                tag = max(self._virtual_time, self._user_tags.get(user_id, 0)) + 1
+                self._user_tags[user_id] = tag
+                heapq.heappush(self._queue, (PRIORITIES[priority], tag, next(self._seq), ticket))
+                self._queued += 1
+                self._count_interactive(ticket, 1)
+                self._dispatch()
+                self._publish_gauges()
+                rejected = False
+
+        if rejected:
+            raise GenerationRejected('Model is busy, please retry shortly', self.retry_after())
+        return ticket
+
+    def _wait(self, ticket, timeout, cancel_token=None):
+        """Block until the ticket is granted a slot"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not ticket.granted:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._abandon(ticket)
+                    raise GenerationRejected('Timed out waiting for the model', self.retry_after())
+
+                if cancel_token is not None:
+                    if cancel_token.cancelled:
+                        self._abandon(ticket)
+                        metrics.increment('scheduler.cancelled_while_queued')
+                        raise RequestCancelled(cancel_token.reason)
+                    # Wake periodically to notice cancellation
+                    remaining = 0.25 if remaining is None else min(remaining, 0.25)
+
+                self._cond.wait(remaining)
+
+        waited_ms = (time.monotonic() - ticket.enqueued_at) * 1000
+        metrics.observe('scheduler.wait_ms', waited_ms)
+        metrics.observe(f'scheduler.wait_ms.{ticket.priority}', waited_ms)
+        ticket.granted_at = time.monotonic()
+
+    def _abandon(self, ticket):
+        """Take a waiting ticket out of the queue (lock must be held)"""
+        ticket.abandoned = True
+        self._queued -= 1
+        self._count_interactive(ticket, -1)
+        self._publish_gauges()
+
+    def _release(self, ticket):
+        """Free a granted slot and hand it to the next ticket"""
+        with self._cond:
+            if not ticket.granted:
+                return
+            self._active -= 1
+            metrics.observe('scheduler.generation_ms', (time.monotonic() - ticket.granted_at) * 1000)
+            self._dispatch()
+            self._publish_gauges()
+
+    def _dispatch(self):
+        """Grant free slots in priority/fairness order (lock must be held)"""
+        while self._active < self.max_concurrency and self._queue:
+            _, tag, _, ticket = heapq.heappop(self._queue)
+            if ticket.abandoned:
+                continue
+            ticket.granted = True
+            self._queued -= 1
+            self._count_interactive(ticket, -1)
+            self._active += 1
+            self._virtual_time = tag
+        self._cond.notify_all()
+
+    def _count_interactive(self, ticket, change):
+        """Track queued interactive tickets (lock must be held)"""
+        if ticket.priority == 'interactive':
+            self._queued_interactive += change
+
+    def _publish_gauges(self):
+        """Mirror queue state into the metrics registry (lock must be held)"""
+        metrics.set_gauge('scheduler.queue_depth', self._queued)
+        metrics.set_gauge('scheduler.active', self._active)
+
+# Shared scheduler for the whole process
+generation_scheduler = GenerationScheduler()
+metrics.register_collector('scheduler', generation_scheduler.stats)
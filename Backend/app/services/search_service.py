@@ -0,0 +1,187 @@
+"""
+Search Service
+Ranked full-text search over a user's chat history
+"""
+
+import re
+import html
+from flask import current_app # type: ignore
+from sqlalchemy import text # type: ignore
+from sqlalchemy.exc import OperationalError # type: ignore
+from app import db
+from app.models.chat import ChatMessageArchive
+from app.services.archive_service import ARCHIVE_ROWID_SPAN, ArchiveService
+
+# Private-use characters mark matches inside snippet(), so the text can be
+# escaped before they become <mark> tags
+_OPEN, _CLOSE = '\ue000', '\ue001'
+
+_SEARCH = text("""
+    SELECT m.id, m.chat_id, c.title, m.role, m.created_at,
+           snippet(chat_messages_fts, 0, :open, :close, '…', :snippet_tokens) AS snippet,
+           bm25(chat_messages_fts) AS score
+    FROM chat_messages_fts
+    JOIN chat_messages m ON m.id = chat_messages_fts.rowid
+    JOIN chats c ON c.id = m.chat_id
+    WHERE chat_messages_fts MATCH :query
+      AND c.user_id = :user_id
+      AND (:chat_id IS NULL OR m.chat_id = :chat_id)
+    ORDER BY score, m.id DESC
+    LIMIT :limit
+""").columns(created_at=db.DateTime)
+
+# Archived messages: the contentless index gives rowids and scores, and the
+# text comes from the decompressed batch
+_SEARCH_ARCHIVES = text("""
+    SELECT chat_message_archives_fts.rowid AS rowid, a.chat_id, c.title,
+           bm25(chat_message_archives_fts) AS score
+    FROM chat_message_archives_fts
+    JOIN chat_message_archives a ON a.id = chat_message_archives_fts.rowid / :span
+    JOIN chats c ON c.id = a.chat_id
+    WHERE chat_message_archives_fts MATCH :query
+      AND c.user_id = :user_id
+      AND (:chat_id IS NULL OR a.chat_id = :chat_id)
+    ORDER BY score
+    LIMIT :limit
+""")
+
+class SearchUnavailable(Exception):
+    """The database has no message search index"""
+
+class SearchService:
+    @staticmethod
+    def build_query(user_query):
+        """Turn free text into an FTS5 query: every word must match, the last as a prefix
+
+        Words are quoted, so FTS5 operators and punctuation typed by the
+        user are searched for rather than parsed.
+        """
+        words = re.findall(r'\w+', user_query)
+        if not words:
+            return None
+        terms = ['"' + word + '"' for word in words]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    @staticmethod
+    def search(user_id, user_query, page=1, per_page=None, chat_id=None):
+        """Get one page of a user's messages matching `user_query`, best first
+
+        Returns (results, has_more); each result carries an HTML snippet in
+        which only the <mark> tags around matches are markup. Archived
+        messages, marked 'archived', come after every live match: each
+        index scores with its own bm25 statistics, so the two lists are
+        ranked separately rather than merged on incomparable scores.
+        """
+        if db.engine.dialect.name != 'sqlite':
+            raise SearchUnavailable('Message search needs the SQLite FTS5 index')
+
+        config = current_app.config
+        per_page = max(1, min(per_page or config['SEARCH_PAGE_SIZE'], config['SEARCH_MAX_PAGE_SIZE']))
+        query = SearchService.build_query(user_query)
+        if query is None:
+            return [], False
+
+        # Live matches fill pages first; the archive is read only past them
+        offset = (max(page, 1) - 1) * per_page
+        params = {
+            'query': query,
+            'user_id': user_id,
+            'chat_id': chat_id,
+            'open': _OPEN,
+            'close': _CLOSE,
+            'snippet_tokens': config['SEARCH_SNIPPET_TOKENS'],
+            'span': ARCHIVE_ROWID_SPAN,
+            'limit': offset + per_page + 1
+        }
+        try:
+            rows = db.session.execute(_SEARCH, params).fetchall()
+            archived_rows = []
+            if len(rows) < params['limit']:
+                params['limit'] -= len(rows)
+                archived_rows = db.session.execute(_SEARCH_ARCHIVES, params).fetchall()
+        except OperationalError as e:
+            if 'no such table' in str(e):
+                raise SearchUnavailable('Message search index has not been created') from e
+            raise
+
+        results = [
+            {
+                'message_id': row.id,
+                'chat_id': row.chat_id,
+                'chat_title': row.title,
+                'role': row.role,
+                'created_at': row.created_at.isoformat(),
+                'snippet': SearchService._highlight(row.snippet),
+                'score': round(-row.score, 4)  # bm25 is lower for better matches
+            }
+            for row in rows
+        ]
+        results += SearchService._archived_results(
+            archived_rows, re.findall(r'\w+', user_query), config['SEARCH_SNIPPET_TOKENS']
+        )
+        return results[offset:offset + per_page], len(results) > offset + per_page
+
+    @staticmethod
+    def _archived_results(rows, words, snippet_tokens):
+        """Render archive index hits, decompressing each batch once"""
+        archives = {
+            archive.id: archive
+            for archive in ChatMessageArchive.query.filter(
+                ChatMessageArchive.id.in_({row.rowid // ARCHIVE_ROWID_SPAN for row in rows})
+            )
+        } if rows else {}
+        service = ArchiveService()
+
+        results = []
+        for row in rows:
+            archive = archives.get(row.rowid // ARCHIVE_ROWID_SPAN)
+            if archive is None:
+                continue
+            message = service.load(archive)[row.rowid % ARCHIVE_ROWID_SPAN]
+            results.append({
+                'message_id': message['id'],
+                'chat_id': row.chat_id,
+                'chat_title': row.title,
+                'role': message['role'],
+                'created_at': message['created_at'],
+                'snippet': SearchService._highlight(
+                    SearchService._snippet(message['content'], words, snippet_tokens)
+                ),
+                'score': round(-row.score, 4),
+                'archived': True
+            })
+        return results
+
+    @staticmethod
+    def _snippet(content, words, tokens):
+        """Mark query words in a window of `tokens` words, like FTS5's snippet()
+
+        Porter stemming is approximated by comparing word prefixes, so
+        'terminate' is marked for a search on 'termination'.
+        """
+        stems = [word.lower()[:max(3, len(word) - 3)] for word in words]
+        spans = [match.span() for match in re.finditer(r'\w+', content)]
+        hits = [i for i, (start, end) in enumerate(spans)
+                if any(content[start:end].lower().startswith(stem) for stem in stems)]
+        if not spans:
+            return content
+
+        first = max(0, min((hits[0] if hits else 0) - tokens // 4, len(spans) - tokens))
+        last = min(len(spans), first + tokens)
+        hits = set(hits)
+
+        pieces = ['…'] if first > 0 else []
+        position = spans[first][0] if first > 0 else 0
+        for i in range(first, last):
+            start, end = spans[i]
+            pieces.append(content[position:start])
+            word = content[start:end]
+            pieces.append(_OPEN + word + _CLOSE if i in hits else word)
+            position = end
+        pieces.append(content[position:] if last == len(spans) else '…')
+        return ''.join(pieces)
+
+    @staticmethod
+    def _highlight(snippet):
+        return html.escape(snippet or '').replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
@@ -0,0 +1,111 @@
+"""
+Source Service
+Resolve stored (vector store, chunk) references to snippets, pages and highlight anchors
+"""
+
+from app.models.document import Document, DocumentChunk
+from app.services.vector_store_cache import vector_store_cache
+
+SNIPPET_LENGTH = 200
+
+class SourceService:
+    def __init__(self, embeddings=None):
+        """Look up chunk text for message sources
+
+        Sources are stored as {'vector_store_id', 'chunk_index'} references;
+        the text lives once in the vector store, so each store a batch
+        touches is loaded (or taken from the cache) a single time.
+        """
+        self._embeddings = embeddings
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            from app.services.rag_service import RAGService
+            self._embeddings = RAGService().embeddings
+        return self._embeddings
+
+    def get_snippets(self, vector_store_id, chunk_indexes):
+        """Get {chunk_index: snippet} for the chunks of one store that still exist"""
+        vector_store, _ = vector_store_cache.load(vector_store_id, self.embeddings)
+        if vector_store is None:
+            return {}
+
+        snippets = {}
+        wanted = set(chunk_indexes)
+        positions = vector_store.index_to_docstore_id
+
+        # Chunks are indexed in order, so position i normally holds chunk i
+        for chunk_index in list(wanted):
+            if 0 <= chunk_index < len(positions):
+                doc = vector_store.docstore.search(positions[chunk_index])
+                if getattr(doc, 'metadata', {}).get('chunk_index') == chunk_index:
+                    snippets[chunk_index] = self.snippet(doc.page_content)
+                    wanted.discard(chunk_index)
+
+        if wanted:
+            for docstore_id in positions.values():
+                doc = vector_store.docstore.search(docstore_id)
+                chunk_index = getattr(doc, 'metadata', {}).get('chunk_index')
+                if chunk_index in wanted:
+                    snippets[chunk_index] = self.snippet(doc.page_content)
+                    wanted.discard(chunk_index)
+                    if not wanted:
+                        break
+        return snippets
+
+    @staticmethod
+    def get_locations(vector_store_id, chunk_indexes):
+        """Get {chunk_index: {page_start, page_end, anchors}} from the chunk table"""
+        chunks = DocumentChunk.query.join(Document, Document.id == DocumentChunk.document_id)\
+                                    .filter(Document.vector_store_id == vector_store_id,
+                                            DocumentChunk.chunk_index.in_(list(chunk_indexes)))\
+                                    .all()
+        return {
+            chunk.chunk_index: {
+                'page_start': chunk.page_start,
+                'page_end': chunk.page_end,
+                'anchors': chunk.get_anchors()
+            }
+            for chunk in chunks
+        }
+
+    def attach_locations(self, sources):
+        """Add pages and highlight anchors to each source reference, one query per store"""
+        by_store = self._group(sources)
+        resolved = {
+            vector_store_id: self.get_locations(vector_store_id, chunk_indexes)
+            for vector_store_id, chunk_indexes in by_store.items()
+        }
+        for source in sources:
+            if source.get('vector_store_id') in resolved:
+                source.update(resolved[source['vector_store_id']].get(
+                    source['chunk_index'],
+                    {'page_start': None, 'page_end': None, 'anchors': []}
+                ))
+        return sources
+
+    def attach_snippets(self, sources):
+        """Add 'content', pages and anchors to each source reference, batching lookups per store"""
+        by_store = self._group(sources)
+        resolved = {
+            vector_store_id: self.get_snippets(vector_store_id, chunk_indexes)
+            for vector_store_id, chunk_indexes in by_store.items()
+        }
+        for source in sources:
+            if source.get('vector_store_id') in resolved:
+                source['content'] = resolved[source['vector_store_id']].get(source['chunk_index'])
+        return self.attach_locations(sources)
+
+    @staticmethod
+    def _group(sources):
+        """Get {vector_store_id: chunk indexes} of the sources that are references"""
+        by_store = {}
+        for source in sources:
+            if source.get('vector_store_id'):
+                by_store.setdefault(source['vector_store_id'], set()).add(source['chunk_index'])
+        return by_store
+
+    @staticmethod
+    def snippet(text):
+        return text[:SNIPPET_LENGTH] + "..." if len(text) > SNIPPET_LENGTH else text
@@ -0,0 +1,150 @@
+"""
+Vector Store Cache
+Keeps loaded FAISS stores in memory, reloading when the files on disk change
+"""
+
+import os
+import json
+import pickle
+import shutil
+import tempfile
+import threading
+from flask import current_app # type: ignore
+from app.utils.cache import LRUCache
+
+# Stores record how their vectors were made. Ollama's /api/embed returns
+# unit-length vectors; stores written before embeddings moved to it hold the
+# raw /api/embeddings vectors and have no marker.
+FORMAT_FILE = 'store.json'
+VECTOR_FORMAT = 'l2_normalized'
+
+class VectorStoreCache:
+    def __init__(self, maxsize=8):
+        """Cache of vector_store_id -> (FAISS store, version)"""
+        self._stores = LRUCache('vector_stores', maxsize=maxsize)
+        self._load_lock = threading.Lock()
+        self.mmap = False
+
+    def configure(self, maxsize, mmap=False):
+        """Resize the cache and choose how indexes are read"""
+        self._stores.configure(maxsize=maxsize)
+        self.mmap = mmap
+
+    @staticmethod
+    def store_path(vector_store_id):
+        """Get the on-disk directory of a vector store"""
+        return os.path.join(current_app.config['VECTOR_STORE_PATH'], vector_store_id)
+
+    def get_version(self, vector_store_id):
+        """Get the store version (index file mtime), or None if missing"""
+        try:
+            return os.stat(os.path.join(self.store_path(vector_store_id), 'index.faiss')).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self, vector_store_id, embeddings):
+        """Get (vector_store, version), loading from disk on miss or change"""
+        version = self.get_version(vector_store_id)
+        if version is None:
+            return None, None
+
+        cached = self._stores.get(vector_store_id)
+        if cached and cached[1] == version:
+            return cached
+
+        with self._load_lock:
+            cached = self._stores.pop(vector_store_id)
+            if cached and cached[1] == version:
+                self._stores.put(vector_store_id, cached)
+                return cached
+
+            if self._upgrade(vector_store_id):
+                version = self.get_version(vector_store_id)
+            vector_store = self._read(vector_store_id, embeddings)
+            self._stores.put(vector_store_id, (vector_store, version))
+            return vector_store, version
+
+    def save(self, vector_store_id, vector_store):
+        """Write a store to disk without touching the files readers have open
+
+        The new files are written to a scratch directory and renamed over
+        the old ones, so a process that memory-mapped the previous index
+        keeps reading it instead of faulting on a truncated file.
+        """
+        path = self.store_path(vector_store_id)
+        os.makedirs(path, exist_ok=True)
+        scratch = tempfile.mkdtemp(prefix='.saving-', dir=os.path.dirname(path))
+        try:
+            vector_store.save_local(scratch)
+            self._write_format(scratch)
+            # The index goes last: its mtime is the version readers reload on
+            for name in (FORMAT_FILE, 'index.pkl', 'index.faiss'):
+                os.replace(os.path.join(scratch, name), os.path.join(path, name))
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        self.invalidate(vector_store_id)
+
+    def invalidate(self, vector_store_id):
+        """Forget a loaded store"""
+        self._stores.pop(vector_store_id)
+
+    def _upgrade(self, vector_store_id):
+        """Unit-normalize the vectors of a store that predates the format marker
+
+        /api/embed returns the /api/embeddings vector scaled to unit length,
+        so normalizing the stored side once gives the distances a re-embed
+        would, and queries, MMR and redundancy thresholds see one scale.
+        Returns True if the index was rewritten.
+        """
+        import faiss # type: ignore
+
+        path = self.store_path(vector_store_id)
+        try:
+            with open(os.path.join(path, FORMAT_FILE)) as f:
+                if json.load(f).get('vectors') == VECTOR_FORMAT:
+                    return False
+        except (OSError, ValueError):
+            pass
+
+        index = faiss.read_index(os.path.join(path, 'index.faiss'))
+        if index.ntotal:
+            vectors = index.reconstruct_n(0, index.ntotal)
+            faiss.normalize_L2(vectors)
+            index.reset()
+            index.add(vectors)
+
+        scratch = tempfile.mkdtemp(prefix='.upgrading-', dir=os.path.dirname(path))
+        try:
+            faiss.write_index(index, os.path.join(scratch, 'index.faiss'))
+            self._write_format(scratch)
+            for name in (FORMAT_FILE, 'index.faiss'):
+                os.replace(os.path.join(scratch, name), os.path.join(path, name))
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        print(f"🛠️  Normalized {index.ntotal} vectors of {vector_store_id} for /api/embed queries")
+        return True
+
+    @staticmethod
+    def _write_format(path):
+        with open(os.path.join(path, FORMAT_FILE), 'w') as f:
+            json.dump({'vectors': VECTOR_FORMAT}, f)
+
+    def _read(self, vector_store_id, embeddings):
+        """Read a store from disk, memory-mapping its vectors if configured"""
+        import faiss # type: ignore
+        from langchain_community.vectorstores import FAISS # type: ignore
+        
+        path = self.store_path(vector_store_id)
+        if not self.mmap:
+            return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+
+        # Mapped vectors live in the page cache, shared by every process
+        # that maps the store, instead of a private heap copy per process
+        flags = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        index = faiss.read_index(os.path.join(path, 'index.faiss'), flags)
+        with open(os.path.join(path, 'index.pkl'), 'rb') as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+# Shared cache for the whole process
+vector_store_cache = VectorStoreCache()
@@ -0,0 +1,205 @@
+"""
+Warm-up Service
+Preloads Ollama models and hot vector stores so first questions are fast
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+from flask import current_app # type: ignore
+from app.services.ollama_client import get_client
+from app.services.endpoint_pool import generation_pool, embedding_pool
+from app.services.vector_store_cache import vector_store_cache
+from app.utils.helpers import load_json_file, save_json_file
+from app.utils.metrics import metrics
+
+class WarmupService:
+    def __init__(self):
+        """Track warm-up progress for this process"""
+        self._lock = threading.Lock()
+        self._pid = None
+        self._warming = set()
+        self.state = 'idle'  # idle, warming, ready, disabled
+        self.models = {}
+        self.documents = {}
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def ready(self):
+        """Nothing left to wait for: warm-up finished or is turned off"""
+        return self.state in ('ready', 'disabled')
+
+    def start(self, app):
+        """Warm up in the background once per process (again after a fork)"""
+        with self._lock:
+            if not app.config['WARMUP_ENABLED']:
+                self.state = 'disabled'
+                return
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._warming = set()
+            self.state = 'warming'
+            self.started_at = datetime.utcnow()
+            self.finished_at = None
+        threading.Thread(target=self._boot, args=(app,), name='warmup', daemon=True).start()
+
+    def preload(self, app):
+        """Load the hot vector stores now, in this process
+
+        Run in the gunicorn master so the worker, and any replacement for
+        it, starts with the stores cached.
+        """
+        if not app.config['WARMUP_ENABLED']:
+            return
+        with app.app_context():
+            for vector_store_id in self._hot_documents()[:app.config['VECTOR_STORE_CACHE_SIZE']]:
+                self._load_document(vector_store_id)
+
+    def model_ready(self, model):
+        """Check whether warm-up loaded `model` on at least one endpoint"""
+        with self._lock:
+            return self.models.get(model) == 'ready'
+
+    def warm_document(self, vector_store_id, background=True):
+        """Load a document's vector store into memory and mark it hot"""
+        if not vector_store_id:
+            return
+        self._remember(vector_store_id)
+
+        with self._lock:
+            if vector_store_id in self._warming:
+                return
+            self._warming.add(vector_store_id)
+
+        if not background:
+            self._load_document(vector_store_id)
+            return
+        app = current_app._get_current_object()
+        threading.Thread(target=self._load_in_context, args=(app, vector_store_id), daemon=True).start()
+
+    def status(self):
+        """Get warm-up progress"""
+        with self._lock:
+            return {
+                'state': self.state,
+                'ready': self.ready,
+                'models': dict(self.models),
+                'documents': dict(self.documents),
+                'started_at': self.started_at.isoformat() if self.started_at else None,
+                'finished_at': self.finished_at.isoformat() if self.finished_at else None
+            }
+
+    def _boot(self, app):
+        """Preload models until they load, then re-warm the hot documents"""
+        with app.app_context():
+            config = app.config
+            start = time.perf_counter()
+            required = [
+                (config['LLM_MODEL'], generation_pool, False),
+                (config['EMBEDDING_MODEL'], embedding_pool, True)
+            ]
+
+            pending = list(required)
+            while pending:
+                pending = [item for item in pending if not self._preload_model(*item)]
+                if pending:
+                    time.sleep(config['WARMUP_RETRY_INTERVAL'])
+
+            # The router's fallback is tried once; missing, the router keeps to LLM_MODEL
+            fallback = config['LLM_FALLBACK_MODEL']
+            if config['ROUTER_ENABLED'] and fallback and fallback != config['LLM_MODEL']:
+                self._preload_model(fallback, generation_pool, False)
+
+            for vector_store_id in self._hot_documents()[:config['VECTOR_STORE_CACHE_SIZE']]:
+                with self._lock:
+                    if vector_store_id in self._warming:
+                        continue
+                    self._warming.add(vector_store_id)
+                self._load_document(vector_store_id)
+
+            with self._lock:
+                self.state = 'ready'
+                self.finished_at = datetime.utcnow()
+            metrics.observe('warmup.boot_ms', (time.perf_counter() - start) * 1000)
+            print(f"🔥 Warm-up finished in {time.perf_counter() - start:.1f}s")
+
+    def _preload_model(self, model, pool, embedding):
+        """Load a model on every endpoint of its pool; True once any succeeds"""
+        config = current_app.config
+        loaded = False
+        pool.check_health()
+        for url in pool.urls:
+            try:
+                get_client(url).load_model(
+                    model,
+                    keep_alive=config['OLLAMA_KEEP_ALIVE'],
+                    embedding=embedding,
+                    options=None if embedding else {'num_ctx': config['OLLAMA_NUM_CTX']}
+                )
+                loaded = True
+            except Exception as e:
+                print(f"Warm-up could not load {model} on {url}: {e}")
+        with self._lock:
+            self.models[model] = 'ready' if loaded else 'failed'
+        return loaded
+
+    def _load_in_context(self, app, vector_store_id):
+        with app.app_context():
+            self._load_document(vector_store_id)
+
+    def _load_document(self, vector_store_id):
+        """Load one vector store into the shared cache"""
+        from app.services.rag_service import RAGService
+
+        try:
+            start = time.perf_counter()
+            store, _ = vector_store_cache.load(vector_store_id, RAGService().embeddings)
+            state = 'ready' if store is not None else 'missing'
+            metrics.observe('warmup.document_ms', (time.perf_counter() - start) * 1000)
+        except Exception as e:
+            state = 'failed'
+            print(f"Warm-up could not load {vector_store_id}: {e}")
+        finally:
+            with self._lock:
+                self._warming.discard(vector_store_id)
+
+        with self._lock:
+            self.documents[vector_store_id] = state
+        if state == 'missing':
+            self._forget(vector_store_id)
+
+    def _hot_documents(self):
+        """Get persisted hot vector store ids, most recent first"""
+        path = current_app.config['WARMUP_STATE_FILE']
+        if not os.path.exists(path):
+            return []
+        data = load_json_file(path) or {}
+        return [entry['vector_store_id'] for entry in data.get('hot_documents', [])]
+
+    def _remember(self, vector_store_id):
+        """Move a vector store to the front of the persisted hot list"""
+        config = current_app.config
+        with self._lock:
+            hot = self._hot_documents()
+            if hot[:1] == [vector_store_id]:
+                return
+            hot = [vector_store_id] + [item for item in hot if item != vector_store_id]
+            self._save(hot[:config['WARMUP_HOT_DOCUMENTS']])
+
+    def _forget(self, vector_store_id):
+        """Drop a vector store that no longer exists from the hot list"""
+        with self._lock:
+            self._save([item for item in self._hot_documents() if item != vector_store_id])
+
+    def _save(self, hot):
+        save_json_file({
+            'hot_documents': [{'vector_store_id': item} for item in hot],
+            'updated_at': datetime.utcnow()
+        }, str(current_app.config['WARMUP_STATE_FILE']))
+
+# Shared warm-up state for the whole process
+warmup = WarmupService()
+metrics.register_collector('warmup', warmup.status)
@@ -0,0 +1,139 @@
+"""
+Micro-Batcher
+Collects concurrent requests for a few milliseconds and runs them as one batch
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.metrics import metrics
+
+# Every named batcher, reported together under the 'batchers' metrics key
+_registry = {}
+
+class _Pending:
+    def __init__(self, item):
+        self.item = item
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class MicroBatcher:
+    def __init__(self, name, batch_fn, window_ms=5, max_batch_size=16, workers=4):
+        """Batch items per group key; batch_fn(key, items) returns one result per item"""
+        self.name = name
+        self.batch_fn = batch_fn
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._groups = OrderedDict()
+        self._first_at = {}
+        self._pid = None
+        self._executor = None
+        self.batches = 0
+        self.items = 0
+        _registry[name] = self
+
+    def configure(self, window_ms, max_batch_size):
+        """Tune the wait window and maximum batch size"""
+        with self._cond:
+            self.window_ms = window_ms
+            self.max_batch_size = max_batch_size
+            self._cond.notify()
+
+    def submit(self, key, item):
+        """Queue an item and block until its batch has run"""
+        pending = _Pending(item)
+        with self._cond:
+            self._ensure_worker()
+            self._groups.setdefault(key, []).append(pending)
+            self._first_at.setdefault(key, time.monotonic())
+            self._cond.notify()
+
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def stats(self):
+        """Get batch counters"""
+        with self._cond:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'avg_batch_size': round(self.items / self.batches, 2) if self.batches else None,
+                'queued': sum(len(items) for items in self._groups.values()),
+                'window_ms': self.window_ms,
+                'max_batch_size': self.max_batch_size
+            }
+
+    def _ensure_worker(self):
+        """Start the collector thread, again after a fork (lock must be held)"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f'batch-{self.name}')
+        threading.Thread(target=self._collect, name=f'batcher-{self.name}', daemon=True).start()
+
+    def _collect(self):
+        """Dispatch groups once they are full or their window has elapsed"""
+        while True:
+            with self._cond:
+                key, batch = self._next_due_batch()
+                if batch is None:
+                    continue
+                self.batches += 1
+                self.items += len(batch)
+            self._executor.submit(self._run, key, batch)
+
+    def _next_due_batch(self):
+        """Pop a due batch or wait for one (lock must be held)"""
+        if not self._groups:
+            self._cond.wait()
+            return None, None
+
+        now = time.monotonic()
+        window = self.window_ms / 1000
+        next_due = None
+        for key, items in self._groups.items():
+            due_at = self._first_at[key] + window
+            if len(items) >= self.max_batch_size or now >= due_at:
+                batch = items[:self.max_batch_size]
+                remaining = items[self.max_batch_size:]
+                if remaining:
+                    self._groups[key] = remaining
+                    self._first_at[key] = now
+                else:
+                    del self._groups[key]
+                    del self._first_at[key]
+                return key, batch
+            next_due = due_at if next_due is None else min(next_due, due_at)
+
+        self._cond.wait(max(0, next_due - now))
+        return None, None
+
+    def _run(self, key, batch):
+        """Execute one batch and hand results back to each waiter"""
+        start = time.perf_counter()
+        try:
+            results = list(self.batch_fn(key, [pending.item for pending in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(f'{self.name} batch returned {len(results)} results for {len(batch)} items')
+            for pending, result in zip(batch, results):
+                pending.result = result
+        except BaseException as e:
+            for pending in batch:
+                pending.error = e
+        finally:
+            metrics.observe(f'batcher.{self.name}.run_ms', (time.perf_counter() - start) * 1000)
+            for pending in batch:
+                pending.done.set()
+
+def batcher_stats():
+    """Get statistics for every named batcher"""
+    return {name: batcher.stats() for name, batcher in _registry.items()}
+
+metrics.register_collector('batchers', batcher_stats)
@@ -0,0 +1,105 @@
+"""
+In-Process Caches
+Thread-safe LRU cache with optional TTL and hit-rate statistics
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from app.utils.metrics import metrics
+
+# Every named cache, reported together under the 'caches' metrics key
+_registry = {}
+
+class LRUCache:
+    def __init__(self, name, maxsize=256, ttl=None):
+        """Create a cache holding at most `maxsize` entries for `ttl` seconds"""
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _registry[name] = self
+
+    def configure(self, maxsize=None, ttl=None):
+        """Resize the cache or change its TTL"""
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            self._evict_overflow()
+
+    def get(self, key, default=None):
+        """Get a value, counting the lookup as a hit or miss"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._data[key]
+                self.evictions += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries"""
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            self._evict_overflow()
+
+    def pop(self, key, default=None):
+        """Remove and return a value without touching statistics"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def invalidate(self, predicate):
+        """Drop every entry whose key matches the predicate"""
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Get hit-rate statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'maxsize': self.maxsize
+            }
+
+    def _evict_overflow(self):
+        """Evict oldest entries beyond maxsize (lock must be held)"""
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+def cache_stats():
+    """Get statistics for every named cache"""
+    return {name: cache.stats() for name, cache in _registry.items()}
+
+metrics.register_collector('caches', cache_stats)
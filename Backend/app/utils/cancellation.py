@@ -0,0 +1,165 @@
+"""
+Cancellation and Deadlines
+Tokens that carry a request's deadline and cancellation from HTTP down to Ollama
+"""
+
+import time
+import threading
+
+class RequestCancelled(Exception):
+    def __init__(self, reason, partial=''):
+        """Raised when work stops early; `partial` holds any text produced so far"""
+        super().__init__(f'Request {reason}')
+        self.reason = reason
+        self.partial = partial
+
+class CancelToken:
+    def __init__(self, timeout=None):
+        """Create a token that also cancels itself after `timeout` seconds"""
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self._reason = None
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def reason(self):
+        """Why the token was cancelled, or None while still live"""
+        if self._reason:
+            return self._reason
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return 'deadline'
+        return None
+
+    @property
+    def cancelled(self):
+        return self.reason is not None
+
+    def cancel(self, reason='cancelled'):
+        """Cancel the token and run its callbacks once"""
+        with self._lock:
+            if self._reason:
+                return
+            self._reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def remaining(self):
+        """Seconds until the deadline, or None without one"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        """Raise RequestCancelled if the token is cancelled"""
+        reason = self.reason
+        if reason:
+            raise RequestCancelled(reason)
+
+    def add_callback(self, callback):
+        """Run `callback` on explicit cancellation; returns a remover"""
+        with self._lock:
+            if not self._reason:
+                self._callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        callback()
+        return lambda: None
+
+    def _remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+class CombinedToken:
+    def __init__(self):
+        """Token for shared work: cancelled only once every member is cancelled"""
+        self._members = []
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def add(self, token):
+        """Add a participant's token (None never cancels)"""
+        with self._lock:
+            self._members.append(token)
+        if token is not None:
+            token.add_callback(self._member_cancelled)
+
+    @property
+    def reason(self):
+        with self._lock:
+            members = list(self._members)
+        if not members or any(member is None or not member.cancelled for member in members):
+            return None
+        return members[0].reason
+
+    @property
+    def cancelled(self):
+        return self.reason is not None
+
+    def remaining(self):
+        """Seconds until the latest member deadline, or None if any has none"""
+        with self._lock:
+            members = list(self._members)
+        values = [member.remaining() if member is not None else None for member in members]
+        if not values or any(value is None for value in values):
+            return None
+        return max(values)
+
+    def check(self):
+        """Raise RequestCancelled if every member is cancelled"""
+        reason = self.reason
+        if reason:
+            raise RequestCancelled(reason)
+
+    def add_callback(self, callback):
+        """Run `callback` once every member is cancelled; returns a remover"""
+        with self._lock:
+            self._callbacks.append(callback)
+        if self.cancelled:
+            self._member_cancelled()
+        return lambda: self._remove_callback(callback)
+
+    def _member_cancelled(self):
+        if not self.cancelled:
+            return
+        with self._lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def _remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+class TurnRegistry:
+    def __init__(self):
+        """Track the in-flight turn of every chat in this process"""
+        self._lock = threading.Lock()
+        self._turns = {}
+
+    def start(self, chat_id, token):
+        """Register a new turn, superseding any turn still running"""
+        with self._lock:
+            previous = self._turns.get(chat_id)
+            self._turns[chat_id] = token
+        if previous is not None:
+            previous.cancel('superseded')
+
+    def finish(self, chat_id, token):
+        """Unregister a turn if it is still the current one"""
+        with self._lock:
+            if self._turns.get(chat_id) is token:
+                del self._turns[chat_id]
+
+    def cancel(self, chat_id, reason='cancelled'):
+        """Cancel a chat's in-flight turn; returns whether one existed"""
+        with self._lock:
+            token = self._turns.pop(chat_id, None)
+        if token is None:
+            return False
+        token.cancel(reason)
+        return True
+
+# In-flight chat turns of this process
+active_turns = TurnRegistry()
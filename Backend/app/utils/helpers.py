@@ -35,8 +35,11 @@ def save_json_file(data, filepath):
     """Save data to JSON file"""
     try:
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with open(filepath, 'w') as f:
+        # Write then rename, so readers never see a half-written file
+        temp_path = f"{filepath}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
             json.dump(data, f, indent=2, default=str)
+        os.replace(temp_path, filepath)
         return True
     except Exception as e:
         print(f"Error saving JSON file: {e}")
@@ -0,0 +1,96 @@
+"""
+HTTP Caching Utilities
+Conditional GET validators and response compression
+"""
+
+import gzip
+import hashlib
+from flask import Response, current_app, request # type: ignore
+from werkzeug.http import is_resource_modified # type: ignore
+from app.utils.metrics import metrics
+
+try:
+    import brotli # type: ignore
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'image/svg+xml')
+
+def make_etag(*parts):
+    """Build a validator from the values a response is derived from"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:20]
+
+def not_modified(etag, last_modified=None):
+    """Get a 304 response if the client's copy is current, else None
+
+    Call it before building the response body, so a revalidation costs
+    only the queries that produced the validators.
+    """
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    metrics.increment('http.not_modified')
+    return with_validators(Response(status=304), etag, last_modified)
+
+def with_validators(response, etag, last_modified=None):
+    """Attach validators and make clients revalidate before reusing the response"""
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def choose_encoding(available=('br', 'gzip')):
+    """Pick the client's preferred content coding among those we can produce"""
+    best = None
+    best_quality = 0
+    for encoding in available:
+        if encoding == 'br' and brotli is None:
+            continue
+        quality = request.accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compress(data, encoding, level):
+    """Compress bytes with gzip or brotli at `level`"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+def is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+def compress_response(response):
+    """Compress large buffered text and JSON responses the client accepts"""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not is_compressible(response.mimetype)):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    config = current_app.config
+    data = response.get_data()
+    if len(data) < config['COMPRESS_MIN_SIZE']:
+        return response
+
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    level = config['COMPRESS_LEVEL_BR'] if encoding == 'br' else config['COMPRESS_LEVEL_GZIP']
+    compressed = compress(data, encoding, level)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    metrics.increment(f'http.compressed.{encoding}')
+    metrics.increment('http.compression_saved_bytes', len(data) - len(compressed))
+    return response
+
+def init_http_cache(app):
+    """Compress responses and serve fingerprinted static assets"""
+    from app.utils.static_assets import static_assets
+
+    app.after_request(compress_response)
+    static_assets.init_app(app)
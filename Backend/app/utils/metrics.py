@@ -0,0 +1,103 @@
+"""
+Metrics Registry
+Thread-safe in-process counters, gauges and latency timings
+"""
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+class MetricsRegistry:
+    def __init__(self, window=1000):
+        """Keep the last `window` observations per timing for percentiles"""
+        self._lock = threading.Lock()
+        self._window = window
+        self._counters = {}
+        self._gauges = {}
+        self._timings = {}
+        self._collectors = {}
+
+    def increment(self, name, value=1):
+        """Increase a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Set a point-in-time value"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, value_ms):
+        """Record a latency observation in milliseconds"""
+        with self._lock:
+            samples = self._timings.get(name)
+            if samples is None:
+                samples = self._timings[name] = deque(maxlen=self._window)
+            samples.append(value_ms)
+
+    @contextmanager
+    def timer(self, name):
+        """Time the enclosed block and record it under `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def percentile(self, name, pct, last=None):
+        """Get a percentile of recent observations (None when empty)
+
+        `last` restricts the calculation to the newest observations.
+        """
+        with self._lock:
+            samples = list(self._timings.get(name, ()))
+        if last is not None:
+            samples = samples[-last:]
+        samples.sort()
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def register_collector(self, name, collector):
+        """Register a callable returning a dict merged into snapshots"""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def snapshot(self):
+        """Get all metrics as a JSON-serializable dictionary"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timings = {name: list(samples) for name, samples in self._timings.items()}
+            collectors = dict(self._collectors)
+
+        data = {
+            'counters': counters,
+            'gauges': gauges,
+            'timings': {}
+        }
+
+        for name, samples in timings.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            data['timings'][name] = {
+                'count': len(ordered),
+                'avg_ms': round(sum(ordered) / len(ordered), 3),
+                'p50_ms': round(ordered[len(ordered) // 2], 3),
+                'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                'max_ms': round(ordered[-1], 3)
+            }
+
+        for name, collector in collectors.items():
+            try:
+                data[name] = collector()
+            except Exception as e:
+                data[name] = {'error': str(e)}
+
+        return data
+
+# Shared registry for the whole process
+metrics = MetricsRegistry()
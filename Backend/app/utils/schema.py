@@ -0,0 +1,184 @@
+"""
+Schema Upgrade Helpers
+Adds model columns and indexes introduced after a database was first created
+"""
+
+from sqlalchemy import inspect, text # type: ignore
+from app import db
+
+def upgrade_schema():
+    """Add columns and indexes missing from existing tables (create_all never alters)"""
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.execute(text(
+                    f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                ))
+                print(f"🛠️  Added column {table.name}.{column.name}")
+
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    print(f"🛠️  Added index {index.name}")
+
+def migrate_message_sources(batch_size=500, dry_run=False):
+    """Rewrite sources stored as JSON with chunk text into compact references
+
+    Returns (rows rewritten, bytes of sources before, bytes after).
+    """
+    from app.models.chat import ChatMessage
+
+    rewritten = before = after = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(text(
+            "SELECT m.id, m.sources, d.vector_store_id FROM chat_messages m "
+            "JOIN chats c ON c.id = m.chat_id JOIN documents d ON d.id = c.document_id "
+            "WHERE m.id > :last_id AND m.sources LIKE '[%' AND d.vector_store_id IS NOT NULL "
+            "ORDER BY m.id LIMIT :limit"
+        ), {'last_id': last_id, 'limit': batch_size}).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for message_id, sources, vector_store_id in rows:
+            references = [
+                {'vector_store_id': vector_store_id, 'chunk_index': source.get('chunk_index', 0)}
+                for source in ChatMessage.decode_sources(sources)
+            ]
+            compact = ChatMessage.encode_sources(references)
+            updates.append({'id': message_id, 'sources': compact})
+            before += len(sources.encode('utf-8'))
+            after += len(compact.encode('utf-8')) if compact else 0
+        last_id = rows[-1][0]
+
+        if not dry_run:
+            db.session.execute(text("UPDATE chat_messages SET sources = :sources WHERE id = :id"), updates)
+            db.session.commit()
+        rewritten += len(updates)
+
+    return rewritten, before, after
+
+# External-content FTS5 index over message text. Triggers keep it in step
+# with every write to chat_messages, ORM or not: bulk deletes from
+# clear_messages, cascades from chat and document deletes, raw SQL.
+SEARCH_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE chat_messages_fts USING fts5("
+    "content, content='chat_messages', content_rowid='id', "
+    "tokenize='porter unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS chat_messages_fts_insert AFTER INSERT ON chat_messages BEGIN "
+    "INSERT INTO chat_messages_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS chat_messages_fts_delete AFTER DELETE ON chat_messages BEGIN "
+    "INSERT INTO chat_messages_fts(chat_messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS chat_messages_fts_update AFTER UPDATE OF content ON chat_messages BEGIN "
+    "INSERT INTO chat_messages_fts(chat_messages_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO chat_messages_fts(rowid, content) VALUES (new.id, new.content); END",
+)
+
+# Contentless FTS5 index over archived messages, whose text only exists
+# compressed; rowids point into chat_message_archives (see archive_service)
+ARCHIVE_SEARCH_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE chat_message_archives_fts USING fts5("
+    "content, content='', "
+    "tokenize='porter unicode61 remove_diacritics 2')"
+)
+
+def create_search_index():
+    """Create the message search index and its triggers (SQLite only)
+
+    A new index is filled from existing messages in the same transaction
+    that installs the triggers: the delete trigger removes each row from the
+    index, which corrupts an external-content index that never held it.
+    The archived-message index is created and filled alongside it.
+    Returns True if the index is new.
+    """
+    from app.services.archive_service import reindex_archives
+
+    if db.engine.dialect.name != 'sqlite':
+        return False
+
+    existing_tables = set(inspect(db.engine).get_table_names())
+    created = 'chat_messages_fts' not in existing_tables
+    with db.engine.begin() as connection:
+        if 'chat_message_archives_fts' not in existing_tables:
+            connection.execute(text(ARCHIVE_SEARCH_INDEX_DDL))
+            archived = reindex_archives(connection)
+            if archived:
+                print(f"🛠️  Created archived message search index ({archived} messages indexed)")
+        if created:
+            connection.execute(text(SEARCH_INDEX_DDL[0]))
+            indexed = connection.execute(text("SELECT COUNT(*) FROM chat_messages")).scalar()
+            if indexed:
+                connection.execute(text("INSERT INTO chat_messages_fts(chat_messages_fts) VALUES ('rebuild')"))
+        for statement in SEARCH_INDEX_DDL[1:]:
+            connection.execute(text(statement))
+    if created:
+        print(f"🛠️  Created message search index ({indexed} messages indexed)")
+    return created
+
+def rebuild_search_index():
+    """Re-index every message, hot and archived; returns the number indexed"""
+    from app.services.archive_service import reindex_archives
+
+    with db.engine.begin() as connection:
+        connection.execute(text("INSERT INTO chat_messages_fts(chat_messages_fts) VALUES ('rebuild')"))
+        indexed = connection.execute(text("SELECT COUNT(*) FROM chat_messages")).scalar()
+        return indexed + reindex_archives(connection)
+
+# One pass over chat_messages for every chat whose running statistics predate
+# the columns: LAG pairs each message with the one before it in its chat
+_CHAT_STATS_BACKFILL = text("""
+    WITH ordered AS (
+        SELECT chat_id, role, created_at,
+               LAG(role) OVER w AS previous_role,
+               LAG(created_at) OVER w AS previous_at,
+               ROW_NUMBER() OVER (PARTITION BY chat_id ORDER BY created_at DESC, id DESC) AS from_end
+        FROM chat_messages
+        WHERE chat_id IN (SELECT id FROM chats WHERE response_count IS NULL)
+        WINDOW w AS (PARTITION BY chat_id ORDER BY created_at, id)
+    ), totals AS (
+        SELECT chat_id,
+               SUM(role = 'user') AS user_messages,
+               SUM(role = 'assistant') AS assistant_messages,
+               SUM(role = 'assistant' AND previous_role = 'user') AS responses,
+               SUM(CASE WHEN role = 'assistant' AND previous_role = 'user'
+                        THEN (julianday(created_at) - julianday(previous_at)) * 86400.0 END) AS response_time,
+               MAX(CASE WHEN from_end = 1 AND role = 'user' THEN created_at END) AS awaiting_since
+        FROM ordered
+        GROUP BY chat_id
+    )
+    UPDATE chats SET
+        user_message_count = COALESCE((SELECT user_messages FROM totals WHERE chat_id = chats.id), 0),
+        assistant_message_count = COALESCE((SELECT assistant_messages FROM totals WHERE chat_id = chats.id), 0),
+        response_count = COALESCE((SELECT responses FROM totals WHERE chat_id = chats.id), 0),
+        response_time_total = COALESCE((SELECT response_time FROM totals WHERE chat_id = chats.id), 0.0),
+        last_user_message_at = (SELECT awaiting_since FROM totals WHERE chat_id = chats.id)
+    WHERE response_count IS NULL
+""")
+
+def backfill_chat_stats():
+    """Compute running statistics for chats created before they were kept (SQLite only)
+
+    SQLite date functions keep milliseconds, so backfilled response times
+    are that precise; add_message keeps microseconds from then on.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return 0
+    with db.engine.begin() as connection:
+        pending = connection.execute(text("SELECT COUNT(*) FROM chats WHERE response_count IS NULL")).scalar()
+        if pending:
+            connection.execute(_CHAT_STATS_BACKFILL)
+    if pending:
+        print(f"🛠️  Computed statistics for {pending} chats")
+    return pending
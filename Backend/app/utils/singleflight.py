@@ -0,0 +1,106 @@
+"""
+Single-Flight Call Coalescing
+Concurrent callers with the same key share one execution and its result
+"""
+
+import threading
+from app.utils.metrics import metrics
+from app.utils.cancellation import CombinedToken
+
+# Every named group, reported together under the 'singleflight' metrics key
+_registry = {}
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # Cancelled only when every participant has given up
+        self.token = CombinedToken()
+
+class SingleFlight:
+    def __init__(self, name):
+        """Create a named coalescing group"""
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.issued = 0
+        self.coalesced = 0
+        _registry[name] = self
+
+    def acquire(self, key, cancel_token=None):
+        """Join an in-flight call or become its leader
+
+        Returns (call, is_leader). A leader must finish the call with
+        resolve() or fail(); followers block in wait(). The leader should
+        watch call.token, which cancels once every participant's
+        `cancel_token` has.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                is_leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.issued += 1
+                is_leader = True
+
+        call.token.add(cancel_token)
+        return call, is_leader
+
+    def resolve(self, key, result):
+        """Publish a leader's result to every waiter"""
+        with self._lock:
+            call = self._calls.pop(key)
+        call.result = result
+        call.done.set()
+
+    def fail(self, key, error):
+        """Publish a leader's error to every waiter"""
+        with self._lock:
+            call = self._calls.pop(key)
+        call.error = error
+        call.done.set()
+
+    @staticmethod
+    def wait(call, cancel_token=None):
+        """Wait for a call started by another thread, or until cancelled"""
+        if cancel_token is None:
+            call.done.wait()
+        else:
+            while not call.done.wait(0.1):
+                cancel_token.check()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers sharing `key`"""
+        call, is_leader = self.acquire(key)
+        if not is_leader:
+            return self.wait(call)
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.fail(key, e)
+            raise
+        self.resolve(key, result)
+        return result
+
+    def stats(self):
+        """Get issued versus coalesced call counters"""
+        with self._lock:
+            return {
+                'issued': self.issued,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls)
+            }
+
+def singleflight_stats():
+    """Get statistics for every named group"""
+    return {name: group.stats() for name, group in _registry.items()}
+
+metrics.register_collector('singleflight', singleflight_stats)
@@ -0,0 +1,131 @@
+"""
+Static Assets
+Content-fingerprinted, precompressed static files with long-lived caching
+"""
+
+import os
+import re
+import hashlib
+import mimetypes
+import threading
+from flask import Response, abort, current_app, request # type: ignore
+from werkzeug.security import safe_join # type: ignore
+from app.utils.http_cache import brotli, choose_encoding, compress, is_compressible
+
+# css/style.3f2a9c1d07be.css -> (css/style, 3f2a9c1d07be, .css)
+_FINGERPRINTED = re.compile(r'^(?P<stem>.+)\.(?P<digest>[0-9a-f]{12})(?P<ext>\.[^./]+)$')
+
+class StaticAsset:
+    def __init__(self, filename, mtime_ns, data):
+        self.filename = filename
+        self.mtime_ns = mtime_ns
+        self.data = data
+        self.digest = hashlib.sha256(data).hexdigest()[:12]
+        self.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        self.encoded = {}  # encoding -> compressed bytes, filled on first use
+
+    @property
+    def fingerprinted_name(self):
+        stem, ext = os.path.splitext(self.filename)
+        return f"{stem}.{self.digest}{ext}"
+
+class StaticAssets:
+    def __init__(self):
+        """Serve /static with content-hash URLs
+
+        url_for('static', filename='css/style.css') yields
+        /static/css/style.<hash>.css. Those URLs change whenever the file
+        does, so they are cached for STATIC_MAX_AGE; each file's gzip and
+        brotli encodings are computed once at the highest level and reused.
+        """
+        self._lock = threading.Lock()
+        self._assets = {}
+        self.folder = None
+
+    def init_app(self, app):
+        self.folder = app.static_folder
+        app.url_defaults(self._fingerprint_url)
+        app.view_functions['static'] = self.serve
+
+    def get(self, filename):
+        """Get a file's current asset, re-reading it when it changed on disk"""
+        path = safe_join(self.folder, filename)
+        if path is None:
+            return None
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        with self._lock:
+            asset = self._assets.get(filename)
+        if asset is not None and asset.mtime_ns == mtime_ns:
+            return asset
+
+        with open(path, 'rb') as f:
+            asset = StaticAsset(filename, mtime_ns, f.read())
+        with self._lock:
+            self._assets[filename] = asset
+        return asset
+
+    def precompress(self):
+        """Load and compress every static file now, e.g. before forking workers"""
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                filename = os.path.relpath(os.path.join(root, name), self.folder).replace(os.sep, '/')
+                asset = self.get(filename)
+                if asset is not None and is_compressible(asset.mimetype):
+                    for encoding in ('br', 'gzip'):
+                        if encoding != 'br' or brotli is not None:
+                            self._encoded(asset, encoding)
+
+    def serve(self, filename):
+        """View function for the static endpoint"""
+        digest = None
+        match = _FINGERPRINTED.match(filename)
+        if match and self.get(filename) is None:
+            filename = match['stem'] + match['ext']
+            digest = match['digest']
+
+        asset = self.get(filename)
+        if asset is None:
+            abort(404)
+
+        body = asset.data
+        encoding = choose_encoding() if is_compressible(asset.mimetype) else None
+        if encoding:
+            body = self._encoded(asset, encoding)
+
+        response = Response(body, mimetype=asset.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.set_etag(asset.digest + (f'-{encoding}' if encoding else ''))
+        response.last_modified = asset.mtime_ns / 1e9
+        if digest == asset.digest:
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config['STATIC_MAX_AGE']
+            response.cache_control.immutable = True
+        else:
+            # Unversioned or stale URL: usable, but check back each time
+            response.cache_control.public = True
+            response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    def _encoded(self, asset, encoding):
+        """Get an asset's compressed bytes, compressing once per file version"""
+        data = asset.encoded.get(encoding)
+        if data is None:
+            data = compress(asset.data, encoding, 11 if encoding == 'br' else 9)
+            asset.encoded[encoding] = data
+        return data
+
+    def _fingerprint_url(self, endpoint, values):
+        if endpoint != 'static' or 'filename' not in values:
+            return
+        asset = self.get(values['filename'])
+        if asset is not None:
+            values['filename'] = asset.fingerprinted_name
+
+# Shared asset table for the whole process
+static_assets = StaticAssets()
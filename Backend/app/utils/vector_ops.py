@@ -0,0 +1,55 @@
+"""
+Vector Operations
+NumPy-vectorized similarity and diversity selection helpers
+"""
+
+import numpy as np # type: ignore
+
+def normalize_rows(matrix):
+    """L2-normalize each row, leaving zero rows untouched"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def cosine_similarity_matrix(a, b):
+    """Cosine similarity between every row of `a` and every row of `b`"""
+    return normalize_rows(a) @ normalize_rows(b).T
+
+def mmr_select(query_vector, candidate_vectors, k, lambda_mult=0.5, redundancy_threshold=None):
+    """Pick `k` candidate positions by maximal marginal relevance
+
+    Relevance and pairwise similarities are computed once as matrices;
+    each selection step only updates the running max-similarity vector.
+    Candidates whose similarity to an already selected one reaches
+    `redundancy_threshold` are dropped outright.
+    """
+    candidates = normalize_rows(candidate_vectors)
+    count = candidates.shape[0]
+    if count == 0 or k <= 0:
+        return []
+
+    relevance = candidates @ normalize_rows(query_vector)[0]
+    pairwise = candidates @ candidates.T
+
+    max_similarity = np.zeros(count, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    selected = []
+
+    for _ in range(min(k, count)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        if not np.isfinite(scores[best]):
+            break
+
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, pairwise[best])
+
+        if redundancy_threshold is not None:
+            available &= pairwise[best] < redundancy_threshold
+
+    return selected
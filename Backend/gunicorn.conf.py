@@ -0,0 +1,46 @@
+"""
+Gunicorn Configuration
+Production server for SAV.IN, one worker process: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import os
+
+bind = os.environ.get('SAVIN_BIND', '0.0.0.0:5002')
+
+# Exactly one worker: generation admission (LLM_MAX_CONCURRENCY and the
+# bounded queue) and the active turns that /cancel and supersede act on
+# live in process memory. A second worker would let Ollama see twice the
+# generations and miss cancels sent to the other process; scale with
+# threads instead. on_starting refuses any other worker count.
+workers = 1
+
+# Threads keep streamed answers and slow generations from pinning the worker
+worker_class = 'gthread'
+threads = int(os.environ.get('SAVIN_THREADS', 8))
+
+# Load config, schema and hot vector stores once in the master, so a worker
+# restarted after a crash or timeout inherits them instead of reloading
+preload_app = True
+
+# Longer than CHAT_REQUEST_TIMEOUT, so the app's own deadline answers first
+timeout = 180
+graceful_timeout = 30
+keepalive = 5
+
+def on_starting(server):
+    """Refuse a worker count the per-process state can't support"""
+    if server.cfg.workers != 1:
+        raise RuntimeError(f'SAV.IN runs exactly one gunicorn worker (got {server.cfg.workers}); '
+                           'raise SAVIN_THREADS instead')
+
+def nworkers_changed(server, new_value, old_value):
+    """Undo TTIN/TTOU signals that would add or remove workers"""
+    if old_value is not None and new_value != 1:
+        server.log.warning('SAV.IN runs exactly one gunicorn worker; ignoring the change')
+        server.num_workers = 1
+
+def post_fork(server, worker):
+    """Give each worker its own database and HTTP connections"""
+    from wsgi import app
+    from app.services.runtime import reinit_after_fork
+    reinit_after_fork(app)
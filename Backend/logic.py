@@ -14,7 +14,7 @@ from langchain_ollama import OllamaLLM, OllamaEmbeddings # type: ignore
 from langchain_community.document_loaders import PyPDFLoader # type: ignore
 from langchain.text_splitter import RecursiveCharacterTextSplitter # type: ignore
 from langchain.chains import RetrievalQA # type: ignore
-from langchain.memory import ConversationBufferMemory # type: ignore
+from langchain.memory import ConversationBufferMemory, ConversationBufferWindowMemory # type: ignore
 from langchain_community.vectorstores import Chroma # type: ignore
 from langchain.prompts import PromptTemplate # type: ignore
 
@@ -28,6 +28,11 @@ EMBED_MODEL = "granite-embedding:278m"
 llm = OllamaLLM(model=LLM_MODEL, temperature=0.5)
 embeddings = OllamaEmbeddings(model=EMBED_MODEL)
 
+#how many past exchanges the model gets to see
+MEMORY_WINDOW_TURNS = 5
+#chain and memory per chat, built once and reused for every query of that chat
+rag_chains = {}
+
 
 # LOADING PREVIOUS CHAT=> chat_dict -> checking everything in os.listdir(chats_dir) -> if ends with .json -> remove the .json and store in chat_id -> open the file as read only with open(chats_dir, filename) and store it in f -> json.load(f) and put it in data -> for chat[chat_id] = data put that data in and return the chats, create a flow diagram image for this please
 
@@ -115,6 +120,26 @@ def delete_chat(chat_id):
     shutil.rmtree(chats[chat_id]["vector_dir"], ignore_errors=True)
     #deletes entry from the global chat dic
     del chats[chat_id]
+    #forget the cached chain and its memory
+    rag_chains.pop(chat_id, None)
+
+
+# HIGHLIGHT ANCHOR => page number (from 1) + where the chunk starts and ends in that page's text + its first few words, which the PDF viewer marks instead of searching for the whole chunk
+
+# In[ ]:
+
+
+def highlight_anchor(chunk):
+    #chunks split without add_start_index (stores built before anchors) have no offsets
+    #so they only get a page and the first words, start and end stay None
+    start = chunk.metadata.get("start_index")
+    return {
+        #PyPDFLoader counts pages from 0
+        "anchor_page": chunk.metadata.get("page", 0) + 1,
+        "anchor_start": start,
+        "anchor_end": start + len(chunk.page_content) if start is not None else None,
+        "anchor_text": " ".join(chunk.page_content.split()[:8]),
+    }
 
 
 # Document loading -> Splitting -> Embeddings and storage  and Updating the chat path to realise pdf for later use 
@@ -128,7 +153,11 @@ def upload_document(chat_id, file_path):
      loader = PyPDFLoader(file_path)
      #loads the pdf into a list of documents, each representing a page or chunk
      #using REcurvsiveTextSplitter to split the text 
-     doc = loader.load_and_split(text_splitter= RecursiveCharacterTextSplitter(chunk_size = 1000, chunk_overlap = 50))
+     #add_start_index records where each chunk starts on its page
+     doc = loader.load_and_split(text_splitter= RecursiveCharacterTextSplitter(chunk_size = 1000, chunk_overlap = 50, add_start_index = True))
+     #work out once where every chunk sits in the PDF, so answers can jump straight to it
+     for chunk in doc:
+         chunk.metadata.update(highlight_anchor(chunk))
      # create a chroma vector store from the chunked docs. from_documents embeds each doc using 
      # use global embeddings in store vectors in chroma 
      # persist_directory points to the chat's vector directory
@@ -138,6 +167,8 @@ def upload_document(chat_id, file_path):
      #Update thr global dict for this ID , setting "PDf_path" to the file path
      #so we can view this pdf later on
      chats[chat_id]["pdf_path"] = file_path
+     #the cached chain points at the old vector store, rebuild it on the next query
+     rag_chains.pop(chat_id, None)
      #saved the chat to presist
      save_chat(chat_id)
     except Exception as e:
@@ -150,15 +181,19 @@ def upload_document(chat_id, file_path):
 
 
 def get_rag_chain(chat_id):
+    #reuse the chain built for this chat, its memory already holds the recent turns
+    if chat_id in rag_chains:
+        return rag_chains[chat_id]
     #load the existing chroma vector store from the chat's saved directory, no re-embedding 
     vectorstore = Chroma(persist_directory=chats[chat_id]["vector_dir"], embedding_function=embeddings)
     #turn the vector store into a retriever  so it can search for relevant chunks 
     retriever = vectorstore.as_retriever()
-    #Create a memory object 
-    memory = ConversationBufferMemory()
-    #starts a for loop over the chat history list , to replay the entire conversation history into memory
-    for msg in chats[chat_id]["history"]:
-        memory.save_context({"input":msg["user"]}, {"output":msg["bot"]})
+    #Create a memory object that only keeps the last few exchanges
+    #the chain saves every new exchange into it, so it stays current without replaying
+    memory = ConversationBufferWindowMemory(k=MEMORY_WINDOW_TURNS, input_key="query", output_key="result")
+    #replay only the turns the window keeps, once, when the chain is first built
+    for msg in chats[chat_id]["history"][-MEMORY_WINDOW_TURNS:]:
+        memory.save_context({"query":msg["user"]}, {"result":msg["bot"]})
     prompt = PromptTemplate(input_variables=["context", "question"],template="""
     You are **sav.in**, a helpful assistant. That also means your identity and name is **sav.in**
     if you are prompted a question about your identity like what is your name? or who are you? or who am 
@@ -182,6 +217,7 @@ def get_rag_chain(chat_id):
     💬 Answer as sav.in:
     """)
     chain = RetrievalQA.from_chain_type(llm = llm, chain_type = "stuff", retriever = retriever, memory = memory, return_source_documents = True)
+    rag_chains[chat_id] = (chain, memory)
     return chain,memory
 
 
@@ -194,8 +230,8 @@ def query_chat(chat_id, query):
     #check if chat exists in chat and has a PDF uploaded 
     #prevent queries without a document 
     if chat_id not in chats or not chats[chat_id]['pdf_path']:
-        #for UI to render
-        return "Upload a document first."
+        #for UI to render, nothing to highlight
+        return "Upload a document first.", []
     #sets up rag pipeline with loaded data/memory
     chain, memory = get_rag_chain(chat_id)
     #sending query into the retrievalqa chain and storing the result in result
@@ -208,11 +244,14 @@ def query_chat(chat_id, query):
     chats[chat_id]["history"].append({"user":query, "bot":response})
     #save the chat for updated history
     save_chat(chat_id)
-    #for each doc in sources get the chunk text which will be present in page_content
-    #Prepares the string for PDF search / Highlight
-    highlight_texts = [doc.page_content for doc in sources]
-    #return the response and highlight texts
-    return response, highlight_texts
+    #for each doc in sources get the anchor stored with it at upload
+    #chunks stored before anchors existed get theirs worked out now
+    anchors = []
+    for doc in sources:
+        anchor = doc.metadata if "anchor_page" in doc.metadata else highlight_anchor(doc)
+        anchors.append({"page": anchor["anchor_page"], "start": anchor["anchor_start"], "end": anchor["anchor_end"], "text": anchor["anchor_text"]})
+    #return the response and highlight anchors, best match first
+    return response, anchors
 
 
 # In[89]:
@@ -310,12 +349,15 @@ with gr.Blocks(title="Sav.in Document Query", theme=theme, css=custom_css) as ap
     def bot_response(history, chat_id):
         #extracts user query for rag call
         query = history[-1][0]
-        # Calls query function. gets answer and chunks 
-        response, highlights = query_chat(chat_id, query)
+        # Calls query function. gets answer and highlight anchors
+        response, anchors = query_chat(chat_id, query)
         # replaces placeholder with response
         history[-1] = (query, response)
-        # returns history, updates PDF search with joined highlight
-        return history, gr.update(search_text="|".join(highlights))
+        # no sources, leave the PDF where it is
+        if not anchors:
+            return history, gr.update()
+        # opens the PDF on the best match's page and marks the short anchor texts
+        return history, gr.update(starting_page=anchors[0]["page"], search_text="|".join(anchor["text"] for anchor in anchors))
     #chat interaction loop, binds submit to add message , input si current history and message 
     msg.submit(add_message, [chatbot, msg], [chatbot, msg]).then(bot_response, [chatbot, current_chat], [chatbot, pdf_viewer])
     #Binds change to upload document 
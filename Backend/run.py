@@ -6,11 +6,16 @@ Clean architecture with no authentication
 import os
 from app import create_app, db
 from app.models.user import User
+from app.utils.schema import upgrade_schema, backfill_chat_stats, create_search_index
+from app.services.warmup import warmup
 
 def create_tables(app):
     """Create database tables and default user"""
     with app.app_context():
         db.create_all()
+        upgrade_schema()
+        backfill_chat_stats()
+        create_search_index()
         
         # Create default user for bypass authentication
         default_user = User.query.filter_by(username='default').first()
@@ -27,6 +32,7 @@ def create_tables(app):
 def main():
     app = create_app()
     create_tables(app)
+    warmup.start(app)
     
     print("=" * 60)
     print("🚀 SAV.IN PDF Chat Application Starting...")
@@ -0,0 +1,70 @@
+"""
+Message Archival
+Move old chat messages into compressed archive batches and report the savings
+
+Usage:
+    python scripts/archive_messages.py
+    python scripts/archive_messages.py --dry-run
+    python scripts/archive_messages.py --vacuum
+
+Each chat keeps its newest MAX_CHAT_HISTORY messages in chat_messages;
+older ones, and ones older than ARCHIVE_AFTER_DAYS, move in batches of
+ARCHIVE_BATCH_MESSAGES into chat_message_archives. The history endpoint
+reads them back transparently, and search keeps finding them through a
+separate index. Start the app once first so the archive tables exist.
+Safe to run repeatedly, e.g. nightly from cron.
+"""
+
+import os
+import sys
+import argparse
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from sqlalchemy import text # type: ignore
+from app import create_app, db
+from app.services.archive_service import ArchiveService
+
+def database_file():
+    """Path of the SQLite database, or None for other backends"""
+    url = db.engine.url
+    return url.database if url.get_backend_name() == 'sqlite' else None
+
+def file_size(path):
+    return os.path.getsize(path) if path and os.path.exists(path) else None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Archive old chat messages')
+    parser.add_argument('--dry-run', action='store_true', help='measure without writing')
+    parser.add_argument('--vacuum', action='store_true', help='compact the SQLite file afterwards')
+    options = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        path = database_file()
+        size_before = file_size(path)
+        hot_before = db.session.execute(text("SELECT COUNT(*) FROM chat_messages")).scalar()
+
+        service = ArchiveService()
+        results = service.archive_all(options.dry_run)
+        moved = sum(result[0] for result in results.values())
+        raw = sum(result[1] for result in results.values())
+        stored = sum(result[2] for result in results.values())
+
+        print(f"{'dry run: ' if options.dry_run else ''}{moved} of {hot_before} messages in {len(results)} chats "
+              f"{'would be ' if options.dry_run else ''}archived with {service.codec}")
+        if moved:
+            print(f"📦 archived text: {raw:,} -> {stored:,} bytes ({raw / max(stored, 1):.1f}x smaller)")
+
+        if options.vacuum and not options.dry_run and path:
+            db.session.remove()
+            with db.engine.connect() as connection:
+                connection.execute(text("VACUUM"))
+            size_after = file_size(path)
+            print(f"💾 {os.path.basename(path)}: {size_before:,} -> {size_after:,} bytes "
+                  f"({(size_before - size_after):,} bytes freed)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
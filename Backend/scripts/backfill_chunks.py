@@ -0,0 +1,76 @@
+"""
+Chunk Table Backfill
+Fill document_chunks for documents processed before the table or its anchors existed
+
+Usage:
+    python scripts/backfill_chunks.py
+    python scripts/backfill_chunks.py --dry-run
+
+Re-extracts each completed document's PDF and splits it with the current
+chunking settings, which reproduces the chunks in its vector store as long
+as CHUNK_SIZE and CHUNK_OVERLAP are unchanged. A document whose chunk count
+no longer matches its index is reported and left alone; reprocess it instead.
+Also replaces the estimated chunk_count with the exact one.
+"""
+
+import os
+import sys
+import argparse
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from app import create_app, db
+from app.models.document import Document, DocumentChunk
+from app.services.document_service import DocumentService
+from app.services.rag_service import RAGService
+from app.services.vector_store_cache import vector_store_cache
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backfill the document chunk table')
+    parser.add_argument('--dry-run', action='store_true', help='check without writing')
+    options = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        chunked = db.session.query(DocumentChunk.document_id).filter(DocumentChunk.anchors.isnot(None)).distinct()
+        documents = Document.query.filter(
+            Document.status == 'completed',
+            Document.vector_store_id.isnot(None),
+            ~Document.id.in_(chunked)
+        ).all()
+
+        rag_service = RAGService()
+        filled = skipped = 0
+        for document in documents:
+            vector_store, _ = vector_store_cache.load(document.vector_store_id, rag_service.embeddings)
+            text_content = DocumentService._extract_pdf_text(document.file_path) if os.path.exists(document.file_path) else ''
+            if vector_store is None or not text_content:
+                print(f"⏭️  {document.original_filename}: missing PDF or vector store")
+                skipped += 1
+                continue
+
+            chunks = rag_service.text_splitter.create_documents([text_content])
+            if len(chunks) != vector_store.index.ntotal:
+                print(f"⏭️  {document.original_filename}: {len(chunks)} chunks now, "
+                      f"{vector_store.index.ntotal} indexed; reprocess it")
+                skipped += 1
+                continue
+
+            if not options.dry_run:
+                RAGService.record_chunks(
+                    document.id, text_content,
+                    [chunk.metadata['start_index'] for chunk in chunks],
+                    [chunk.page_content for chunk in chunks]
+                )
+                document.chunk_count = len(chunks)
+                db.session.commit()
+            print(f"✅ {document.original_filename}: {len(chunks)} chunks (estimated {document.chunk_count})"
+                  if options.dry_run else f"✅ {document.original_filename}: {len(chunks)} chunks")
+            filled += 1
+
+        print(f"{'dry run: ' if options.dry_run else ''}{filled} documents filled, {skipped} skipped")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""
+Message Search Backfill
+Rebuild the full-text search index from chat_messages
+
+Usage:
+    python scripts/backfill_search.py
+
+The app creates and fills the FTS5 index at startup and its triggers keep
+it current, so this is only needed to repair an index, e.g. after
+restoring a backup. Safe to run while the app is up; writers wait for the
+rebuild.
+"""
+
+import os
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from app import create_app, db
+from app.utils.schema import create_search_index, rebuild_search_index
+
+def main():
+    app = create_app()
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            print("❌ Message search uses SQLite FTS5; this database is not SQLite")
+            return 1
+        create_search_index()
+        start = time.perf_counter()
+        indexed = rebuild_search_index()
+        print(f"✅ Indexed {indexed} messages in {time.perf_counter() - start:.1f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Context Compression Benchmark
+Prompt tokens saved by adaptive k and compression versus answer overlap
+
+Usage:
+    python scripts/bench_compression.py --pdf contract.pdf --questions questions.txt
+    python scripts/bench_compression.py --text notes.txt --no-generate
+
+Each question is answered twice, from whole chunks and from compressed
+context, with the same model. Overlap is the token F1 between the two
+answers: it shows how much of the full-context answer survives, not
+whether either answer is right.
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_QUESTIONS = [
+    "What is this document about?",
+    "What are the key obligations described?",
+    "What dates or deadlines are mentioned?",
+    "What happens if one party breaches the agreement?",
+    "Who are the parties involved?"
+]
+
+def token_f1(a, b):
+    """Token-level F1 between two answers"""
+    left = Counter(re.findall(r'\w+', a.lower()))
+    right = Counter(re.findall(r'\w+', b.lower()))
+    common = sum((left & right).values())
+    if not common:
+        return 0.0
+    precision = common / sum(left.values())
+    recall = common / sum(right.values())
+    return 2 * precision * recall / (precision + recall)
+
+def load_text(options):
+    """Read the benchmark document as plain text"""
+    if options.pdf:
+        from app.services.document_service import DocumentService
+        return DocumentService._extract_pdf_text(options.pdf)
+    with open(options.text, encoding='utf-8') as f:
+        return f.read()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark context compression')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--pdf', help='PDF to index')
+    source.add_argument('--text', help='plain text file to index')
+    parser.add_argument('--questions', help='file with one question per line')
+    parser.add_argument('--no-generate', action='store_true', help='only compare prompt sizes')
+    options = parser.parse_args(argv)
+
+    from app import create_app
+    from app.services.rag_service import RAGService
+    from app.services.retrieval_service import RetrievalService
+    from app.services.vector_store_cache import vector_store_cache
+    from app.services.prompt_builder import PromptBuilder
+    from app.services.context_compressor import ContextCompressor
+    from app.services import query_cache
+
+    questions = DEFAULT_QUESTIONS
+    if options.questions:
+        with open(options.questions, encoding='utf-8') as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    app = create_app()
+    with app.app_context():
+        config = app.config
+        rag = RAGService()
+        ok, message, vector_store_id = rag.process_document(load_text(options), 'bench', 'benchmark')
+        if not ok:
+            print(f"❌ {message}")
+            return 1
+
+        try:
+            vector_store, version = vector_store_cache.load(vector_store_id, rag.embeddings)
+            retrieval = RetrievalService(vector_store, vector_store_id, version)
+            compressor = ContextCompressor(
+                rag.embeddings,
+                config['EMBEDDING_MODEL'],
+                max_tokens=config['COMPRESSION_MAX_TOKENS'],
+                min_relative=config['COMPRESSION_MIN_RELATIVE']
+            )
+            llm = rag.get_llm(config['LLM_MODEL'])
+            builder = PromptBuilder()
+
+            rows = []
+            for question in questions:
+                embedding = query_cache.embed_query(rag.embeddings, config['EMBEDDING_MODEL'], question)
+                results = retrieval.search(embedding, k=config['RETRIEVAL_K'], mode=config['RETRIEVAL_MODE'],
+                                           fetch_k=config['RETRIEVAL_FETCH_K'], lambda_mult=config['MMR_LAMBDA'])
+                full_docs = [doc for doc, _ in results]
+                kept = RetrievalService.adaptive_cut(results, config['ADAPTIVE_K_MIN_SCORE'], config['ADAPTIVE_K_RELATIVE'])
+                compressed_docs = compressor.compress(embedding, [doc for doc, _ in kept])
+
+                full = builder.build('benchmark', question, full_docs, [])
+                compressed = builder.build('benchmark', question, compressed_docs, [])
+                row = {
+                    'question': question,
+                    'chunks': (len(full_docs), len(compressed_docs)),
+                    'tokens': (full.tokens, compressed.tokens),
+                    'compress_ms': compressor.stats.get('compress_ms', 0.0)
+                }
+
+                if not options.no_generate:
+                    timings = []
+                    answers = []
+                    # Run sequentially so neither answer waits behind the other
+                    for prompt in (full.prompt, compressed.prompt):
+                        start = time.perf_counter()
+                        answers.append(llm.invoke(prompt, priority='background'))
+                        timings.append(time.perf_counter() - start)
+                    row['seconds'] = tuple(timings)
+                    row['overlap'] = token_f1(answers[1], answers[0])
+                rows.append(row)
+
+                saved = 1 - row['tokens'][1] / max(1, row['tokens'][0])
+                line = f"{question[:50]:<50} tokens {row['tokens'][0]:>5} -> {row['tokens'][1]:>5} ({saved:.0%} saved)" \
+                       f"  chunks {row['chunks'][0]}->{row['chunks'][1]}  compress {row['compress_ms']:.0f}ms"
+                if 'overlap' in row:
+                    line += f"  gen {row['seconds'][0]:.1f}s -> {row['seconds'][1]:.1f}s  overlap {row['overlap']:.2f}"
+                print(line)
+
+            total_full = sum(row['tokens'][0] for row in rows)
+            total_compressed = sum(row['tokens'][1] for row in rows)
+            print(f"\n📉 Prompt tokens: {total_full} -> {total_compressed} "
+                  f"({1 - total_compressed / max(1, total_full):.0%} saved over {len(rows)} questions)")
+            if not options.no_generate and rows:
+                print(f"⏱️  Generation: {sum(r['seconds'][0] for r in rows):.1f}s -> {sum(r['seconds'][1] for r in rows):.1f}s")
+                print(f"🔁 Mean answer overlap: {sum(r['overlap'] for r in rows) / len(rows):.2f}")
+        finally:
+            rag.delete_document_vectors(vector_store_id)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Context Reuse Benchmark
+Time-to-first-token over a multi-turn chat with and without Ollama context reuse
+
+Usage:
+    python scripts/bench_context_reuse.py --pdf contract.pdf
+    python scripts/bench_context_reuse.py --text notes.txt --questions questions.txt
+
+Runs the same conversation twice against a scratch database: once sending
+the full prompt every turn, once continuing the chat's Ollama context.
+Each run goes start to finish before the other so neither evicts the
+other's KV cache. Turn 1 is identical in both runs; the later turns show
+the difference.
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+from statistics import mean, median
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_QUESTIONS = [
+    "What is this document about?",
+    "Who are the parties involved?",
+    "What are their main obligations?",
+    "What dates or deadlines are mentioned?",
+    "What happens if one party breaches the agreement?",
+    "How can the agreement be terminated?",
+    "Summarize what we discussed so far."
+]
+
+def load_text(options):
+    """Read the benchmark document as plain text"""
+    if options.pdf:
+        from app.services.document_service import DocumentService
+        return DocumentService._extract_pdf_text(options.pdf)
+    with open(options.text, encoding='utf-8') as f:
+        return f.read()
+
+def run_conversation(rag, chat_id, questions):
+    """Ask every question in one chat and collect per-turn timings"""
+    rows = []
+    for question in questions:
+        success, message, data = rag.chat_with_document(chat_id, question)
+        if not success:
+            raise RuntimeError(message)
+        timings = data['timings']
+        rows.append({
+            'ttft_ms': timings.get('ttft_ms') or 0.0,
+            'prompt_eval_count': timings.get('prompt_eval_count'),
+            'reused': timings.get('reused_context_tokens', 0),
+            'prompt_tokens': data['prompt']['tokens']
+        })
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark Ollama context reuse')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--pdf', help='PDF to index')
+    source.add_argument('--text', help='plain text file to index')
+    parser.add_argument('--questions', help='file with one question per line')
+    options = parser.parse_args(argv)
+
+    scratch = tempfile.mkdtemp(prefix='savin-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+
+    from app import create_app, db
+    from app.models import Document, Chat, User
+    from app.services.rag_service import RAGService
+    from run import create_tables
+
+    questions = DEFAULT_QUESTIONS
+    if options.questions:
+        with open(options.questions, encoding='utf-8') as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    app = create_app()
+    create_tables(app)
+    with app.app_context():
+        rag = RAGService()
+        ok, message, vector_store_id = rag.process_document(load_text(options), 'bench_reuse', 'benchmark')
+        if not ok:
+            print(f"❌ {message}")
+            return 1
+
+        try:
+            user = User.query.first()
+            document = Document(
+                filename='benchmark',
+                original_filename='benchmark',
+                file_path=options.pdf or options.text,
+                file_size=0,
+                user_id=user.id,
+                status='completed',
+                vector_store_id=vector_store_id
+            )
+            db.session.add(document)
+            db.session.commit()
+
+            results = {}
+            for label, reuse in (('full prompt', False), ('context reuse', True)):
+                chat = Chat(title=label, user_id=user.id, document_id=document.id)
+                chat.set_settings({'context_reuse': reuse, 'answer_cache': False})
+                db.session.add(chat)
+                db.session.commit()
+                results[label] = run_conversation(rag, chat.id, questions)
+
+            print(f"{'turn':<6}{'full prompt TTFT':>18}{'reuse TTFT':>14}{'prefilled (full/reuse)':>26}{'reused ctx':>12}")
+            for turn, (full, reused) in enumerate(zip(results['full prompt'], results['context reuse']), 1):
+                print(f"{turn:<6}{full['ttft_ms']:>16.0f}ms{reused['ttft_ms']:>12.0f}ms"
+                      f"{str(full['prompt_eval_count']) + ' / ' + str(reused['prompt_eval_count']):>26}{reused['reused']:>12}")
+
+            for label, rows in results.items():
+                later = [row['ttft_ms'] for row in rows[1:]] or [0.0]
+                print(f"\n⏱️  {label}: turns 2+ TTFT mean {mean(later):.0f}ms, median {median(later):.0f}ms")
+        finally:
+            rag.delete_document_vectors(vector_store_id)
+            shutil.rmtree(scratch, ignore_errors=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Startup Import Benchmark
+Import-time profile of create_app() with a regression budget
+
+Usage:
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --runs 7 --top 20
+    python scripts/bench_startup.py --budget-ms 900
+
+Runs `python -X importtime` on a fresh interpreter that builds the app,
+as a worker does on cold start, and reports the median total import time
+and the packages that cost the most. Exits non-zero if the median is over
+budget or a deferred package (langchain, FAISS, PyPDF2) was imported at
+startup, so it can gate CI.
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import subprocess
+from collections import defaultdict
+from statistics import median
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import budget for create_app() on a developer laptop; most of it is Flask,
+# SQLAlchemy and numpy
+STARTUP_BUDGET_MS = 900
+
+# Loaded on the first upload or chat, never at startup
+DEFERRED_PACKAGES = (
+    'langchain', 'langchain_core', 'langchain_community', 'langchain_text_splitters',
+    'langsmith', 'faiss', 'PyPDF2', 'sentence_transformers', 'torch'
+)
+
+STARTUP = "from app import create_app; create_app()"
+
+def profile(env):
+    """Run one cold start; return {module: (self_us, cumulative_us)}"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP],
+        cwd=BACKEND, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Profile app startup imports')
+    parser.add_argument('--runs', type=int, default=5, help='cold starts to take the median of')
+    parser.add_argument('--top', type=int, default=12, help='packages to list')
+    parser.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS, help='fail above this')
+    options = parser.parse_args(argv)
+
+    scratch = tempfile.mkdtemp(prefix='savin-bench-')
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(scratch, 'bench.db')}")
+
+    profile(env)  # compile bytecode so the first measured run isn't an outlier
+    runs = [profile(env) for _ in range(options.runs)]
+    totals = [sum(self_us for self_us, _ in modules.values()) / 1000 for modules in runs]
+    total = median(totals)
+
+    packages = defaultdict(list)
+    for modules in runs:
+        spent = defaultdict(int)
+        for name, (self_us, _) in modules.items():
+            spent[name.split('.')[0]] += self_us
+        for package, self_us in spent.items():
+            packages[package].append(self_us / 1000)
+    ranked = sorted(((median(times), package) for package, times in packages.items()), reverse=True)
+
+    print(f"{'package':<32}{'import ms':>12}")
+    for spent, package in ranked[:options.top]:
+        print(f"{package:<32}{spent:>12.1f}")
+
+    loaded = sorted({name.split('.')[0] for modules in runs for name in modules} & set(DEFERRED_PACKAGES))
+    print(f"\n⏱️  create_app() imports: median {total:.0f}ms over {options.runs} runs "
+          f"(min {min(totals):.0f}ms, max {max(totals):.0f}ms), budget {options.budget_ms:.0f}ms")
+
+    failed = False
+    if loaded:
+        print(f"❌ Deferred packages imported at startup: {', '.join(loaded)}")
+        failed = True
+    if total > options.budget_ms:
+        print(f"❌ Over budget by {total - options.budget_ms:.0f}ms")
+        failed = True
+    if not failed:
+        print("✅ Within budget")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
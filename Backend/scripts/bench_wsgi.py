@@ -0,0 +1,183 @@
+"""
+WSGI Server Benchmark
+Requests per second of the Werkzeug dev server versus gunicorn
+
+Usage:
+    python scripts/bench_wsgi.py
+    python scripts/bench_wsgi.py --threads 16 --concurrency 32 --duration 20
+    python scripts/bench_wsgi.py --path /api/chat/list --path /api/system/metrics
+
+Starts each server in turn against the same scratch database, the dev
+server exactly as run.py does (debug on, threaded) and gunicorn with
+gunicorn.conf.py, then drives it with `--concurrency` client threads for
+`--duration` seconds, cycling through the given paths. gunicorn runs the
+single worker gunicorn.conf.py allows. Run it on a machine with spare
+cores: the clients share the CPU with the server.
+"""
+
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from statistics import median
+
+import requests # type: ignore
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PATHS = ['/api/chat/list', '/api/document/list', '/api/system/metrics']
+
+DEV_SERVER = """
+import sys
+from app import create_app
+from run import create_tables
+app = create_app()
+create_tables(app)
+app.run(host='127.0.0.1', port=int(sys.argv[1]), debug=True, threaded=True, use_reloader=False)
+"""
+
+def free_port():
+    """Pick an unused local port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_until_up(base_url, path, process, timeout=60):
+    """Poll until the server answers, failing if it exits first"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            requests.get(base_url + path, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"server not up after {timeout}s")
+
+def client_process(base_url, paths, threads, offset, stop_at, results):
+    """Run `threads` clients in one process and report their latencies"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client(first):
+        session = requests.Session()
+        own = []
+        failed = 0
+        i = first
+        while time.time() < stop_at:
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + paths[i % len(paths)], timeout=10)
+                if response.status_code >= 500:
+                    failed += 1
+            except requests.RequestException:
+                failed += 1
+            own.append(time.perf_counter() - start)
+            i += 1
+        with lock:
+            latencies.extend(own)
+            errors[0] += failed
+
+    workers = [threading.Thread(target=client, args=(offset + n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results.put((latencies, errors[0]))
+
+def drive(base_url, paths, concurrency, duration, processes):
+    """Hammer the server from several client processes, so the GIL of a
+    single client doesn't cap the measurement"""
+    processes = max(1, min(processes, concurrency))
+    results = multiprocessing.Queue()
+    stop_at = time.time() + duration
+    clients = [
+        multiprocessing.Process(target=client_process, args=(
+            base_url, paths, concurrency // processes + (n < concurrency % processes),
+            n * concurrency, stop_at, results
+        ))
+        for n in range(processes)
+    ]
+    for client in clients:
+        client.start()
+
+    latencies = []
+    errors = 0
+    for _ in clients:
+        own, failed = results.get()
+        latencies.extend(own)
+        errors += failed
+    for client in clients:
+        client.join()
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / duration,
+        'p50_ms': median(latencies) * 1000 if latencies else 0.0,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+        'errors': errors
+    }
+
+def run_server(label, command, port, env, options):
+    """Start a server, benchmark it, and stop it"""
+    base_url = f'http://127.0.0.1:{port}'
+    process = subprocess.Popen(command, cwd=BACKEND, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(base_url, options.path[0], process)
+        drive(base_url, options.path, options.concurrency, min(2, options.duration), options.client_processes)  # warm up
+        result = drive(base_url, options.path, options.concurrency, options.duration, options.client_processes)
+        print(f"{label:<28}{result['rps']:>10.0f}{result['p50_ms']:>10.1f}ms{result['p95_ms']:>10.1f}ms"
+              f"{result['requests']:>10}{result['errors']:>8}")
+        return result
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the dev server against gunicorn')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent client threads')
+    parser.add_argument('--client-processes', type=int, default=min(4, os.cpu_count() or 1),
+                        help='processes the client threads are spread over')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per server')
+    parser.add_argument('--path', action='append', help='path to request (repeatable)')
+    options = parser.parse_args(argv)
+    options.path = options.path or DEFAULT_PATHS
+
+    scratch = tempfile.mkdtemp(prefix='savin-bench-')
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(scratch, 'bench.db')}")
+
+    print(f"{'server':<28}{'req/s':>10}{'p50':>12}{'p95':>12}{'requests':>10}{'errors':>8}")
+    try:
+        dev_port = free_port()
+        dev = run_server('werkzeug dev server', [sys.executable, '-c', DEV_SERVER, str(dev_port)],
+                         dev_port, env, options)
+        gunicorn_port = free_port()
+        gunicorn = run_server(
+            f'gunicorn 1w x {options.threads}t',
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+             '--bind', f'127.0.0.1:{gunicorn_port}',
+             '--threads', str(options.threads), 'wsgi:app'],
+            gunicorn_port, env, options
+        )
+        if dev['rps']:
+            print(f"\n🚀 gunicorn serves {gunicorn['rps'] / dev['rps']:.1f}x the dev server's requests/sec")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Message Sources Migration
+Rewrite stored source snippets as compact chunk references and report the savings
+
+Usage:
+    python scripts/migrate_sources.py
+    python scripts/migrate_sources.py --dry-run
+    python scripts/migrate_sources.py --vacuum
+
+Assistant messages used to keep a JSON copy of every cited chunk's first
+200 characters; they now store "doc_1:12 doc_1:3" and the text is looked
+up in the vector store when a client asks for it. Old rows keep working
+either way, so this can run at any time. --vacuum rebuilds the SQLite file
+afterwards so the freed pages are returned to the filesystem.
+"""
+
+import os
+import sys
+import argparse
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from sqlalchemy import text # type: ignore
+from app import create_app, db
+from app.utils.schema import migrate_message_sources
+
+def database_file():
+    """Path of the SQLite database, or None for other backends"""
+    url = db.engine.url
+    return url.database if url.get_backend_name() == 'sqlite' else None
+
+def file_size(path):
+    return os.path.getsize(path) if path and os.path.exists(path) else None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Migrate message sources to chunk references')
+    parser.add_argument('--batch-size', type=int, default=500, help='messages rewritten per transaction')
+    parser.add_argument('--dry-run', action='store_true', help='measure without writing')
+    parser.add_argument('--vacuum', action='store_true', help='compact the SQLite file afterwards')
+    options = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        path = database_file()
+        size_before = file_size(path)
+        total = db.session.execute(text("SELECT COUNT(*) FROM chat_messages WHERE sources IS NOT NULL")).scalar()
+
+        rewritten, before, after = migrate_message_sources(options.batch_size, options.dry_run)
+        print(f"{'dry run: ' if options.dry_run else ''}{rewritten} of {total} messages with sources "
+              f"{'would be ' if options.dry_run else ''}rewritten")
+        if rewritten:
+            print(f"📉 sources column: {before:,} -> {after:,} bytes "
+                  f"({100 * (1 - after / before):.1f}% smaller, {before / rewritten:.0f} -> {after / rewritten:.0f} per message)")
+
+        if options.vacuum and not options.dry_run and path:
+            db.session.remove()
+            with db.engine.connect() as connection:
+                connection.execute(text("VACUUM"))
+            size_after = file_size(path)
+            print(f"💾 {os.path.basename(path)}: {size_before:,} -> {size_after:,} bytes "
+                  f"({(size_before - size_after):,} bytes freed)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
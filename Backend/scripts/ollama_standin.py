@@ -0,0 +1,155 @@
+"""
+Ollama Stand-In Server
+Minimal fake of the Ollama API for exercising pools, batching and streaming locally
+
+Usage:
+    python scripts/ollama_standin.py --port 11501 --delay 0.5
+    python scripts/ollama_standin.py --port 11502 --fail-rate 0.3
+    python scripts/ollama_standin.py --prefill-ms-per-token 1.5
+
+Embeddings are deterministic bag-of-words hashes, so retrieval still
+behaves sensibly. Generation streams one word per chunk and stops as soon
+as the client disconnects, like the real server.
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def fake_embedding(text, dim):
+    """Hash words into a normalized vector"""
+    vector = [0.0] * dim
+    for word in re.findall(r'\w+', text.lower()):
+        vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % dim] += 1.0
+    norm = sum(value * value for value in vector) ** 0.5 or 1.0
+    return [value / norm for value in vector]
+
+def fake_tokens(text):
+    """Map words to stable token ids"""
+    return [int(hashlib.md5(word.encode()).hexdigest(), 16) % 50000 for word in text.split()]
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    options = None
+    slot = []  # Tokens of the last request, standing in for the KV cache
+    stats = {'generate': 0, 'embed': 0, 'aborted': 0, 'failed': 0}
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith('/api/tags'):
+            self._send_json({'models': []})
+        elif self.path.startswith('/stats'):
+            self._send_json(self.stats)
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+
+        if random.random() < self.options.fail_rate:
+            self.stats['failed'] += 1
+            self._send_json({'error': 'simulated failure'}, 500)
+            return
+
+        if self.path == '/api/embed':
+            self.stats['embed'] += 1
+            inputs = body.get('input', '')
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            time.sleep(self.options.embed_delay)
+            self._send_json({
+                'model': body.get('model'),
+                'embeddings': [fake_embedding(text, self.options.dim) for text in inputs]
+            })
+        elif self.path == '/api/generate':
+            self.stats['generate'] += 1
+            self._generate(body)
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def _generate(self, body):
+        """Answer with a few words, streamed or whole"""
+        prompt = body.get('prompt', '')
+        words = f'Stand-in answer from port {self.server.server_port} for a {len(prompt)} character prompt.'.split()
+
+        # Like Ollama's runner, only tokens past the prefix shared with the
+        # previous request need prefilling
+        tokens = list(body.get('context') or []) + fake_tokens(prompt)
+        cached = 0
+        for previous, token in zip(StandInHandler.slot, tokens):
+            if previous != token:
+                break
+            cached += 1
+        time.sleep(self.options.delay + self.options.prefill_ms_per_token * (len(tokens) - cached) / 1000)
+        context = tokens + fake_tokens(' '.join(words))
+        StandInHandler.slot = context
+
+        done = {
+            'model': body.get('model'),
+            'response': '',
+            'done': True,
+            'context': context,
+            'prompt_eval_count': len(tokens) - cached,
+            'eval_count': len(words)
+        }
+
+        if not body.get('stream', True):
+            done['response'] = ' '.join(words)
+            self._send_json(done)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for word in words:
+                time.sleep(self.options.token_delay)
+                self._write_chunk({'model': body.get('model'), 'response': word + ' ', 'done': False})
+            self._write_chunk(done)
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.stats['aborted'] += 1
+
+    def _write_chunk(self, payload):
+        line = (json.dumps(payload) + '\n').encode()
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+        self.wfile.flush()
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a fake Ollama server')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--delay', type=float, default=0.2, help='seconds before the first token')
+    parser.add_argument('--prefill-ms-per-token', type=float, default=0.0,
+                        help='extra delay per prompt token not shared with the previous request')
+    parser.add_argument('--token-delay', type=float, default=0.02, help='seconds between tokens')
+    parser.add_argument('--embed-delay', type=float, default=0.01, help='seconds per embed call')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of requests answered with 500')
+    parser.add_argument('--dim', type=int, default=64, help='embedding dimension')
+    options = parser.parse_args(argv)
+
+    StandInHandler.options = options
+    server = ThreadingHTTPServer(('127.0.0.1', options.port), StandInHandler)
+    print(f"🧪 Ollama stand-in listening on http://127.0.0.1:{options.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,6 +9,10 @@ class ChatManager {
         this.currentChatId = null;
         this.currentDocumentId = null;
         this.isTyping = false;
+        this.snippetCache = new Map(); // chunk index -> {text, pages}, for the current chat
+        this.oldestMessageId = null; // id of the earliest message shown
+        this.hasEarlier = false; // older (possibly archived) messages exist
+        this.loadingEarlier = false;
         
         // DOM Elements
         this.documentsList = document.getElementById('documentsList');
@@ -45,6 +49,11 @@ class ChatManager {
         // Send button
         this.sendButton.addEventListener('click', () => this.sendMessage());
         
+        // Older history is fetched a page at a time on scroll-back
+        this.messagesContainer.addEventListener('scroll', () => {
+            if (this.messagesContainer.scrollTop < 80) this.loadEarlierMessages();
+        });
+        
         // Document search
         this.docSearch.addEventListener('input', (e) => {
             this.filterDocuments(e.target.value);
@@ -237,6 +246,7 @@ class ChatManager {
             // Set current IDs
             this.currentChatId = chatId;
             this.currentDocumentId = documentId;
+            this.snippetCache.clear();
             
             // Update URL
             window.history.replaceState(
@@ -256,9 +266,12 @@ class ChatManager {
                 this.documentMeta.textContent = `${chat.message_count || 0} messages`;
                 
                 // Display messages
-                if (chat.messages && chat.messages.length > 0) {
-                    this.displayMessages(chat.messages);
+                const messages = chat.messages || [];
+                if (messages.length > 0) {
+                    this.displayMessages(messages);
                 }
+                this.oldestMessageId = messages.length > 0 ? messages[0].id : null;
+                this.hasEarlier = messages.length > 0 && messages.length < (chat.message_count || 0);
                 
                 // Enable input
                 this.enableChatInput();
@@ -285,12 +298,41 @@ class ChatManager {
         
         // Add chat messages (skip system messages)
         messages.filter(msg => msg.role !== 'system').forEach(msg => {
-            this.addMessageToUI(msg.role, msg.content, msg.sources);
+            this.addMessageToUI(msg.role, msg.content, msg.sources, false, msg.id);
         });
         
         this.scrollToBottom();
     }
     
+    async loadEarlierMessages() {
+        if (!this.hasEarlier || this.loadingEarlier || !this.currentChatId) return;
+        
+        this.loadingEarlier = true;
+        const chatId = this.currentChatId;
+        try {
+            const response = await apiRequest(`/chat/${chatId}/messages?before=${this.oldestMessageId}`);
+            if (!response.success) throw new Error(response.message);
+            if (chatId !== this.currentChatId) return;
+            
+            const { messages, has_more } = response.data;
+            
+            // Insert above the current first message, keeping the view where it was
+            const first = this.messagesContainer.querySelector('.message[data-id]');
+            const previousHeight = this.messagesContainer.scrollHeight;
+            messages.filter(msg => msg.role !== 'system').forEach(msg => {
+                this.addMessageToUI(msg.role, msg.content, msg.sources, false, msg.id, first);
+            });
+            this.messagesContainer.scrollTop += this.messagesContainer.scrollHeight - previousHeight;
+            
+            if (messages.length > 0) this.oldestMessageId = messages[0].id;
+            this.hasEarlier = has_more && messages.length > 0;
+        } catch (error) {
+            console.error('Failed to load earlier messages:', error);
+        } finally {
+            this.loadingEarlier = false;
+        }
+    }
+    
     enableChatInput() {
         this.messageInput.disabled = false;
         this.messageInput.placeholder = "Ask about your document...";
@@ -341,9 +383,10 @@ class ChatManager {
         }
     }
     
-    addMessageToUI(role, content, sources = [], isError = false) {
+    addMessageToUI(role, content, sources = [], isError = false, messageId = null, before = null) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${role}`;
+        if (messageId) messageDiv.dataset.id = messageId;
         
         const avatarIcon = role === 'user' ? 'person' : 'smart_toy';
         const timestamp = new Date().toLocaleTimeString([], {hour: '2-digit', minute:'2-digit'});
@@ -355,7 +398,7 @@ class ChatManager {
                 <div class="message-sources">
                     <strong>Sources:</strong>
                     ${sources.map(source => `
-                        <div class="source-item">
+                        <div class="source-item" data-chunk="${source.chunk_index}">
                             <i class="material-icons">link</i>
                             <span>Source ${source.chunk_index + 1}</span>
                         </div>
@@ -375,10 +418,55 @@ class ChatManager {
             </div>
         `;
         
+        // Source text is only fetched when the reader asks for it
+        const sourcesDiv = messageDiv.querySelector('.message-sources');
+        if (sourcesDiv) {
+            sourcesDiv.addEventListener('click', (e) => {
+                if (e.target.closest('.source-item')) this.showSnippets(sourcesDiv);
+            }, { once: true });
+        }
+        
+        if (before) {
+            this.messagesContainer.insertBefore(messageDiv, before);
+            return;
+        }
         this.messagesContainer.appendChild(messageDiv);
         this.scrollToBottom();
     }
     
+    async showSnippets(sourcesDiv) {
+        const items = [...sourcesDiv.querySelectorAll('.source-item')];
+        const missing = items.map(item => item.dataset.chunk)
+                             .filter(chunk => !this.snippetCache.has(chunk));
+        
+        try {
+            if (missing.length > 0) {
+                const response = await apiRequest(
+                    `/chat/${this.currentChatId}/snippets?chunks=${missing.join(',')}`
+                );
+                if (!response.success) throw new Error(response.message);
+                Object.entries(response.data.snippets).forEach(([chunk, text]) => {
+                    this.snippetCache.set(chunk, { text, pages: response.data.pages[chunk] });
+                });
+            }
+        } catch (error) {
+            console.error('Failed to load sources:', error);
+            return;
+        }
+        
+        items.forEach(item => {
+            const cached = this.snippetCache.get(item.dataset.chunk);
+            if (!cached || item.querySelector('small')) return;
+            const [first, last] = cached.pages || [];
+            if (first) {
+                item.querySelector('span').textContent += first === last ? ` · p. ${first}` : ` · pp. ${first}-${last}`;
+            }
+            const snippet = document.createElement('small');
+            snippet.textContent = cached.text;
+            item.querySelector('span').appendChild(snippet);
+        });
+    }
+    
     showTypingIndicator() {
         this.isTyping = true;
         const typingDiv = document.createElement('div');
@@ -477,6 +565,7 @@ class ChatManager {
                 if (welcomeMessage) {
                     this.messagesContainer.appendChild(welcomeMessage);
                 }
+                this.hasEarlier = false;
                 
                 showNotification('Chat cleared successfully', 'success');
             } else {
@@ -10,6 +10,8 @@ class UploadManager {
         this.browseButton = document.getElementById('browseButton');
         this.refreshButton = document.getElementById('refreshBtn');
         this.documentsList = document.getElementById('documentsList');
+        this.progressStreams = new Map();
+        this.latestProgress = new Map();
         
         this.init();
     }
@@ -17,7 +19,6 @@ class UploadManager {
     init() {
         this.setupEventListeners();
         this.loadDocuments();
-        this.startPolling();
     }
     
     setupEventListeners() {
@@ -197,7 +198,82 @@ class UploadManager {
         this.fileInput.value = '';
     }
     
-    async monitorDocumentProcessing(documentId) {
+    monitorDocumentProcessing(documentId) {
+        if (!window.EventSource) {
+            this.pollDocumentProcessing(documentId);
+            return;
+        }
+        if (this.progressStreams.has(documentId)) {
+            return;
+        }
+        
+        // The server pushes each stage as it happens
+        const source = new EventSource(`${API_BASE}/document/${documentId}/progress/stream`);
+        this.progressStreams.set(documentId, source);
+        let heard = false;
+        
+        source.addEventListener('progress', (e) => {
+            heard = true;
+            const event = JSON.parse(e.data);
+            this.updateDocumentProgress(event);
+            
+            if (event.stage === 'completed' || event.stage === 'error') {
+                source.close();
+                this.progressStreams.delete(documentId);
+                this.latestProgress.delete(documentId);
+                
+                if (event.stage === 'completed') {
+                    showNotification('Document processed and ready for chat!', 'success');
+                } else {
+                    showNotification(`Processing failed: ${event.error_message}`, 'error');
+                }
+                this.loadDocuments();
+            }
+        });
+        
+        source.onerror = () => {
+            // EventSource reconnects by itself once connected; if it never
+            // got through, fall back to polling
+            if (!heard) {
+                source.close();
+                this.progressStreams.delete(documentId);
+                this.pollDocumentProcessing(documentId);
+            }
+        };
+    }
+    
+    updateDocumentProgress(event) {
+        this.latestProgress.set(event.document_id, event);
+        
+        const item = this.documentsList.querySelector(`.document-item[data-id="${event.document_id}"]`);
+        if (!item) {
+            return;
+        }
+        
+        const bar = item.querySelector('.mini-progress div');
+        if (bar) {
+            bar.style.width = `${event.progress}%`;
+        }
+        
+        const badge = item.querySelector('.status-badge');
+        if (badge && event.stage !== 'completed' && event.stage !== 'error') {
+            badge.textContent = this.describeStage(event);
+        }
+    }
+    
+    describeStage(event) {
+        const counts = event.total ? ` ${event.done}/${event.total}` : '';
+        switch (event.stage) {
+            case 'queued': return 'queued';
+            case 'extracting': return `reading pages${counts}`;
+            case 'chunking': return `${event.total || 0} chunks`;
+            case 'embedding': return `embedding${counts}`;
+            case 'indexing': return 'indexing';
+            default: return event.stage;
+        }
+    }
+    
+    async pollDocumentProcessing(documentId) {
         const pollInterval = 2000; // 2 seconds
         let attempts = 0;
         const maxAttempts = 30; // 60 seconds total
@@ -264,6 +340,11 @@ class UploadManager {
         
         // Add event listeners
         this.addDocumentEventListeners();
+        
+        // Follow documents still being processed, e.g. after a page reload
+        documents
+            .filter(doc => doc.status === 'uploading' || doc.status === 'processing')
+            .forEach(doc => this.monitorDocumentProcessing(doc.id));
     }
     
     createDocumentHTML(doc) {
@@ -271,11 +352,13 @@ class UploadManager {
         const isCompleted = doc.status === 'completed';
         const isProcessing = doc.status === 'processing';
         
+        const live = this.latestProgress.get(doc.id);
+        
         let progressHtml = '';
         if (isProcessing) {
             progressHtml = `
                 <div class="mini-progress">
-                    <div style="width: ${doc.processing_progress || 0}%"></div>
+                    <div style="width: ${live ? live.progress : (doc.processing_progress || 0)}%"></div>
                 </div>
             `;
         }
@@ -412,16 +495,6 @@ class UploadManager {
         }
     }
     
-    startPolling() {
-        // Poll for document updates every 5 seconds
-        setInterval(() => {
-            const processingDocs = this.documentsList.querySelectorAll('[data-status="processing"]');
-            if (processingDocs.length > 0) {
-                this.loadDocuments();
-            }
-        }, 5000);
-    }
-    
     sendSuggestion(question) {
         // Store the suggested question and navigate to chat
         sessionStorage.setItem('suggestedQuestion', question);
@@ -0,0 +1,29 @@
+"""
+SAV.IN WSGI Entry Point
+Production serving: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import gc
+import importlib
+from app import create_app
+from app.services.warmup import warmup
+from app.utils.static_assets import static_assets
+from run import create_tables
+
+app = create_app()
+create_tables(app)
+
+# The app imports its ML stack on first use; the gunicorn master imports it
+# up front so the worker, and any replacement, starts with it loaded
+for module in ('app.services.model_clients', 'langchain_community.vectorstores',
+               'langchain.text_splitter', 'faiss', 'PyPDF2'):
+    importlib.import_module(module)
+
+# With preload_app this module runs once, in the gunicorn master: the hot
+# vector stores loaded here are inherited by the worker after the fork
+warmup.preload(app)
+static_assets.precompress()
+
+# Move everything allocated so far out of the collector's reach, so
+# collections in the worker don't write to (and so copy) the shared pages
+gc.freeze()